@@ -0,0 +1,105 @@
+# Bengaluru Metro Journey Planner - Admission Control
+# Bounds the work a worker takes on when Google Maps slows down. Each
+# /find_routes plan needs a slot (PLAN_MAX_IN_FLIGHT per worker process);
+# a request that cannot get one within its queue allowance - time already
+# spent waiting in front of the worker (X-Request-Start from the proxy) plus
+# time waiting here - is not planned in full. Instead it gets:
+#   - a degraded plan built only from cached, profiled or estimated legs
+#     (no Maps calls, a few ms of CPU), while degraded slots remain; else
+#   - a 503 with Retry-After.
+# Counters and in-flight gauges are exported at /metrics.
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from bengaluru_metrics import metrics
+
+
+PLAN_MAX_IN_FLIGHT = int(os.getenv('PLAN_MAX_IN_FLIGHT', '4'))            # full plans per worker
+PLAN_MAX_DEGRADED_IN_FLIGHT = int(os.getenv('PLAN_MAX_DEGRADED_IN_FLIGHT', '8'))
+PLAN_MAX_QUEUE_WAIT_S = float(os.getenv('PLAN_MAX_QUEUE_WAIT_S', '2'))
+ADMISSION_RETRY_AFTER_S = int(os.getenv('ADMISSION_RETRY_AFTER_S', '5'))
+REQUEST_START_HEADER = 'X-Request-Start'
+
+
+def request_queue_seconds(header_value, now=None):
+    """Seconds a request waited before reaching the worker, from an X-Request-Start header (0 if absent)"""
+    if not header_value:
+        return 0.0
+    try:
+        started = float(header_value.strip().removeprefix('t='))
+    except ValueError:
+        return 0.0
+    # Proxies send seconds, milliseconds or microseconds since the epoch
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, (now or time.time()) - started)
+
+
+class Admission:
+    """An admitted request's slot; release() when the plan is done"""
+
+    def __init__(self, controller, degraded):
+        self.controller = controller
+        self.degraded = degraded
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self.degraded)
+
+
+class AdmissionController:
+    """In-flight limits for full and degraded plans in this worker process"""
+
+    def __init__(self, max_in_flight=PLAN_MAX_IN_FLIGHT, max_degraded=PLAN_MAX_DEGRADED_IN_FLIGHT,
+                 max_queue_wait_s=PLAN_MAX_QUEUE_WAIT_S):
+        self.max_queue_wait_s = max_queue_wait_s
+        self.max_degraded = max_degraded
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.degraded_in_flight = 0
+
+    def admit(self, queued_s=0.0, allow_degraded=True):
+        """Admission for a full plan, a degraded plan, or None (reject with 503)"""
+        started = time.monotonic()
+        allowance = self.max_queue_wait_s - queued_s
+        acquired = allowance > 0 and self._slots.acquire(timeout=allowance)
+        waited_s = queued_s + time.monotonic() - started
+        metrics.incr('admission_queue_wait_ms', int(waited_s * 1000))
+        if acquired:
+            with self._lock:
+                self.in_flight += 1
+            metrics.incr('admission_admitted')
+            return Admission(self, degraded=False)
+
+        metrics.incr('admission_over_capacity' if allowance > 0 else 'admission_over_queue_time')
+        with self._lock:
+            if allow_degraded and self.degraded_in_flight < self.max_degraded:
+                self.degraded_in_flight += 1
+                metrics.incr('admission_degraded')
+                return Admission(self, degraded=True)
+        metrics.incr('admission_rejected')
+        return None
+
+    def _release(self, degraded):
+        with self._lock:
+            if degraded:
+                self.degraded_in_flight -= 1
+            else:
+                self.in_flight -= 1
+        if not degraded:
+            self._slots.release()
+
+
+plan_admission = AdmissionController()
+
+metrics.set_gauge('plans_in_flight', lambda: plan_admission.in_flight)
+metrics.set_gauge('degraded_plans_in_flight', lambda: plan_admission.degraded_in_flight)
@@ -1,36 +1,172 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, abort, make_response, send_from_directory
 import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from bengaluru_station_finder import BengaluruStationFinder
-import json
+from metro_networks import registry, DEFAULT_CITY
+from bengaluru_response import (build_route_response, serialize_json, compress_body,
+                                negotiate_encoding, RESPONSE_VERSION_FULL)
+from bengaluru_assets import AssetStore, PrecompressedBody, IMMUTABLE_CACHE_CONTROL
+from bengaluru_isochrone import MAX_BUDGET_MIN
+from bengaluru_station_search import SUGGEST_LIMIT, MAX_SUGGEST_LIMIT
+from bengaluru_metrics import metrics
+from bengaluru_warmup import run_warmup, warmup_options
+from bengaluru_traffic_profiles import CITY_UTC_OFFSET_S, traffic_profiles
+from bengaluru_profiling import request_profiler, PROFILE_HEADER
+from bengaluru_sharding import shard_router, trip_shard_key, FORWARDED_HEADER, SHARD_FORWARD_MARGIN_S
+from bengaluru_cancellation import search_cancellations, PlanCancelled
+from bengaluru_speculation import return_trips
+from bengaluru_tracing import start_trace, end_trace, current_trace, span, TRACE_HEADER
+from bengaluru_station_finder import PLAN_DEADLINE_S
+from bengaluru_admission import (plan_admission, request_queue_seconds, REQUEST_START_HEADER,
+                                 ADMISSION_RETRY_AFTER_S)
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 
-# Initialize the station finder
-station_finder = BengaluruStationFinder()
+# City networks (stations, pair tables, finders, indexes) load lazily on first request
+# and can be hot-reloaded: on file change (NETWORK_RELOAD_INTERVAL seconds) or via /admin/reload
+NETWORK_RELOAD_INTERVAL = float(os.getenv('NETWORK_RELOAD_INTERVAL', '0'))
+if NETWORK_RELOAD_INTERVAL > 0:
+    registry.watch(NETWORK_RELOAD_INTERVAL)
 
-def clean_for_json(obj):
-    """Clean data for JSON serialization by handling NaN values"""
-    if isinstance(obj, dict):
-        return {k: clean_for_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [clean_for_json(item) for item in obj]
-    elif isinstance(obj, float) and (obj != obj):  # Check for NaN
+# Hashed, precompressed static assets and the memoized page shell (one per API key and asset build).
+# ASSET_WATCH=1 (on by default under the debug server) rebuilds the assets when their sources change.
+FLASK_DEBUG = os.getenv('FLASK_DEBUG', '1') == '1'
+asset_store = AssetStore(watch=os.getenv('ASSET_WATCH', '1' if FLASK_DEBUG and __name__ == '__main__' else '0') == '1')
+app.jinja_env.globals['asset_url'] = asset_store.url_for
+index_shells = {}
+
+def json_response(payload, status=200):
+    """Serialize payload with the fast encoder and compress it if the client accepts it.
+
+    A traced request's timeline is appended as 'trace' once the payload is serialized, so it includes
+    the serialize span; compression runs on the finished body and only shows in Server-Timing.
+    """
+    trace = current_trace()
+    with span('serialize'):
+        body = serialize_json(payload)
+    if trace is not None:
+        body = body[:-1] + (b',' if payload else b'') + b'"trace":' + serialize_json(trace.timeline()) + b'}'
+    with span('compress'):
+        body, encoding = compress_body(body, request.headers.get('Accept-Encoding'))
+    response = Response(body, status=status, mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def precompressed_response(body, cache_control):
+    """Serve a PrecompressedBody with ETag revalidation and the best accepted encoding"""
+    if request.if_none_match.contains(body.etag):
+        response = Response(status=304)
+    else:
+        data, encoding = body.select(negotiate_encoding(request.headers.get('Accept-Encoding')))
+        response = Response(data, mimetype=body.mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(body.etag)
+    response.headers['Cache-Control'] = cache_control
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def parse_departure_time(value):
+    """Epoch seconds for a requested departure (epoch number or ISO 8601, local time if no offset); None = now"""
+    if value in (None, '', 'now'):
         return None
+    if isinstance(value, (int, float)):
+        departure = float(value)
     else:
-        return obj
+        parsed = datetime.fromisoformat(str(value))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone(timedelta(seconds=CITY_UTC_OFFSET_S)))
+        departure = parsed.timestamp()
+    # Departures in the past (or within a minute) are planned as leaving now
+    return departure if departure > time.time() + 60 else None
+
+def overloaded_response():
+    """503 with Retry-After for a plan request rejected by admission control"""
+    response = jsonify({'error': 'The planner is busy, please retry shortly', 'retry_after': ADMISSION_RETRY_AFTER_S})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(ADMISSION_RETRY_AFTER_S)
+    return response
+
+def forward_to_owner(owner):
+    """Proxy this request to the node that owns it (None if it is ours, already forwarded, unreachable or late)"""
+    if owner is None or owner == shard_router.self_node or request.headers.get(FORWARDED_HEADER):
+        return None
+    # The owner gets the plan deadline plus a margin; past that the plan is made here instead
+    forwarded = shard_router.forward(owner, request.path, request.get_data(), request.headers,
+                                     timeout_s=PLAN_DEADLINE_S + SHARD_FORWARD_MARGIN_S)
+    if forwarded is None:
+        return None
+    status, headers, body = forwarded
+    return Response(body, status=status, headers=headers)
+
+def resolve_station(city_context, name):
+    """(lat, lng, station name) for a station name, alias or landmark, or None if unknown"""
+    station_id = city_context.search.resolve(name)
+    if station_id is None:
+        return None
+    network = city_context.network
+    return float(network.lats[station_id]), float(network.lngs[station_id]), network.station_names[station_id]
 
 @app.route('/')
 def index():
-    """Serve the main page"""
+    """Serve the main page (rendered once per API key, then served from memory)"""
     api_key = os.getenv('GOOGLE_MAPS_API_KEY')
-    return render_template('bengaluru_index.html', api_key=api_key)
+    asset_store.refresh()
+    shell_key = (api_key, asset_store.generation)
+    shell = index_shells.get(shell_key)
+    if shell is None:
+        html = render_template('bengaluru_index.html', api_key=api_key)
+        shell = PrecompressedBody.from_bytes(html.encode('utf-8'), 'text/html')
+        index_shells.clear()
+        index_shells[shell_key] = shell
+    # The shell itself is small and must pick up new asset hashes after a deploy
+    return precompressed_response(shell, 'no-cache')
+
+@app.route('/assets/<path:filename>')
+def assets(filename):
+    """Serve content-hashed static assets with long-lived cache headers"""
+    asset = asset_store.get(filename)
+    if asset is None:
+        abort(404)
+    return precompressed_response(asset, IMMUTABLE_CACHE_CONTROL)
 
 @app.route('/find_routes', methods=['POST'])
 def find_routes():
+    """Find multi-modal routes between two addresses (profiled on request or by sampling, traced on request)"""
+    profile_header = request.headers.get(PROFILE_HEADER)
+    capture = request_profiler.capture_for(profile_header, bool(profile_header) and is_admin_request(), 'find_routes')
+    if capture is None:
+        return traced_response('find_routes', find_routes_response)
+    with capture:
+        response = make_response(traced_response('find_routes', find_routes_response))
+    if capture.saved:
+        response.headers['X-Profile-Id'] = capture.capture_id
+    return response
+
+def trace_requested():
+    """True if the request asks for a span timeline (X-Trace: 1) and may have one (admin, or debug mode)"""
+    return request.headers.get(TRACE_HEADER, '').lower() in ('1', 'true') and (app.debug or is_admin_request())
+
+def traced_response(label, handler):
+    """handler()'s response, with a span timeline (body 'trace' + Server-Timing) when the request asks for one"""
+    trace = start_trace(label) if trace_requested() else None
+    if trace is None:
+        return handler()
+    try:
+        response = make_response(handler())
+    finally:
+        end_trace()
+    response.headers['Server-Timing'] = trace.server_timing()
+    return response
+
+def find_routes_response():
     """Find multi-modal routes between two addresses"""
     try:
         data = request.get_json()
@@ -42,10 +178,36 @@ def find_routes():
         dest_lng = data.get('dest_lng')
         initial_address = data.get('initial_address', 'Unknown')
         dest_address = data.get('dest_address', 'Unknown')
+        response_version = int(data.get('response_version', RESPONSE_VERSION_FULL))
+        
+        try:
+            city_context = registry.get(data.get('city'))
+        except KeyError:
+            return jsonify({'error': f"Unknown city: {data.get('city')}"}), 404
+        station_finder = city_context.finder
+        
+        # A station (name, alias or landmark from /suggest) can stand in for either end's coordinates
+        if data.get('initial_station') and not (initial_lat and initial_lng):
+            station = resolve_station(city_context, data['initial_station'])
+            if station is None:
+                return jsonify({'error': f"Unknown station: {data['initial_station']}"}), 400
+            initial_lat, initial_lng, station_name = station
+            initial_address = data.get('initial_address', station_name)
+        if data.get('dest_station') and not (dest_lat and dest_lng):
+            station = resolve_station(city_context, data['dest_station'])
+            if station is None:
+                return jsonify({'error': f"Unknown station: {data['dest_station']}"}), 400
+            dest_lat, dest_lng, station_name = station
+            dest_address = data.get('dest_address', station_name)
         
         if not all([initial_lat, initial_lng, dest_lat, dest_lng]):
             return jsonify({'error': 'Coordinates are required'}), 400
         
+        try:
+            departure_time = parse_departure_time(data.get('departure_time'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'departure_time must be epoch seconds or an ISO 8601 date-time'}), 400
+        
         print("\n" + "=" * 80)
         print("🚀 BENGALURU METRO JOURNEY PLANNER - NEW REQUEST")
         print("=" * 80)
@@ -54,48 +216,363 @@ def find_routes():
         print(f"   To: '{dest_address}'")
         print(f"   Origin Coordinates: ({initial_lat:.6f}, {initial_lng:.6f})")
         print(f"   Destination Coordinates: ({dest_lat:.6f}, {dest_lng:.6f})")
+        if departure_time:
+            print(f"   Departure: {time.strftime('%a %d %b %H:%M', time.gmtime(departure_time + CITY_UTC_OFFSET_S))}")
         
-        # Find nearest metro stations
-        print("\n" + "=" * 80)
-        print("🎯 STEP 1: FINDING NEAREST METRO STATIONS")
-        print("=" * 80)
-        initial_stations = station_finder.find_nearest_stations(initial_lat, initial_lng, top_n=7)
-        dest_stations = station_finder.find_nearest_stations(dest_lat, dest_lng, top_n=7)
-        
-        print(f"\n✅ Station Discovery Complete:")
-        print(f"   • {len(initial_stations)} nearest stations to origin")
-        print(f"   • {len(dest_stations)} nearest stations to destination")
+        # Sharding: the node owning this trip's cells plans it, so its caches stay hot
+        if shard_router.enabled:
+            forwarded = forward_to_owner(shard_router.owner(
+                trip_shard_key(city_context.network.key, initial_lat, initial_lng, dest_lat, dest_lng)))
+            if forwarded is not None:
+                return forwarded
         
-        # Calculate all taxi legs and get convenience routes
-        taxi_results = station_finder.calculate_all_taxi_legs(
-            initial_lat, initial_lng, dest_lat, dest_lng, 
-            initial_stations, dest_stations
-        )
+        # Admission control: over capacity, answer from cached/estimated legs or shed with a 503
+        admission = plan_admission.admit(request_queue_seconds(request.headers.get(REQUEST_START_HEADER)))
+        if admission is None:
+            print("🚦 Over capacity - shedding request (503)")
+            return overloaded_response()
         
-        # Get the convenience routes and direct taxi suggestion
-        convenience_routes = station_finder.get_convenience_routes()
-        direct_taxi_suggestion = station_finder.get_direct_taxi_suggestion()
+        # Stations, access legs and route ranking (served from the plan cache when warm).
+        # A newer search from the same client, or POST /cancel, stops this one and drops its queued legs.
+        cancel_token = search_cancellations.start(data.get('client_id'), data.get('search_id'))
+        station_finder.cancel_token = cancel_token
+        try:
+            convenience_routes, direct_taxi_suggestion = station_finder.plan_routes(
+                initial_lat, initial_lng, dest_lat, dest_lng, departure_time, degraded=admission.degraded,
+                deadline_s=PLAN_DEADLINE_S
+            )
+        except PlanCancelled:
+            print(f"🛑 Search {cancel_token.search_id} cancelled by the client - worker freed")
+            return jsonify({'error': 'Search cancelled'}), 499
+        finally:
+            admission.release()
+            station_finder.cancel_token = None
+            search_cancellations.finish(cancel_token)
         
         print(f"\n" + "=" * 80)
         print("✅ REQUEST COMPLETE - RETURNING RESULTS TO USER")
         print("=" * 80)
         print(f"🏆 Returning {len(convenience_routes)} top convenience routes to frontend")
         if direct_taxi_suggestion:
-            print(f"🚕 Direct taxi suggestion: {'SUGGESTED' if direct_taxi_suggestion['suggest'] else 'NOT SUGGESTED'}")
+            print(f"🚕 Direct taxi suggestion: {'SUGGESTED' if direct_taxi_suggestion.suggest else 'NOT SUGGESTED'}")
         
-        response = {
-            'status': 'success',
-            'convenience_routes': convenience_routes,
-            'direct_taxi_suggestion': direct_taxi_suggestion
-        }
+        response = build_route_response(convenience_routes, direct_taxi_suggestion, response_version,
+                                        station_finder.get_plan_token())
+        if station_finder.get_plan_partial():
+            # Deadline hit: some legs are estimates
+            response['partial'] = True
+        if station_finder.get_plan_degraded():
+            response['degraded'] = True
+        elif convenience_routes:
+            # Likely next search: the way back (SPECULATE_RETURN_TRIPS=1)
+            return_trips.offer(station_finder, initial_lat, initial_lng, dest_lat, dest_lng, departure_time)
         
-        return jsonify(clean_for_json(response))
+        return json_response(response)
         
     except Exception as e:
         print(f"❌ Error in find_routes: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/replan', methods=['POST'])
+def replan():
+    """Re-plan a previous /find_routes result (by plan_token) from the rider's new position (traced on request)"""
+    return traced_response('replan', replan_response)
+
+def replan_response():
+    """Re-plan a previous /find_routes result (by plan_token) from the rider's new position"""
+    try:
+        data = request.get_json() or {}
+        initial_lat = data.get('initial_lat')
+        initial_lng = data.get('initial_lng')
+        response_version = int(data.get('response_version', RESPONSE_VERSION_FULL))
+        if not data.get('plan_token'):
+            return jsonify({'error': 'plan_token is required'}), 400
+        if not (initial_lat and initial_lng):
+            return jsonify({'error': 'Coordinates are required'}), 400
+        
+        try:
+            city_context = registry.get(data.get('city'))
+        except KeyError:
+            return jsonify({'error': f"Unknown city: {data.get('city')}"}), 404
+        try:
+            departure_time = parse_departure_time(data.get('departure_time'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'departure_time must be epoch seconds or an ISO 8601 date-time'}), 400
+        
+        # The plan state lives on the node that issued the token
+        forwarded = forward_to_owner(shard_router.owner_for_token(data['plan_token']))
+        if forwarded is not None:
+            return forwarded
+        
+        # Replans reuse most legs but still call Maps, so they need a full slot
+        admission = plan_admission.admit(request_queue_seconds(request.headers.get(REQUEST_START_HEADER)),
+                                         allow_degraded=False)
+        if admission is None:
+            return overloaded_response()
+        station_finder = city_context.finder
+        try:
+            plan = station_finder.replan_routes(data['plan_token'], float(initial_lat), float(initial_lng),
+                                                departure_time, deadline_s=PLAN_DEADLINE_S)
+        finally:
+            admission.release()
+        if plan is None:
+            # Expired or unknown: the client falls back to a full /find_routes
+            return jsonify({'error': 'Unknown or expired plan_token'}), 404
+        convenience_routes, direct_taxi_suggestion = plan
+        
+        print(f"🔁 Replanned from ({float(initial_lat):.6f}, {float(initial_lng):.6f}): "
+              f"{len(convenience_routes)} convenience routes")
+        response = build_route_response(convenience_routes, direct_taxi_suggestion, response_version,
+                                        station_finder.get_plan_token())
+        if station_finder.get_plan_partial():
+            response['partial'] = True
+        return json_response(response)
+        
+    except Exception as e:
+        print(f"❌ Error in replan: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/more_routes', methods=['POST'])
+def more_routes():
+    """More routes for a previous /find_routes result (by plan_token), merged into its ranking (traced on request)"""
+    return traced_response('more_routes', more_routes_response)
+
+def more_routes_response():
+    """More routes for a previous /find_routes result (by plan_token), merged into its ranking"""
+    try:
+        data = request.get_json() or {}
+        response_version = int(data.get('response_version', RESPONSE_VERSION_FULL))
+        if not data.get('plan_token'):
+            return jsonify({'error': 'plan_token is required'}), 400
+        
+        try:
+            city_context = registry.get(data.get('city'))
+        except KeyError:
+            return jsonify({'error': f"Unknown city: {data.get('city')}"}), 404
+        
+        # The plan state lives on the node that issued the token
+        forwarded = forward_to_owner(shard_router.owner_for_token(data['plan_token']))
+        if forwarded is not None:
+            return forwarded
+        
+        # Only the new stations' legs are fetched, but those are Maps calls, so this needs a full slot
+        admission = plan_admission.admit(request_queue_seconds(request.headers.get(REQUEST_START_HEADER)),
+                                         allow_degraded=False)
+        if admission is None:
+            return overloaded_response()
+        station_finder = city_context.finder
+        try:
+            plan = station_finder.expand_routes(data['plan_token'], deadline_s=PLAN_DEADLINE_S)
+        finally:
+            admission.release()
+        if plan is None:
+            # Expired or unknown: the client falls back to a full /find_routes
+            return jsonify({'error': 'Unknown or expired plan_token'}), 404
+        convenience_routes, direct_taxi_suggestion = plan
+        
+        print(f"➕ Expanded plan: {len(convenience_routes)} convenience routes")
+        response = build_route_response(convenience_routes, direct_taxi_suggestion, response_version,
+                                        station_finder.get_plan_token())
+        if station_finder.get_plan_partial():
+            response['partial'] = True
+        return json_response(response)
+        
+    except Exception as e:
+        print(f"❌ Error in more_routes: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/cancel', methods=['POST'])
+def cancel_search():
+    """Cancel a client's running search (sent by the frontend when it aborts a fetch)"""
+    # sendBeacon posts text/plain, so parse the body regardless of Content-Type
+    data = request.get_json(force=True, silent=True) or {}
+    if not data.get('client_id') or not data.get('search_id'):
+        return jsonify({'error': 'client_id and search_id are required'}), 400
+    search_cancellations.cancel(str(data['client_id']), str(data['search_id']))
+    return jsonify({'status': 'cancelled'}), 202
+
+@app.route('/isochrone', methods=['GET'])
+def isochrone():
+    """Stations (with catchment radii) reachable from a point within a time budget"""
+    try:
+        lat = float(request.args['lat'])
+        lng = float(request.args['lng'])
+        minutes = float(request.args.get('minutes', 30))
+    except (KeyError, ValueError):
+        return jsonify({'error': 'lat and lng are required and minutes must be a number'}), 400
+    
+    if not 0 < minutes <= MAX_BUDGET_MIN:
+        return jsonify({'error': f'minutes must be between 0 and {MAX_BUDGET_MIN}'}), 400
+    
+    try:
+        reachability_index = registry.get(request.args.get('city')).reachability
+    except KeyError:
+        return jsonify({'error': f"Unknown city: {request.args.get('city')}"}), 404
+    
+    return json_response(reachability_index.reachable(lat, lng, minutes))
+
+@app.route('/suggest', methods=['GET'])
+def suggest():
+    """Station/alias/landmark autocomplete from the local index (no Places call)"""
+    try:
+        limit = min(int(request.args.get('limit', SUGGEST_LIMIT)), MAX_SUGGEST_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    
+    try:
+        search_index = registry.get(request.args.get('city')).search
+    except KeyError:
+        return jsonify({'error': f"Unknown city: {request.args.get('city')}"}), 404
+    
+    response = json_response(search_index.suggest(request.args.get('q', ''), limit))
+    response.headers['Cache-Control'] = 'public, max-age=300'
+    return response
+
+@app.route('/cities', methods=['GET'])
+def cities():
+    """Registered cities, which of them are loaded, and their network versions"""
+    return jsonify({'cities': registry.cities(), 'loaded': registry.loaded_cities(), 'status': registry.status()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Counters and gauges for this worker process"""
+    return jsonify(metrics.snapshot())
+
+def is_admin_request():
+    """True if the request carries the configured ADMIN_TOKEN (admin endpoints are off without one)"""
+    admin_token = os.getenv('ADMIN_TOKEN')
+    return bool(admin_token) and request.headers.get('X-Admin-Token') == admin_token
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Reload a city's network data in the background and swap it in once validated"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    city = (request.get_json(silent=True) or {}).get('city')
+    try:
+        registry.reload(city)
+    except KeyError:
+        return jsonify({'error': f'Unknown city: {city}'}), 404
+    
+    # Only this worker reloads now; other workers pick the change up via NETWORK_RELOAD_INTERVAL
+    return jsonify({'status': 'reloading', 'city': city or DEFAULT_CITY}), 202
+
+@app.route('/admin/ring', methods=['GET', 'POST'])
+def admin_ring():
+    """Show, or replace (POST {"nodes": [...]}), this node's planner ring membership"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    if request.method == 'POST':
+        nodes = (request.get_json(silent=True) or {}).get('nodes')
+        if not isinstance(nodes, list) or not all(isinstance(node, str) for node in nodes):
+            return jsonify({'error': 'nodes must be a list of node URLs'}), 400
+        # Only this worker changes now; set PLANNER_NODES for a permanent change
+        shard_router.set_nodes(nodes)
+    return jsonify(shard_router.status())
+
+@app.route('/debug/profiles', methods=['GET'])
+def debug_profiles():
+    """Index of the request profiles captured by this host"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify({'directory': request_profiler.directory, 'profiles': request_profiler.index()})
+
+@app.route('/debug/profiles/<path:filename>', methods=['GET'])
+def debug_profile_file(filename):
+    """Download one capture file (.pstats, .folded, .cpu.txt, .memory.txt)"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    return send_from_directory(request_profiler.directory, filename)
+
+# Last cache warm-up run in this worker (POST /admin/warmup starts one, GET reports on it)
+warmup_state = {'status': 'idle'}
+warmup_lock = threading.Lock()
+
+def _run_warmup_job(finder, places, buckets, include_pairs, max_calls):
+    try:
+        warmup_state.update(run_warmup(finder, places, buckets, include_pairs, max_calls))
+    except Exception as e:
+        print(f"❌ Warm-up failed: {e}")
+        warmup_state.update({'status': 'failed', 'error': str(e)})
+
+@app.route('/admin/warmup', methods=['POST'])
+def admin_warmup():
+    """Pre-fill the leg and plan caches for hot places in the background"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    try:
+        finder = registry.get(data.get('city')).finder
+    except KeyError:
+        return jsonify({'error': f"Unknown city: {data.get('city')}"}), 404
+    try:
+        places, buckets, include_pairs, max_calls = warmup_options(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with warmup_lock:
+        if warmup_state['status'] == 'running':
+            return jsonify(warmup_state), 409
+        warmup_state.clear()
+        warmup_state.update({'status': 'running', 'city': data.get('city') or DEFAULT_CITY})
+    threading.Thread(target=_run_warmup_job, name='cache-warmup', daemon=True,
+                     args=(finder, places, buckets, include_pairs, max_calls)).start()
+    return jsonify(warmup_state), 202
+
+@app.route('/admin/warmup', methods=['GET'])
+def admin_warmup_status():
+    """Report of the last cache warm-up in this worker"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(warmup_state)
+
+# Last traffic profile build in this worker (POST /admin/traffic_profiles starts one, GET reports on it)
+profile_build_state = {'status': 'idle'}
+profile_build_lock = threading.Lock()
+
+def _run_profile_build(since, fresh):
+    started = time.time()
+    try:
+        summary = traffic_profiles.rebuild(since, fresh=fresh)
+        profile_build_state.update({'status': 'done', 'summary': summary,
+                                    'elapsed_s': round(time.time() - started, 1)})
+    except Exception as e:
+        print(f"❌ Traffic profile build failed: {e}")
+        profile_build_state.update({'status': 'failed', 'error': str(e)})
+
+@app.route('/admin/traffic_profiles', methods=['POST'])
+def admin_traffic_profiles():
+    """Fold the logged traffic observations into the profile file in the background (other workers reload it)"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    
+    data = request.get_json(silent=True) or {}
+    days = data.get('days')
+    if days is not None and (isinstance(days, bool) or not isinstance(days, (int, float)) or days <= 0):
+        return jsonify({'error': 'days must be a positive number'}), 400
+    
+    with profile_build_lock:
+        if profile_build_state['status'] == 'running':
+            return jsonify(profile_build_state), 409
+        profile_build_state.clear()
+        profile_build_state.update({'status': 'running', 'started_at': time.time()})
+    since = time.time() - days * 86400 if days else None
+    threading.Thread(target=_run_profile_build, name='traffic-profile-build', daemon=True,
+                     args=(since, bool(data.get('fresh', False)))).start()
+    return jsonify(profile_build_state), 202
+
+@app.route('/admin/traffic_profiles', methods=['GET'])
+def admin_traffic_profiles_status():
+    """Report of the last traffic profile build in this worker"""
+    if not is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    return jsonify(profile_build_state)
+
 if __name__ == '__main__':
+    port = int(os.getenv('PORT', '5002'))
     print("🚇 Starting Bengaluru Metro Journey Planner...")
-    print("📍 Server will be available at: http://localhost:5002")
-    app.run(debug=True, host='0.0.0.0', port=5002)
+    print(f"📍 Server will be available at: http://localhost:{port}")
+    app.run(debug=FLASK_DEBUG, host='0.0.0.0', port=port)
@@ -0,0 +1,210 @@
+# Bengaluru Metro Journey Planner - Static Asset Pipeline
+# Builds content-hashed, precompressed copies of the page's CSS/JS at deploy
+# time (`python bengaluru_assets.py`) and serves them from memory at runtime.
+# Hashed filenames let browsers cache them for a year; a new deploy changes
+# the hash and therefore the URL. A build older than any of its sources is
+# rebuilt on startup, and with watch=True (local development) whenever a
+# source changes, so edited CSS/JS is served without rerunning build.sh.
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz variants are built without brotli
+    brotli = None
+
+
+STATIC_DIR = Path(__file__).resolve().parent / 'static'
+DIST_DIR = STATIC_DIR / 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Logical asset names (relative to static/) referenced from templates via asset_url()
+ASSET_SOURCES = [
+    'css/bengaluru.css',
+    'js/bengaluru.js',
+]
+
+# One year; safe because the URL changes whenever the content does
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+ASSET_WATCH_CHECK_S = 1.0           # with watch=True, how often sources are compared with the build
+
+
+def content_hash(data):
+    """Short, stable content hash used in filenames and ETags"""
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def gzip_bytes(data, level=9):
+    """Deterministic gzip (fixed mtime) so rebuilding identical input gives identical output"""
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _write_atomic(path, data):
+    """Write via a temporary sibling and os.replace, so a reader sees the old file or the new one, never half"""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def prune_builds(dist_dir, keep):
+    """Delete hashed builds (and their .gz/.br) of ASSET_SOURCES whose hashed paths are not in keep"""
+    for logical_name in ASSET_SOURCES:
+        source = Path(logical_name)
+        built = re.compile(rf"{re.escape(source.stem)}\.[0-9a-f]{{12}}{re.escape(source.suffix)}")
+        directory = dist_dir / source.parent
+        if not directory.is_dir():
+            continue
+        for path in directory.iterdir():
+            name = path.name.removesuffix('.gz').removesuffix('.br')
+            if built.fullmatch(name) and (source.parent / name).as_posix() not in keep:
+                path.unlink(missing_ok=True)
+
+
+def build_assets(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """Write hashed + precompressed copies of ASSET_SOURCES and a manifest; returns the manifest.
+
+    The manifest is replaced atomically. Builds that are in neither it nor the manifest it replaces are
+    deleted; the previous build stays so a worker that has just read the old manifest can still load it.
+    """
+    dist_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = dist_dir / MANIFEST_NAME
+    try:
+        previous = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        previous = {}
+    manifest = {}
+
+    for logical_name in ASSET_SOURCES:
+        source = static_dir / logical_name
+        data = source.read_bytes()
+        hashed_name = f"{source.stem}.{content_hash(data)}{source.suffix}"
+        hashed_path = Path(logical_name).parent / hashed_name
+        target = dist_dir / hashed_path
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        _write_atomic(target, data)
+        _write_atomic(target.with_name(hashed_name + '.gz'), gzip_bytes(data))
+        if brotli is not None:
+            _write_atomic(target.with_name(hashed_name + '.br'), brotli.compress(data, quality=11))
+
+        manifest[logical_name] = hashed_path.as_posix()
+        print(f"✅ {logical_name} → dist/{hashed_path.as_posix()} ({len(data)} bytes)")
+
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True).encode())
+    prune_builds(dist_dir, set(manifest.values()) | set(previous.values()))
+    return manifest
+
+
+class PrecompressedBody:
+    """A response body held in memory in identity, gzip and (optionally) brotli form"""
+    __slots__ = ('mimetype', 'etag', 'variants')
+
+    def __init__(self, mimetype, variants):
+        self.mimetype = mimetype
+        self.variants = variants
+        self.etag = content_hash(variants[None])
+
+    @classmethod
+    def from_bytes(cls, data, mimetype):
+        """Compress data once, up front"""
+        variants = {None: data, 'gzip': gzip_bytes(data)}
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+        return cls(mimetype, variants)
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a built asset together with any .gz/.br siblings next to it"""
+        variants = {None: path.read_bytes()}
+        for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+            sibling = path.with_name(path.name + suffix)
+            if sibling.exists():
+                variants[encoding] = sibling.read_bytes()
+        mimetype = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        return cls(mimetype, variants)
+
+    def select(self, encoding):
+        """Return (body, content_encoding) for the negotiated encoding, falling back to identity"""
+        if encoding in self.variants:
+            return self.variants[encoding], encoding
+        if encoding == 'br' and 'gzip' in self.variants:
+            return self.variants['gzip'], 'gzip'
+        return self.variants[None], None
+
+
+def build_is_stale(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """True if there is no manifest or any source was modified after it was written"""
+    manifest_path = dist_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return True
+    built_at = manifest_path.stat().st_mtime
+    return any((static_dir / logical_name).stat().st_mtime > built_at for logical_name in ASSET_SOURCES)
+
+
+class AssetStore:
+    """Hashed static assets loaded into memory from the build manifest"""
+
+    def __init__(self, static_dir=STATIC_DIR, dist_dir=DIST_DIR, watch=False):
+        self.static_dir = static_dir
+        self.dist_dir = dist_dir
+        self.watch = watch
+        self.generation = 0             # bumped on every (re)load; pages embedding asset URLs key on it
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if build_is_stale(self.static_dir, self.dist_dir):
+            # Local development without (or after editing sources since) the build step
+            print("⚠️ Asset build missing or older than its sources - building static assets now")
+            manifest = build_assets(self.static_dir, self.dist_dir)
+        else:
+            manifest = json.loads((self.dist_dir / MANIFEST_NAME).read_text())
+
+        self.assets = {
+            hashed_path: PrecompressedBody.from_file(self.dist_dir / hashed_path)
+            for hashed_path in manifest.values()
+        }
+        self.manifest = manifest
+        self.generation += 1
+
+    def refresh(self):
+        """With watch=True, rebuild and reload if a source changed (checked at most every ASSET_WATCH_CHECK_S)"""
+        if not self.watch:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < ASSET_WATCH_CHECK_S:
+            return
+        with self._lock:
+            if now - self._checked_at < ASSET_WATCH_CHECK_S:
+                return
+            self._checked_at = now
+            if build_is_stale(self.static_dir, self.dist_dir):
+                self._load()
+
+    def url_for(self, logical_name):
+        """Public URL of the current hashed build of an asset"""
+        self.refresh()
+        return f"/assets/{self.manifest[logical_name]}"
+
+    def get(self, hashed_path):
+        """Look up a built asset by its hashed path (None if unknown)"""
+        self.refresh()
+        return self.assets.get(hashed_path)
+
+
+if __name__ == "__main__":
+    print("BUILDING STATIC ASSETS")
+    print("=" * 50)
+    built = build_assets()
+    print(f"\nManifest written with {len(built)} assets (brotli: {'yes' if brotli else 'no'})")
@@ -0,0 +1,156 @@
+# Bengaluru Metro Journey Planner - Search Cancellation
+# A search the rider has abandoned should stop costing Maps calls and a
+# worker. Each /find_routes request carries a client_id (one per browser tab)
+# and a search_id; starting a search records it as the client's latest in a
+# small SQLite table shared by the workers on the host. A running plan checks
+# its CancelToken while it waits for legs and stops as soon as
+#   - the same client has started a newer search (re-submit), or
+#   - the client sent POST /cancel for it (aborted fetch, page closed).
+# Cancelling drops the plan's queued Maps requests (Future.cancel - the
+# scheduler skips cancelled jobs) and frees the worker.
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from bengaluru_metrics import metrics
+
+
+CANCEL_POLL_S = float(os.getenv('CANCEL_POLL_S', '0.1'))          # how often a waiting plan checks
+CANCEL_RECORD_TTL_S = 3600
+CANCEL_CLEANUP_INTERVAL_S = 60
+SEARCH_DB = os.getenv('SEARCH_DB', os.path.join(tempfile.gettempdir(), 'bengaluru_searches.sqlite3'))
+
+
+class PlanCancelled(Exception):
+    """The search was superseded or cancelled by the client"""
+
+
+class CancelToken:
+    """Cancellation state of one running search plus the leg futures it is waiting on"""
+
+    def __init__(self, registry, client_id, search_id):
+        self.registry = registry
+        self.client_id = client_id
+        self.search_id = search_id
+        self._cancelled = threading.Event()
+        self._futures = []
+        self._checked_at = time.monotonic()
+
+    def track(self, future):
+        """Register a pending leg future so cancelling drops it"""
+        self._futures.append(future)
+        return future
+
+    def cancelled(self):
+        """True once the search is superseded or cancelled (checks the shared table at most every CANCEL_POLL_S)"""
+        if self._cancelled.is_set():
+            return True
+        now = time.monotonic()
+        if self.client_id and now - self._checked_at >= CANCEL_POLL_S:
+            self._checked_at = now
+            if not self.registry.is_current(self.client_id, self.search_id):
+                self.cancel()
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        if self._cancelled.is_set():
+            return
+        self._cancelled.set()
+        dropped = sum(1 for future in self._futures if future.cancel())
+        metrics.incr('searches_cancelled')
+        metrics.incr('cancelled_legs_dropped', dropped)
+        print(f"🛑 Search {self.search_id} cancelled - dropped {dropped} queued Maps requests")
+
+    def raise_if_cancelled(self):
+        if self.cancelled():
+            raise PlanCancelled(self.search_id)
+
+
+class CancellationRegistry:
+    """Latest search per client, shared by every worker on the host"""
+
+    def __init__(self, db_path=SEARCH_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def _db(self):
+        if not self.db_path:
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=2, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS latest_search '
+                         '(client_id TEXT PRIMARY KEY, search_id TEXT NOT NULL, updated_at REAL NOT NULL)')
+        except sqlite3.Error as e:
+            print(f"⚠️ Search cancellation table unavailable ({e}) - cancelling within this worker only")
+            self.db_path = None
+            return None
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _set_latest(self, client_id, search_id):
+        conn = self._db()
+        if conn is None:
+            return
+        try:
+            now = time.time()
+            conn.execute('INSERT OR REPLACE INTO latest_search VALUES (?, ?, ?)', (client_id, search_id, now))
+            if now - self._last_cleanup >= CANCEL_CLEANUP_INTERVAL_S:
+                self._last_cleanup = now
+                conn.execute('DELETE FROM latest_search WHERE updated_at < ?', (now - CANCEL_RECORD_TTL_S,))
+        except sqlite3.Error as e:
+            print(f"⚠️ Search cancellation write failed: {e}")
+
+    def is_current(self, client_id, search_id):
+        """False if the client has since started another search or cancelled this one"""
+        conn = self._db()
+        if conn is None:
+            return True
+        try:
+            row = conn.execute('SELECT search_id FROM latest_search WHERE client_id = ?', (client_id,)).fetchone()
+        except sqlite3.Error:
+            return True
+        return row is None or row[0] == search_id
+
+    def start(self, client_id, search_id):
+        """CancelToken for a new search; any older search of the client is superseded"""
+        token = CancelToken(self, client_id, search_id)
+        if not client_id or not search_id:
+            return token
+        self._set_latest(client_id, search_id)
+        with self._lock:
+            previous = self._tokens.get(client_id)
+            self._tokens[client_id] = token
+        if previous is not None:
+            previous.cancel()
+        return token
+
+    def cancel(self, client_id, search_id):
+        """Cancel a client's search if it is still the latest one"""
+        if not self.is_current(client_id, search_id):
+            return
+        self._set_latest(client_id, f"cancelled:{search_id}")
+        with self._lock:
+            token = self._tokens.get(client_id)
+        if token is not None and token.search_id == search_id:
+            token.cancel()
+
+    def finish(self, token):
+        with self._lock:
+            if self._tokens.get(token.client_id) is token:
+                del self._tokens[token.client_id]
+
+
+search_cancellations = CancellationRegistry()
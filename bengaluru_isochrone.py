@@ -0,0 +1,89 @@
+# Bengaluru Metro Journey Planner - Isochrone / Reachability
+# Answers "where can I get within N minutes from here" from the station tables
+# alone: the nearest-station candidates, an estimated access leg to each, and
+# the station-pair metro times held as a dense matrix so the one-to-all step
+# is a single vectorized min over the candidate rows. No Maps API calls.
+
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+from bengaluru_response import TRANSFER_TIME_MIN, ACCESS_TRANSFER_TIME_MIN
+from bengaluru_station_finder import WALKING_SPEED_KMPH, TAXI_SPEED_KMPH, ROAD_DETOUR_FACTOR, STATION_CANDIDATES
+
+
+MAX_BUDGET_MIN = 180
+ENTRY_TIME_MIN = ACCESS_TRANSFER_TIME_MIN / 2    # street → platform
+EXIT_TIME_MIN = ACCESS_TRANSFER_TIME_MIN / 2     # platform → street
+
+
+class ReachabilityIndex:
+    """Station-to-station metro times as a dense matrix for one-to-all reachability queries"""
+
+    def __init__(self, finder):
+        self.finder = finder
+        network = finder.network
+        self.station_names = network.station_names
+        self.lats = network.lats
+        self.lngs = network.lngs
+        self.lines = network.station_lines
+
+        # In-vehicle time plus line-change time; inf where no pair row exists
+        pairs = network.pairs
+        metro_times = np.where(pairs.present, pairs.time + pairs.transfer_count * TRANSFER_TIME_MIN, np.inf)
+        np.fill_diagonal(metro_times, 0.0)
+        self.metro_times = metro_times
+
+    def reachable(self, lat, lng, budget_min, top_n=STATION_CANDIDATES):
+        """Stations reachable from (lat, lng) within budget_min, with catchment radii"""
+        started = time.perf_counter()
+
+        candidates = self.finder.nearest_candidates(lat, lng, top_n)
+        entry_rows = np.array([c.station_id for c in candidates], dtype=np.intp)
+        access_min = np.array([
+            self._minutes(self.finder.estimate_leg(lat, lng, c.lat, c.lng, c.mode))
+            for c in candidates
+        ])
+
+        # One-to-all: arrival at every station through every entry candidate, keep the best
+        via = access_min[:, None] + ENTRY_TIME_MIN + self.metro_times[entry_rows]
+        best_entry = via.argmin(axis=0)
+        arrival_min = via[best_entry, np.arange(via.shape[1])]
+        remaining_min = budget_min - arrival_min - EXIT_TIME_MIN
+
+        reachable = np.flatnonzero(remaining_min >= 0)
+        reachable = reachable[np.argsort(arrival_min[reachable], kind='stable')]
+        walk_radius_km = remaining_min * WALKING_SPEED_KMPH / 60 / ROAD_DETOUR_FACTOR
+        taxi_radius_km = remaining_min * TAXI_SPEED_KMPH / 60 / ROAD_DETOUR_FACTOR
+
+        stations = [{
+            'name': self.station_names[j],
+            'lat': float(self.lats[j]),
+            'lng': float(self.lngs[j]),
+            'line': self.lines[j],
+            'entry_station': candidates[best_entry[j]].name,
+            'arrival_min': round(float(arrival_min[j]), 1),
+            'remaining_min': round(float(remaining_min[j]), 1),
+            'walk_radius_km': round(float(walk_radius_km[j]), 2),
+            'taxi_radius_km': round(float(taxi_radius_km[j]), 2),
+        } for j in reachable]
+
+        return {
+            'status': 'success',
+            'budget_min': budget_min,
+            'origin': {
+                'lat': lat,
+                'lng': lng,
+                # Catchment of going there directly, without the metro
+                'walk_radius_km': round(budget_min * WALKING_SPEED_KMPH / 60 / ROAD_DETOUR_FACTOR, 2),
+                'taxi_radius_km': round(budget_min * TAXI_SPEED_KMPH / 60 / ROAD_DETOUR_FACTOR, 2),
+            },
+            'stations': stations,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    @staticmethod
+    def _minutes(leg):
+        return leg['duration_min'] + leg['duration_sec'] / 60
@@ -0,0 +1,210 @@
+# Bengaluru Metro Journey Planner - Maps Leg Micro-batching
+# Concurrent plans touch the same stations (and each plan's 7 origin legs
+# share an origin, its 7 destination legs a destination) within milliseconds
+# of each other. Legs that miss the caches are held for a short window
+# (MAPS_BATCH_WINDOW_MS) and then sent as shared many-to-many Distance Matrix
+# calls instead of one Directions call each:
+#   - legs are grouped by mode, departure (taxi: 'now' or traffic bucket) and
+#     live vs background priority;
+#   - each group is covered greedily by one-to-many / many-to-one "stars"
+#     (largest shared origin or destination first), and stars are packed into
+#     matrix calls within Google's limits (25 origins, 25 destinations, 100
+#     elements) - but only while the unused elements a merge adds stay under
+#     MATRIX_MAX_WASTE, since elements are billed; identical legs share one;
+#   - every call is one job on the Maps scheduler (one token, the best
+#     priority of its legs) and its elements are split back to each waiting
+#     leg's Future. Legs cancelled or shed together with their call behave as
+#     before. A plan's ~15 legs become about 2 calls, fewer when plans overlap.
+# MAPS_BATCH_WINDOW_MS=0 turns batching off (one Directions call per leg).
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from bengaluru_maps_scheduler import PRIORITY_BACKGROUND, _resolve, maps_scheduler
+from bengaluru_metrics import metrics
+from bengaluru_tracing import current_trace
+
+
+MAPS_BATCH_WINDOW_MS = float(os.getenv('MAPS_BATCH_WINDOW_MS', '15'))
+MATRIX_MAX_ORIGINS = 25
+MATRIX_MAX_DESTINATIONS = 25
+MATRIX_MAX_ELEMENTS = int(os.getenv('MATRIX_MAX_ELEMENTS', '100'))
+# Distance Matrix bills per element: merging stars may add at most this many unused elements per needed one
+MATRIX_MAX_WASTE = float(os.getenv('MATRIX_MAX_WASTE', '0.5'))
+
+
+@dataclass(eq=False)
+class BatchedLeg:
+    """One leg waiting for a batch: where it goes, caller metadata, and the Future the caller holds"""
+    fetch: object                   # fetch(group, origins, dests, legs) that runs its call
+    group: tuple                    # (mode, departure group, background?)
+    origin: str                     # "lat,lng"
+    dest: str
+    meta: tuple                     # opaque to the batcher; handed back to the fetch function
+    priority: int
+    max_wait_s: float | None
+    future: Future = field(default_factory=Future)
+    trace: object = None
+    queued_at: float = 0.0
+
+
+def plan_calls(legs, max_origins=MATRIX_MAX_ORIGINS, max_dests=MATRIX_MAX_DESTINATIONS,
+               max_elements=MATRIX_MAX_ELEMENTS, max_waste=MATRIX_MAX_WASTE):
+    """Split one group's legs into matrix calls: [(origins, dests, legs)], with every leg in exactly one call"""
+    star_limit = min(max(max_origins, max_dests), max_elements)
+    by_origin, by_dest = defaultdict(list), defaultdict(list)
+    for leg in legs:
+        by_origin[leg.origin].append(leg)
+        by_dest[leg.dest].append(leg)
+
+    # Greedy cover by stars: the shared origin or destination with the most uncovered legs goes first
+    remaining = set(legs)
+    stars = []
+    while remaining:
+        best = max(list(by_origin.values()) + list(by_dest.values()),
+                   key=lambda group: sum(1 for leg in group if leg in remaining))
+        taken = [leg for leg in best if leg in remaining][:star_limit]
+        remaining.difference_update(taken)
+        stars.append(taken)
+
+    # First-fit packing of stars into calls whose origins × destinations stay within the limits
+    calls = []
+    for star in sorted(stars, key=len, reverse=True):
+        star_origins = {leg.origin for leg in star}
+        star_dests = {leg.dest for leg in star}
+        for call in calls:
+            origins, dests = call[0] | star_origins, call[1] | star_dests
+            elements = len(origins) * len(dests)
+            needed = len(call[3] | {(leg.origin, leg.dest) for leg in star})
+            if len(origins) <= max_origins and len(dests) <= max_dests and elements <= max_elements \
+                    and elements <= needed * (1 + max_waste):
+                call[0], call[1] = origins, dests
+                call[2].extend(star)
+                call[3].update((leg.origin, leg.dest) for leg in star)
+                break
+        else:
+            calls.append([star_origins, star_dests, list(star), {(leg.origin, leg.dest) for leg in star}])
+    return [(sorted(origins), sorted(dests), call_legs) for origins, dests, call_legs, _ in calls]
+
+
+class LegBatcher:
+    """Collects legs for window_ms, then submits them to the scheduler as shared matrix calls.
+
+    Each leg names the fetch(group, origins, dests, legs) that runs its call; only legs with the same
+    fetch share a call. It runs on a dispatch thread and returns one result dict per leg (or a single
+    error dict for the whole call, e.g. OVER_QUERY_LIMIT so the scheduler retries it).
+    """
+
+    def __init__(self, scheduler, window_ms=MAPS_BATCH_WINDOW_MS):
+        self.scheduler = scheduler
+        self.window_s = window_ms / 1000
+        self._pending = []
+        self._cond = threading.Condition()
+        self._started_pid = None
+
+    @property
+    def enabled(self):
+        return self.window_s > 0
+
+    def submit(self, fetch, group, origin, dest, meta, priority, max_wait_s=None):
+        """Future for one leg, resolved when its batch call returns"""
+        self._ensure_started()
+        leg = BatchedLeg(fetch, group, origin, dest, meta, priority, max_wait_s, trace=current_trace(),
+                         queued_at=time.perf_counter())
+        with self._cond:
+            self._pending.append(leg)
+            self._cond.notify()
+        metrics.incr('maps_legs_batched')
+        return leg.future
+
+    def _ensure_started(self):
+        # The flush thread is started lazily in each worker process (never before a fork)
+        if self._started_pid == os.getpid():
+            return
+        with self._cond:
+            if self._started_pid == os.getpid():
+                return
+            self._pending = []
+            threading.Thread(target=self._flush_loop, name='maps-batcher', daemon=True).start()
+            self._started_pid = os.getpid()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            # The first leg opens the window; everything that arrives during it shares the calls
+            time.sleep(self.window_s)
+            with self._cond:
+                legs, self._pending = self._pending, []
+            self._flush(legs)
+
+    def _flush(self, legs):
+        groups = defaultdict(list)
+        for leg in legs:
+            if not leg.future.cancelled():
+                groups[leg.fetch, leg.group].append(leg)
+        for (fetch, group), group_legs in groups.items():
+            for origins, dests, call_legs in plan_calls(group_legs):
+                self._submit_call(fetch, group, origins, dests, call_legs)
+
+    def _submit_call(self, fetch, group, origins, dests, legs):
+        max_waits = [leg.max_wait_s for leg in legs]
+        max_wait_s = None if None in max_waits else max(max_waits)
+        call = self.scheduler.submit(self._run_call, fetch, group, origins, dests, legs,
+                                     priority=min(leg.priority for leg in legs), max_wait_s=max_wait_s)
+        metrics.incr('maps_batch_calls')
+        metrics.incr('maps_batch_elements', len(origins) * len(dests))
+
+        def fan_out(call_future):
+            if call_future.cancelled():
+                return
+            results = call_future.result() if call_future.exception() is None else {
+                'success': False, 'error': str(call_future.exception())}
+            for i, leg in enumerate(legs):
+                _resolve(leg.future, results if isinstance(results, dict) else results[i])
+        call.add_done_callback(fan_out)
+
+        # A call whose legs were all cancelled (superseded search, deadline) is dropped from the queue
+        def leg_done(_):
+            if all(leg.future.cancelled() for leg in legs):
+                call.cancel()
+        for leg in legs:
+            leg.future.add_done_callback(leg_done)
+
+    def _run_call(self, fetch, group, origins, dests, legs):
+        started = time.perf_counter()
+        try:
+            return fetch(group, origins, dests, legs)
+        finally:
+            finished = time.perf_counter()
+            for trace in {leg.trace for leg in legs if leg.trace is not None}:
+                mine = [leg for leg in legs if leg.trace is trace]
+                trace.add('maps.queue', min(leg.queued_at for leg in mine), started, mode=group[0], legs=len(mine))
+                trace.add('maps.fetch', started, finished, mode=group[0], legs=len(mine), call_legs=len(legs),
+                          elements=len(origins) * len(dests))
+
+
+def departure_group(mode, departure_time, bucket, priority):
+    """Batch group of a leg: taxi legs only share calls within one departure bucket"""
+    departure = '-' if mode == 'walking' else ('now' if departure_time is None else bucket)
+    return mode, departure, priority >= PRIORITY_BACKGROUND
+
+
+# One batcher (and flush thread) per process, shared by every finder on the default scheduler -
+# a reloaded network's new finder keeps using it, and legs of all cities share one window
+leg_batcher = LegBatcher(maps_scheduler)
+
+
+def legs_per_call():
+    calls = metrics.get('maps_batch_calls')
+    return round(metrics.get('maps_legs_batched') / calls, 2) if calls else None
+
+
+metrics.set_gauge('maps_legs_per_batch_call', legs_per_call)
@@ -0,0 +1,179 @@
+# Bengaluru Metro Journey Planner - Leg & Plan Caches
+# Access legs and finished plans are cached by snapped location cell and
+# traffic bucket:
+#   - free points (rider origin/destination) snap to a ~110 m grid cell;
+#   - station endpoints use their exact coordinates (a coordinate fix in the
+#     network data therefore never serves a stale leg);
+#   - taxi legs are keyed by 30-minute traffic bucket and expire when the
+#     bucket ends; walking legs are bucket-less and live for a week.
+# Each cache is an in-process LRU in front of an optional SQLite file shared
+# by every worker on the host, which is also what the warm-up job fills.
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from bengaluru_metrics import metrics
+
+
+CELL_DEG = float(os.getenv('LEG_CACHE_CELL_DEG', '0.001'))           # ~110 m
+TRAFFIC_BUCKET_S = 30 * 60
+WALKING_TTL_S = 7 * 24 * 3600
+LEG_CACHE_MAX_ENTRIES = int(os.getenv('LEG_CACHE_MAX_ENTRIES', '50000'))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv('PLAN_CACHE_MAX_ENTRIES', '5000'))
+# Shared SQLite file; set LEG_CACHE_DB='' to keep caches process-local
+LEG_CACHE_DB = os.getenv('LEG_CACHE_DB', os.path.join(tempfile.gettempdir(), 'bengaluru_leg_cache.sqlite3'))
+
+
+def snap_cell(lat, lng):
+    """Grid cell key for a free point (rider origin/destination)"""
+    return f"c{round(lat / CELL_DEG)}:{round(lng / CELL_DEG)}"
+
+
+def station_point(lat, lng):
+    """Exact key for a station endpoint"""
+    return f"s{lat:.6f},{lng:.6f}"
+
+
+def traffic_bucket(departure_time=None):
+    """Absolute 30-minute traffic bucket for a departure (epoch seconds; None = now)"""
+    return int((departure_time if departure_time is not None else time.time()) // TRAFFIC_BUCKET_S)
+
+
+def bucket_start(bucket):
+    """Epoch seconds at which a traffic bucket starts"""
+    return bucket * TRAFFIC_BUCKET_S
+
+
+def bucket_end(bucket):
+    """Epoch seconds at which a traffic bucket ends"""
+    return (bucket + 1) * TRAFFIC_BUCKET_S
+
+
+def leg_key(mode, origin_key, dest_key, bucket):
+    """Cache key for one access leg (walking legs ignore the traffic bucket)"""
+    return f"{mode}|{origin_key}|{dest_key}|{'-' if mode == 'walking' else bucket}"
+
+
+def leg_expiry(mode, bucket):
+    """When a freshly fetched leg stops being valid"""
+    if mode == 'walking':
+        return time.time() + WALKING_TTL_S
+    return bucket_end(bucket)
+
+
+def plan_key(network, initial_lat, initial_lng, dest_lat, dest_lng, bucket):
+    """Cache key for a whole plan; includes the network fingerprint so reloaded data never serves stale plans"""
+    return f"{network.key}:{network.fingerprint}|{snap_cell(initial_lat, initial_lng)}|{snap_cell(dest_lat, dest_lng)}|{bucket}"
+
+
+class TieredCache:
+    """In-process LRU (with per-entry expiry) in front of an optional shared SQLite table"""
+
+    def __init__(self, name, max_entries, db_path=LEG_CACHE_DB):
+        self.name = name
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._puts = 0
+
+    def _db(self):
+        """This thread's SQLite connection (None when the shared tier is disabled or unavailable)"""
+        if not self.db_path:
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=2, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'CREATE TABLE IF NOT EXISTS {self.name} '
+                         '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+        except sqlite3.Error as e:
+            print(f"⚠️ {self.name} cache: shared tier unavailable ({e})")
+            self.db_path = None
+            return None
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key, count=True):
+        """Cached value for key, or None (count=False skips hit/miss metrics)"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    if count:
+                        metrics.incr(f'{self.name}_hits')
+                    return entry[1]
+                del self._memory[key]
+
+        value = None
+        conn = self._db()
+        if conn is not None:
+            try:
+                row = conn.execute(f'SELECT value, expires_at FROM {self.name} WHERE key = ? AND expires_at > ?',
+                                   (key, now)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+        if count:
+            metrics.incr(f'{self.name}_shared_hits' if value is not None else f'{self.name}_misses')
+        return value
+
+    def put(self, key, value, expires_at):
+        """Store value until expires_at (epoch seconds) in both tiers"""
+        self._remember(key, value, expires_at)
+        conn = self._db()
+        if conn is None:
+            return
+        try:
+            conn.execute(f'INSERT OR REPLACE INTO {self.name} (key, value, expires_at) VALUES (?, ?, ?)',
+                         (key, json.dumps(value), expires_at))
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                conn.execute(f'DELETE FROM {self.name} WHERE expires_at <= ?', (time.time(),))
+        except sqlite3.Error as e:
+            print(f"⚠️ {self.name} cache write failed: {e}")
+
+    def values(self):
+        """Every unexpired value, from the shared tier when there is one (else this process's)"""
+        now = time.time()
+        conn = self._db()
+        if conn is not None:
+            try:
+                rows = conn.execute(f'SELECT value FROM {self.name} WHERE expires_at > ?', (now,)).fetchall()
+                return [json.loads(row[0]) for row in rows]
+            except sqlite3.Error as e:
+                print(f"⚠️ {self.name} cache read failed: {e}")
+        with self._lock:
+            return [value for expires_at, value in self._memory.values() if expires_at > now]
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def __len__(self):
+        return len(self._memory)
+
+
+leg_cache = TieredCache('leg_cache', LEG_CACHE_MAX_ENTRIES)
+plan_cache = TieredCache('plan_cache', PLAN_CACHE_MAX_ENTRIES)
+
+metrics.set_gauge('leg_cache_entries', lambda: len(leg_cache))
+metrics.set_gauge('plan_cache_entries', lambda: len(plan_cache))
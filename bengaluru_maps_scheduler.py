@@ -0,0 +1,304 @@
+# Bengaluru Metro Journey Planner - Maps Request Scheduler
+# Every outgoing Google Maps request goes through one process-wide scheduler:
+#   - a token bucket (QPS + daily budget) whose state is a small file shared by
+#     all worker processes on the host, so workers throttle together;
+#   - a priority queue, so the direct taxi and the nearest (most likely to
+#     win) station legs are sent first;
+#   - load shedding: low-value legs that waited too long, or arrive while the
+#     daily budget is nearly spent, are answered with a SHED result instead of
+#     failing at random upstream;
+#   - OVER_QUERY_LIMIT from Google backs the shared bucket off and retries.
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import os
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from bengaluru_metrics import metrics
+
+try:
+    import fcntl
+except ImportError:  # non-POSIX: the bucket is shared by threads of this process only
+    fcntl = None
+
+
+# Priorities (lower runs first). Station legs use PRIORITY_STATION_LEG + candidate rank.
+PRIORITY_DIRECT = 0
+PRIORITY_STATION_LEG = 1
+PRIORITY_BACKGROUND = 50
+
+# Host-wide: shared by every worker, warm-up and return-trip speculation. The default is Google's standard
+# per-project limit for the Directions and Distance Matrix APIs (3,000 requests/minute); set MAPS_QPS to the
+# project's actual quota (render.yaml sets it explicitly) - too low a value throttles and sheds live traffic.
+MAPS_QPS = float(os.getenv('MAPS_QPS', '50'))
+MAPS_BURST = float(os.getenv('MAPS_BURST', str(MAPS_QPS)))
+MAPS_DAILY_BUDGET = int(os.getenv('MAPS_DAILY_BUDGET', '0'))          # 0 = unlimited
+MAPS_BUDGET_RESERVE = float(os.getenv('MAPS_BUDGET_RESERVE', '0.1'))  # last 10% kept for high-value legs
+MAPS_DISPATCH_THREADS = int(os.getenv('MAPS_DISPATCH_THREADS', '8'))
+MAPS_SHED_PRIORITY = int(os.getenv('MAPS_SHED_PRIORITY', '5'))        # priority >= this is low-value
+MAPS_MAX_WAIT_LOW_S = float(os.getenv('MAPS_MAX_WAIT_LOW_S', '1.5'))
+MAPS_MAX_WAIT_S = float(os.getenv('MAPS_MAX_WAIT_S', '8'))
+MAPS_BUCKET_PATH = os.getenv('MAPS_BUCKET_PATH', os.path.join(tempfile.gettempdir(), 'bengaluru_maps_bucket.bin'))
+
+OVER_QUERY_LIMIT_BACKOFF_S = 1.0
+OVER_QUERY_LIMIT_RETRIES = 2
+
+
+class SharedTokenBucket:
+    """QPS token bucket plus daily request budget, shared across processes through a locked file"""
+
+    # tokens, last_refill, day number, requests used today, backoff_until
+    _STATE = struct.Struct('ddqqd')
+
+    def __init__(self, path, qps, burst, daily_budget):
+        self.path = path
+        self.qps = qps
+        self.burst = max(burst, 1.0)
+        self.daily_budget = daily_budget
+        self._thread_lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            # Open per process: flock on a descriptor inherited across fork() would not exclude siblings
+            if self._pid != os.getpid():
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                self._pid = os.getpid()
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _read(self, now):
+        data = os.pread(self._fd, self._STATE.size, 0)
+        if len(data) < self._STATE.size:
+            return [self.burst, now, self._day(now), 0, 0.0]
+        state = list(self._STATE.unpack(data))
+        if state[2] != self._day(now):
+            state[2], state[3] = self._day(now), 0
+        return state
+
+    def _write(self, state):
+        os.pwrite(self._fd, self._STATE.pack(*state), 0)
+
+    @staticmethod
+    def _day(now):
+        return int((now + time.localtime(now).tm_gmtoff) // 86400)
+
+    def try_acquire(self):
+        """Take one request token: (True, 0), (False, seconds to wait) or (False, None) if the day's budget is spent"""
+        now = time.time()
+        with self._locked():
+            tokens, last_refill, day, used, backoff_until = self._read(now)
+            if self.daily_budget and used >= self.daily_budget:
+                return False, None
+            if now < backoff_until:
+                return False, backoff_until - now
+            tokens = min(self.burst, tokens + (now - last_refill) * self.qps)
+            granted = tokens >= 1
+            if granted:
+                tokens -= 1
+                used += 1
+            self._write([tokens, now, day, used, backoff_until])
+        return (True, 0.0) if granted else (False, (1 - tokens) / self.qps)
+
+    def budget_remaining(self):
+        """Requests left in today's budget (None when unlimited)"""
+        if not self.daily_budget:
+            return None
+        with self._locked():
+            state = self._read(time.time())
+        return max(self.daily_budget - state[3], 0)
+
+    def tokens_available(self):
+        """Current token count (after refill), for monitoring"""
+        now = time.time()
+        with self._locked():
+            tokens, last_refill = self._read(now)[:2]
+        return round(min(self.burst, tokens + (now - last_refill) * self.qps), 2)
+
+    def backoff(self, seconds):
+        """Stop all processes from sending for `seconds` (after an OVER_QUERY_LIMIT)"""
+        now = time.time()
+        with self._locked():
+            state = self._read(now)
+            state[0] = 0.0
+            state[1] = now
+            state[4] = max(state[4], now + seconds)
+            self._write(state)
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    fn: object = field(compare=False)
+    args: tuple = field(compare=False)
+    future: Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    max_wait_s: float | None = field(default=None, compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class MapsScheduler:
+    """Priority queue + dispatcher threads that send Maps requests as the shared bucket allows"""
+
+    def __init__(self, bucket, dispatch_threads=MAPS_DISPATCH_THREADS, shed_priority=MAPS_SHED_PRIORITY,
+                 max_wait_low_s=MAPS_MAX_WAIT_LOW_S, max_wait_s=MAPS_MAX_WAIT_S, budget_reserve=MAPS_BUDGET_RESERVE):
+        self.bucket = bucket
+        self.dispatch_threads = dispatch_threads
+        self.shed_priority = shed_priority
+        self.max_wait_low_s = max_wait_low_s
+        self.max_wait_s = max_wait_s
+        self.budget_reserve = budget_reserve
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._started_pid = None
+
+        metrics.set_gauge('maps_queue_depth', lambda: len(self._queue))
+        metrics.set_gauge('maps_tokens_available', self.bucket.tokens_available)
+        metrics.set_gauge('maps_daily_budget_remaining', self.bucket.budget_remaining)
+
+    def submit(self, fn, *args, priority=PRIORITY_BACKGROUND, max_wait_s=None):
+        """Queue fn(*args) (a Maps call returning a leg dict, or a list of them for a batched
+        matrix call) and return a Future for its result.
+
+        max_wait_s overrides how long the job may queue before it is shed
+        (float('inf') for background work that should wait for quota instead).
+        """
+        self._ensure_started()
+        future = Future()
+        job = _Job(priority, next(self._seq), fn, args, future, time.monotonic(), max_wait_s)
+        with self._cond:
+            heapq.heappush(self._queue, job)
+            self._cond.notify()
+        metrics.incr('maps_requests_queued')
+        return future
+
+    def _ensure_started(self):
+        # Threads are started lazily in each worker process (never before a fork)
+        if self._started_pid == os.getpid():
+            return
+        with self._cond:
+            if self._started_pid == os.getpid():
+                return
+            self._queue = []
+            for i in range(self.dispatch_threads):
+                threading.Thread(target=self._dispatch_loop, name=f"maps-dispatch-{i}", daemon=True).start()
+            self._started_pid = os.getpid()
+
+    def _budget_low(self):
+        remaining = self.bucket.budget_remaining()
+        return remaining is not None and remaining < self.budget_reserve * self.bucket.daily_budget
+
+    def _shed_reason(self, job):
+        """Why job should be dropped instead of sent (None to send it)"""
+        if job.future.cancelled():
+            return 'CANCELLED'
+        waited = time.monotonic() - job.enqueued_at
+        if job.max_wait_s is not None:
+            max_wait_s = job.max_wait_s
+        else:
+            max_wait_s = self.max_wait_low_s if job.priority >= self.shed_priority else self.max_wait_s
+        if waited > max_wait_s:
+            return 'SHED'
+        if job.priority >= self.shed_priority and self._budget_low():
+            return 'SHED'
+        return None
+
+    def _shed(self, job, reason):
+        if reason == 'CANCELLED' or job.future.cancelled():
+            metrics.incr('maps_requests_cancelled')
+            return
+        metrics.incr('maps_requests_shed')
+        _resolve(job.future, {'success': False, 'error': reason, 'shed': True})
+
+    def _next_job(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job = heapq.heappop(self._queue)
+            reason = self._shed_reason(job)
+            if reason is None:
+                return job
+            self._shed(job, reason)
+
+    def _swap_for_better(self, job):
+        """While waiting for a token, let a newly queued higher-priority job go first"""
+        with self._cond:
+            if self._queue and self._queue[0] < job:
+                job = heapq.heappushpop(self._queue, job)
+        return job
+
+    def _dispatch_loop(self):
+        while True:
+            job = self._next_job()
+            while job is not None:
+                granted, wait_s = self.bucket.try_acquire()
+                if granted:
+                    break
+                if wait_s is None:
+                    self._shed(job, 'OVER_DAILY_BUDGET')
+                    job = None
+                    break
+                time.sleep(min(wait_s, 0.05))
+                job = self._swap_for_better(job)
+                reason = self._shed_reason(job)
+                if reason is not None:
+                    self._shed(job, reason)
+                    job = None
+            if job is not None:
+                self._execute(job)
+
+    def _execute(self, job):
+        if job.future.cancelled():
+            metrics.incr('maps_requests_cancelled')
+            return
+        metrics.incr('maps_requests_sent')
+        metrics.incr('maps_queue_wait_ms', int((time.monotonic() - job.enqueued_at) * 1000))
+        try:
+            result = job.fn(*job.args)
+        except Exception as e:
+            try:
+                job.future.set_exception(e)
+            except InvalidStateError:
+                pass
+            return
+
+        if isinstance(result, dict) and result.get('error') == 'OVER_QUERY_LIMIT':
+            metrics.incr('maps_over_query_limit')
+            self.bucket.backoff(OVER_QUERY_LIMIT_BACKOFF_S)
+            if job.attempts < OVER_QUERY_LIMIT_RETRIES:
+                job.attempts += 1
+                metrics.incr('maps_requests_retried')
+                with self._cond:
+                    heapq.heappush(self._queue, job)
+                    self._cond.notify()
+                return
+        _resolve(job.future, result)
+
+
+def _resolve(future, result):
+    """Set a result unless the caller already cancelled the future"""
+    try:
+        future.set_result(result)
+    except InvalidStateError:
+        metrics.incr('maps_requests_cancelled')
+
+
+maps_scheduler = MapsScheduler(SharedTokenBucket(MAPS_BUCKET_PATH, MAPS_QPS, MAPS_BURST, MAPS_DAILY_BUDGET))
@@ -0,0 +1,50 @@
+# Bengaluru Metro Journey Planner - Process Metrics
+# Thread-safe counters and gauges for this worker process, exposed as JSON
+# at /metrics. Each gunicorn worker reports its own numbers.
+
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+
+
+class Metrics:
+    """Named counters plus gauges that are either set directly or computed on read"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(int)
+        self._gauges = {}
+
+    def incr(self, name, value=1):
+        """Add value to counter name"""
+        with self._lock:
+            self._counters[name] += value
+
+    def get(self, name):
+        """Current value of counter name"""
+        return self._counters.get(name, 0)
+
+    def set_gauge(self, name, value):
+        """Set gauge name to a value, or to a zero-argument callable evaluated on snapshot"""
+        self._gauges[name] = value
+
+    def ratio(self, numerator, denominator):
+        """numerator / denominator counters (None until the denominator is non-zero)"""
+        total = self.get(denominator)
+        return round(self.get(numerator) / total, 4) if total else None
+
+    def snapshot(self):
+        """Counters and evaluated gauges as a plain dict"""
+        with self._lock:
+            counters = dict(self._counters)
+        gauges = {}
+        for name, value in list(self._gauges.items()):
+            try:
+                gauges[name] = value() if callable(value) else value
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        return {'counters': counters, 'gauges': gauges}
+
+
+metrics = Metrics()
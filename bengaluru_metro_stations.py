@@ -255,6 +255,59 @@ STATION_PLACE_IDS = {
 }
 
 
+# Other names riders use for a station (station search / autocomplete)
+STATION_ALIASES = {
+    "Whitefield (Kadugodi)": ["Whitefield", "Kadugodi"],
+    "Sri Sathya Sai Hospital": ["Sathya Sai Hospital"],
+    "Krishnarajapura": ["KR Puram", "K R Puram"],
+    "Baiyappanahalli": ["Byappanahalli"],
+    "Swami Vivekananda Road": ["SV Road"],
+    "Mahatma Gandhi Road": ["MG Road", "M G Road"],
+    "Dr. B. R. Ambedkar Station, Vidhana Soudha": ["Vidhana Soudha"],
+    "Sir M. Visvesvaraya Station, Central College": ["Central College", "Visvesvaraya"],
+    "Nadaprabhu Kempegowda Station, Majestic": ["Majestic", "Kempegowda", "KBS"],
+    "Krantivira Sangolli Rayanna Railway Station": ["City Railway Station", "Bengaluru City Junction", "SBC"],
+    "Sri Balagangadharanatha Swamiji Station, Hosahalli": ["Hosahalli"],
+    "Pantharapalya–Nayandahalli": ["Nayandahalli", "Pantharapalya"],
+    "Rajarajeshwari Nagar": ["RR Nagar"],
+    "Kengeri Bus Terminal": ["Kengeri TTMC"],
+    "Peenya Industry": ["Peenya Industrial Area"],
+    "Mahakavi Kuvempu Road": ["Kuvempu Road"],
+    "Mantri Square Sampige Road": ["Mantri Mall", "Sampige Road", "Malleswaram"],
+    "Krishna Rajendra Market": ["KR Market", "City Market"],
+    "Rashtreeya Vidyalaya Road": ["RV Road"],
+    "Jaya Prakash Nagar": ["JP Nagar"],
+    "Central Silk Board": ["Silk Board", "CSB"],
+    "Infosys Foundation Konappana Agrahara": ["Konappana Agrahara"],
+    "Biocon Hebbagodi": ["Hebbagodi"],
+    "Delta Electronics Bommasandra": ["Bommasandra"],
+}
+
+# Common landmarks → the station that serves them (coordinates come from STATION_COORDINATES)
+LANDMARKS = {
+    "ITPL": "Pattandur Agrahara",
+    "Phoenix Marketcity": "Singayyanapalya",
+    "Indiranagar 100 Feet Road": "Indiranagar",
+    "Brigade Road": "Mahatma Gandhi Road",
+    "Commercial Street": "Mahatma Gandhi Road",
+    "UB City": "Cubbon Park",
+    "Chinnaswamy Stadium": "Cubbon Park",
+    "High Court of Karnataka": "Dr. B. R. Ambedkar Station, Vidhana Soudha",
+    "Majestic Bus Stand": "Nadaprabhu Kempegowda Station, Majestic",
+    "Orion Mall": "Sandal Soap Factory",
+    "ISKCON Temple": "Mahalakshmi",
+    "Yeshwanthpur Railway Station": "Yeshwanthpur",
+    "Gandhi Bazaar": "National College",
+    "Lalbagh Botanical Garden": "Lalbagh",
+    "Banashankari Temple": "Banashankari",
+    "Silk Board Junction": "Central Silk Board",
+    "HSR Layout": "Central Silk Board",
+    "Electronic City Phase 1": "Electronic City",
+    "Infosys Electronic City": "Infosys Foundation Konappana Agrahara",
+    "Biocon Park": "Biocon Hebbagodi",
+}
+
+
 if __name__ == "__main__":
     print("BENGALURU METRO STATIONS VERIFICATION")
     print("=" * 50)
@@ -283,6 +336,10 @@ if __name__ == "__main__":
     else:
         print("All station coordinates present.")
 
+    unknown = [s for s in list(STATION_ALIASES) + list(LANDMARKS.values()) if s not in STATION_COORDINATES]
+    print(f"\nAliases: {sum(len(v) for v in STATION_ALIASES.values())}, landmarks: {len(LANDMARKS)}"
+          f"{' (unknown stations: ' + ', '.join(unknown) + ')' if unknown else ''}")
+
     print("\nInterchanges:")
     for st, lines in INTERCHANGE_STATIONS.items():
         print(f"- {st}: {lines[0]} <-> {lines[1]}")
@@ -0,0 +1,357 @@
+# Bengaluru Metro Journey Planner - Network Scaling Benchmark
+# The pair table stores every station pair (about 6,800 rows for today's
+# three lines) and grows quadratically as lines open. This generates
+# synthetic METRO_LINES-style networks (straight lines crossing near the
+# centre, an interchange wherever two lines cross, times from the city's
+# average speed, dwell and interchange characteristics) with 100-2,000
+# stations and matching pair tables, and measures for each size:
+#   - load:    reading the pair CSV and building the MetroNetwork arrays
+#   - memory:  pair table arrays kept in memory, and the peak while building
+#   - nearest: nearest-station lookup (per query)
+#   - metro:   pair table lookup (per query)
+#   - scoring: the RouteGrid for one trip (7×7 candidates, ranked, top routes built)
+# Candidates and their estimated access legs come from a BengaluruStationFinder
+# on the network under test (nearest_candidates / estimate_leg), so the
+# numbers follow the production code; no Maps call is made.
+# The real Bengaluru network is measured the same way as a reference row.
+#
+#   python bengaluru_network_bench.py --sizes 100 500 1000 2000 --save bench.json
+#   python bengaluru_network_bench.py --baseline bench.json     # exit 1 on a regression
+#
+# Pair tables are cached in BENCH_DIR, so repeat runs skip generation.
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from metro_networks import BENGALURU, CitySpec, MetroNetwork
+from bengaluru_metro_stations import BENGALURU_METRO_CHARACTERISTICS
+from bengaluru_station_finder import BengaluruStationFinder, RouteGrid, STATION_CANDIDATES
+
+
+BENCH_DIR = os.getenv('BENCH_DIR', os.path.join(tempfile.gettempdir(), 'bengaluru_network_bench'))
+BENCH_SIZES = (100, 250, 500, 1000, 2000)
+BENCH_QUERIES = 2000                  # nearest-station and metro lookups per size
+BENCH_TRIPS = 200                     # scored trips per size
+BENCH_REGRESSION_FACTOR = 1.5         # slower/bigger than baseline by more than this fails --baseline
+STATION_SPACING_KM = 1.1
+CENTRE = (12.9716, 77.5946)
+PAIR_COLUMNS = ['start_station', 'end_station', 'directions_time_min', 'same_line', 'interchange_station',
+                'metro_distance_km', 'start_line', 'end_line', 'transfer_count']
+
+
+def _to_latlng(x_km, y_km):
+    lat = CENTRE[0] + y_km / 111.32
+    lng = CENTRE[1] + x_km / (111.32 * math.cos(math.radians(CENTRE[0])))
+    return round(lat, 6), round(lng, 6)
+
+
+def synthetic_metro(stations, lines=None, seed=7):
+    """(STATION_COORDINATES, METRO_LINES, INTERCHANGE_STATIONS) for a synthetic network of about `stations` stations.
+
+    Lines are straight chords through the city centre at spread-out angles and offsets; wherever two lines
+    cross, the crossing becomes an interchange station on both.
+    """
+    lines = lines or max(3, stations // 40)
+    rng = random.Random(seed)
+    per_line = max(2, stations // lines)
+    half = (per_line - 1) * STATION_SPACING_KM / 2
+
+    # Each line: point p + t·d for t in [-half, half] (km from the centre)
+    geometry = []
+    for k in range(lines):
+        angle = math.pi * k / lines + rng.uniform(-0.1, 0.1)
+        direction = (math.cos(angle), math.sin(angle))
+        offset = rng.uniform(-0.25, 0.25) * half
+        geometry.append(((-direction[1] * offset, direction[0] * offset), direction))
+
+    # Stops per line as (t, name); interchanges first, then regular stations not too close to one
+    stops = [[] for _ in range(lines)]
+    interchanges = {}
+    for a in range(lines):
+        for b in range(a + 1, lines):
+            (pa, da), (pb, db) = geometry[a], geometry[b]
+            cross = da[0] * db[1] - da[1] * db[0]
+            if abs(cross) < 1e-9:
+                continue
+            dx, dy = pb[0] - pa[0], pb[1] - pa[1]
+            ta = (dx * db[1] - dy * db[0]) / cross
+            tb = (dx * da[1] - dy * da[0]) / cross
+            if abs(ta) <= half and abs(tb) <= half:
+                name = f"Interchange {a + 1}/{b + 1}"
+                interchanges[name] = ([f"Line {a + 1}", f"Line {b + 1}"],
+                                      _to_latlng(pa[0] + ta * da[0], pa[1] + ta * da[1]))
+                stops[a].append((ta, name))
+                stops[b].append((tb, name))
+
+    coordinates = {}
+    metro_lines = {}
+    for k, ((p, d), line_stops) in enumerate(zip(geometry, stops)):
+        crossings = [t for t, _ in line_stops]
+        for i in range(per_line):
+            t = -half + i * STATION_SPACING_KM
+            if all(abs(t - c) >= STATION_SPACING_KM / 2 for c in crossings):
+                name = f"L{k + 1} Station {i + 1}"
+                coordinates[name] = _to_latlng(p[0] + t * d[0], p[1] + t * d[1])
+                line_stops.append((t, name))
+        line_name = f"Line {k + 1}"
+        metro_lines[line_name] = {'name': line_name, 'stations': [name for _, name in sorted(line_stops)]}
+    for name, (_, latlng) in interchanges.items():
+        coordinates[name] = latlng
+    return coordinates, metro_lines, {name: served for name, (served, _) in interchanges.items()}
+
+
+def _km(a, b):
+    """Planar distance on the synthetic grid (generation only; it matches _to_latlng)"""
+    dlat = (a[0] - b[0]) * 111.32
+    dlng = (a[1] - b[1]) * 111.32 * math.cos(math.radians(CENTRE[0]))
+    return math.hypot(dlat, dlng)
+
+
+def _short(line):
+    return line.removesuffix(' Line')
+
+
+def pair_table(coordinates, metro_lines, characteristics=BENGALURU_METRO_CHARACTERISTICS):
+    """Every station pair's fastest metro route (Dijkstra over station × line states), as a pair-CSV DataFrame"""
+    speed = characteristics.get('avg_speed_kmph', 33)
+    dwell_min = characteristics.get('dwell_time_s', 25) / 60
+    interchange_min = characteristics.get('interchange_time_minutes_default', 5)
+
+    # States are (station, line); riding moves along a line, transferring changes line at a shared station
+    state_ids = {}
+    for line, info in metro_lines.items():
+        for station in info['stations']:
+            state_ids[(station, line)] = len(state_ids)
+    states = list(state_ids)
+    ride = [[] for _ in states]
+    for line, info in metro_lines.items():
+        for a, b in zip(info['stations'], info['stations'][1:]):
+            km = _km(coordinates[a], coordinates[b])
+            minutes = km / speed * 60 + dwell_min
+            ride[state_ids[(a, line)]].append((state_ids[(b, line)], minutes, km))
+            ride[state_ids[(b, line)]].append((state_ids[(a, line)], minutes, km))
+    served = {}
+    for station, line in states:
+        served.setdefault(station, []).append(state_ids[(station, line)])
+
+    names = list(coordinates)
+    columns = {column: [] for column in PAIR_COLUMNS}
+    for source in names:
+        # Label per state: (time, km, transfers as ((station, from_line, to_line), ...), start line)
+        best = {}
+        heap = []
+        for state in served[source]:
+            best[state] = (0.0, 0.0, (), states[state][1])
+            heap.append((0.0, state))
+        heapq.heapify(heap)
+        while heap:
+            minutes, state = heapq.heappop(heap)
+            label = best[state]
+            if minutes > label[0]:
+                continue
+            station, line = states[state]
+            moves = [(nxt, m, km, label[2]) for nxt, m, km in ride[state]]
+            moves += [(other, interchange_min, 0.0, label[2] + ((station, line, states[other][1]),))
+                      for other in served[station] if other != state]
+            for nxt, m, km, transfers in moves:
+                if minutes + m < best.get(nxt, (math.inf,))[0]:
+                    best[nxt] = (minutes + m, label[1] + km, transfers, label[3])
+                    heapq.heappush(heap, (minutes + m, nxt))
+        for target in names:
+            if target == source:
+                continue
+            state = min(served[target], key=lambda s: best.get(s, (math.inf,))[0])
+            if state not in best:
+                continue
+            minutes, km, transfers, start_line = best[state]
+            end_line = states[state][1]
+            if len(transfers) == 1:
+                interchange = transfers[0][0]
+            elif transfers:
+                sequence = '→'.join([_short(transfers[0][1])] + [_short(to) for _, _, to in transfers])
+                points = ';'.join(f"{at}({_short(a)}↔{_short(b)})" for at, a, b in transfers)
+                interchange = f"{sequence}|{points}"
+            else:
+                interchange = ''
+            columns['start_station'].append(source)
+            columns['end_station'].append(target)
+            columns['directions_time_min'].append(round(minutes, 1))
+            columns['same_line'].append(not transfers)
+            columns['interchange_station'].append(interchange)
+            columns['metro_distance_km'].append(round(km, 3))
+            columns['start_line'].append(start_line)
+            columns['end_line'].append(end_line)
+            columns['transfer_count'].append(len(transfers))
+    return pd.DataFrame(columns, columns=PAIR_COLUMNS)
+
+
+class SyntheticCity:
+    """A generated network written to disk like a real city (stations + pair CSV)"""
+
+    def __init__(self, stations, lines=None, seed=7, directory=BENCH_DIR):
+        self.coordinates, self.metro_lines, self.interchanges = synthetic_metro(stations, lines, seed)
+        self.key = f"synthetic-{stations}-{len(self.metro_lines)}-{seed}"
+        self.spec = CitySpec(key=self.key, name=f"Synthetic {stations}", stations_module='',
+                             pairs_csv=os.path.join(directory, f"{self.key}.csv"), characteristics_name='')
+        self.generate_s = None
+        if not os.path.exists(self.spec.pairs_csv):
+            os.makedirs(directory, exist_ok=True)
+            started = time.perf_counter()
+            df = pair_table(self.coordinates, self.metro_lines)
+            self.generate_s = time.perf_counter() - started
+            df.to_csv(self.spec.pairs_csv + '.tmp', index=False)
+            os.replace(self.spec.pairs_csv + '.tmp', self.spec.pairs_csv)
+
+    def build(self, pairs_df):
+        return MetroNetwork(self.spec, self.coordinates, self.metro_lines, self.interchanges,
+                            BENGALURU_METRO_CHARACTERISTICS, pairs_df)
+
+
+def _pair_table_bytes(pairs):
+    return sum(array.nbytes for array in (pairs.present, pairs.time, pairs.distance, pairs.transfer_count,
+                                          pairs.same_line, pairs.interchange_idx, pairs.start_line_idx,
+                                          pairs.end_line_idx))
+
+
+def _trip_inputs(finder, o_lat, o_lng, d_lat, d_lng):
+    """(origin candidates, dest candidates, origin legs, dest legs) as the finder builds them, legs estimated"""
+    origin = finder.nearest_candidates(o_lat, o_lng, STATION_CANDIDATES)
+    dest = finder.nearest_candidates(d_lat, d_lng, STATION_CANDIDATES)
+    origin_legs = [finder.estimate_leg(o_lat, o_lng, station.lat, station.lng, station.mode) for station in origin]
+    dest_legs = [finder.estimate_leg(station.lat, station.lng, d_lat, d_lng, station.mode) for station in dest]
+    return origin, dest, origin_legs, dest_legs
+
+
+def measure(label, build, csv_path, stations_hint=None, seed=1):
+    """Timings and memory for one network (build: DataFrame → MetroNetwork)"""
+    started = time.perf_counter()
+    pairs_df = pd.read_csv(csv_path)
+    network = build(pairs_df)
+    load_s = time.perf_counter() - started
+
+    tracemalloc.start()
+    build(pairs_df)
+    build_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    rng = random.Random(seed)
+    lat_range = (float(network.lats.min()), float(network.lats.max()))
+    lng_range = (float(network.lngs.min()), float(network.lngs.max()))
+    points = [(rng.uniform(*lat_range), rng.uniform(*lng_range)) for _ in range(BENCH_QUERIES)]
+
+    started = time.perf_counter()
+    for lat, lng in points:
+        network.nearest_station_ids(lat, lng, STATION_CANDIDATES)
+    nearest_us = (time.perf_counter() - started) / len(points) * 1e6
+
+    n = len(network.station_names)
+    pairs = [(rng.randrange(n), rng.randrange(n)) for _ in range(BENCH_QUERIES)]
+    started = time.perf_counter()
+    for i, j in pairs:
+        network.pairs.lookup(i, j)
+    metro_us = (time.perf_counter() - started) / len(pairs) * 1e6
+
+    finder = BengaluruStationFinder(network)
+    trips = [_trip_inputs(finder, o_lat, o_lng, d_lat, d_lng)
+             for (o_lat, o_lng), (d_lat, d_lng) in zip(points[:BENCH_TRIPS], points[BENCH_TRIPS:2 * BENCH_TRIPS])]
+    started = time.perf_counter()
+    for origin, dest, origin_legs, dest_legs in trips:
+        grid = RouteGrid(network.pairs, origin, dest, origin_legs, dest_legs)
+        ranking = grid.ranked(grid.total_convenience_score, grid.valid, descending=True)
+        [grid.route(i, j) for i, j in ranking[:10]]
+    scoring_us = (time.perf_counter() - started) / len(trips) * 1e6
+
+    return {
+        'network': label,
+        'stations': n,
+        'lines': len(network.metro_lines),
+        'pairs': len(network.pairs),
+        'csv_mb': round(os.path.getsize(csv_path) / 2 ** 20, 2),
+        'load_ms': round(load_s * 1000, 1),
+        'pair_table_mb': round(_pair_table_bytes(network.pairs) / 2 ** 20, 2),
+        'build_peak_mb': round(build_peak / 2 ** 20, 2),
+        'nearest_us': round(nearest_us, 2),
+        'metro_lookup_us': round(metro_us, 2),
+        'scoring_us': round(scoring_us, 1),
+    }
+
+
+def run_benchmark(sizes=BENCH_SIZES, lines=None, include_real=True):
+    """Measure the real network (reference) and a synthetic network per size"""
+    results = []
+    if include_real:
+        results.append(measure(BENGALURU.key, lambda df: MetroNetwork(
+            BENGALURU, *_real_stations(), BENGALURU_METRO_CHARACTERISTICS, df),
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), BENGALURU.pairs_csv)))
+        _print_row(results[-1])
+    for size in sizes:
+        city = SyntheticCity(size, lines)
+        if city.generate_s is not None:
+            print(f"🧪 Generated {city.key}: {len(city.coordinates)} stations in {city.generate_s:.1f} s")
+        results.append(measure(city.key, city.build, city.spec.pairs_csv))
+        _print_row(results[-1])
+    return results
+
+
+def _real_stations():
+    import bengaluru_metro_stations as module
+    return module.STATION_COORDINATES, module.METRO_LINES, module.INTERCHANGE_STATIONS
+
+
+METRICS = ('load_ms', 'pair_table_mb', 'build_peak_mb', 'nearest_us', 'metro_lookup_us', 'scoring_us')
+
+
+def _print_row(row):
+    print(f"📏 {row['network']:<24} {row['stations']:>5} stations {row['lines']:>3} lines {row['pairs']:>9} pairs | "
+          + ' '.join(f"{metric}={row[metric]}" for metric in METRICS))
+
+
+def regressions(results, baseline, factor=BENCH_REGRESSION_FACTOR):
+    """Metrics worse than factor × the baseline run for the same network"""
+    previous = {row['network']: row for row in baseline}
+    found = []
+    for row in results:
+        before = previous.get(row['network'])
+        if before is None:
+            continue
+        for metric in METRICS:
+            if before.get(metric) and row[metric] > factor * before[metric]:
+                found.append(f"{row['network']}: {metric} {before[metric]} → {row[metric]}")
+    return found
+
+
+if __name__ == '__main__':
+    # The finder requires a key, but the benchmark never calls Maps
+    os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'unused-by-benchmark')
+    parser = argparse.ArgumentParser(description='Benchmark network load, memory and lookups as the metro grows')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(BENCH_SIZES), help='synthetic station counts')
+    parser.add_argument('--lines', type=int, default=None, help='lines per synthetic network (default: stations // 40)')
+    parser.add_argument('--no-real', action='store_true', help='skip the real network reference row')
+    parser.add_argument('--save', help='write the results as JSON')
+    parser.add_argument('--baseline', help='compare against saved results; exit 1 on a regression')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.lines, not args.no_real)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Saved {len(results)} rows to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f))
+        for line in found:
+            print(f"❌ Regression: {line}")
+        if found:
+            raise SystemExit(1)
+        print(f"✅ No metric worse than {BENCH_REGRESSION_FACTOR}× the baseline")
@@ -0,0 +1,71 @@
+# Bengaluru Metro Journey Planner - Plan Tokens
+# A finished plan keeps its working state (station candidates per side, the
+# access legs fetched for them and the direct taxi leg) under a short-lived
+# opaque token returned with the routes. Follow-up requests for the same trip
+# start from that state instead of redoing the full station × station search:
+# /replan as the rider moves, and /more_routes, which widens the candidate
+# stations and fetches only the new legs. Stored in a TieredCache, so any
+# worker on the host can pick up a token another worker issued. With sharding
+# on, tokens are prefixed with the issuing node's ID so follow-ups are routed
+# back to it.
+
+from __future__ import annotations
+
+import os
+import time
+import uuid
+from dataclasses import asdict
+
+from bengaluru_leg_cache import TieredCache, snap_cell, traffic_bucket
+from bengaluru_sharding import PLANNER_SELF, node_id
+
+
+PLAN_TOKEN_TTL_S = int(os.getenv('PLAN_TOKEN_TTL_S', '900'))
+PLAN_TOKEN_MAX_ENTRIES = int(os.getenv('PLAN_TOKEN_MAX_ENTRIES', '5000'))
+
+
+def plan_state(network, initial_lat, initial_lng, dest_lat, dest_lng, departure_time, initial_stations,
+               dest_stations, origin_legs, dest_legs, direct_taxi, routes_shown):
+    """JSON-serializable working state of one plan"""
+    return {
+        'network': f"{network.key}:{network.fingerprint}",
+        'origin': [initial_lat, initial_lng],
+        'origin_cell': snap_cell(initial_lat, initial_lng),
+        'dest': [dest_lat, dest_lng],
+        'departure_time': departure_time,
+        'bucket': traffic_bucket(departure_time),
+        'initial_stations': [asdict(station) for station in initial_stations],
+        'dest_stations': [asdict(station) for station in dest_stations],
+        'origin_legs': list(origin_legs),
+        'dest_legs': list(dest_legs),
+        'direct_taxi': direct_taxi,
+        'routes_shown': routes_shown,
+    }
+
+
+class PlanStore:
+    """Token → plan state, expiring after PLAN_TOKEN_TTL_S"""
+
+    def __init__(self, cache, ttl_s=PLAN_TOKEN_TTL_S, prefix=''):
+        self.cache = cache
+        self.ttl_s = ttl_s
+        self.prefix = prefix
+
+    def save(self, state):
+        """Store a plan state under a new token"""
+        token = f"{self.prefix}{uuid.uuid4().hex}"
+        self.cache.put(token, state, time.time() + self.ttl_s)
+        return token
+
+    def load(self, token, network):
+        """Plan state for a token issued on this network (None if unknown, expired or from other data)"""
+        if not token:
+            return None
+        state = self.cache.get(token)
+        if state is None or state['network'] != f"{network.key}:{network.fingerprint}":
+            return None
+        return state
+
+
+plan_store = PlanStore(TieredCache('plan_tokens', PLAN_TOKEN_MAX_ENTRIES),
+                       prefix=f"{node_id(PLANNER_SELF)}." if PLANNER_SELF else '')
@@ -0,0 +1,258 @@
+# Bengaluru Metro Journey Planner - On-demand Request Profiling
+# Opt-in CPU + memory captures for individual /find_routes requests, triggered
+# by an admin request header (X-Profile: cpu | sample) or by a sampling rate
+# (PROFILE_SAMPLE_RATE). A capture records either:
+#   - cpu:    cProfile of the request thread (time blocked on Maps futures
+#             shows up as waiting in as_completed / Future.result), or
+#   - sample: a statistical sampler over the request thread and the Maps
+#             dispatch threads, written as folded stacks for flame graphs;
+# plus a tracemalloc diff for the request. Files go to PROFILE_DIR and are
+# listed at /debug/profiles. With no header and a zero rate nothing is wrapped.
+
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+from bengaluru_metrics import metrics
+
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'bengaluru_profiles'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))     # fraction of requests captured
+PROFILE_SAMPLED_MODE = os.getenv('PROFILE_SAMPLED_MODE', 'sample')     # mode used for rate-triggered captures
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))                    # newest captures kept on disk
+PROFILE_HEADER = 'X-Profile'
+PROFILE_MODES = ('cpu', 'sample')
+
+SAMPLER_INTERVAL_S = 0.005
+TRACEMALLOC_FRAMES = 10
+TOP_STATS = 40
+
+
+class StackSampler:
+    """Samples the stacks of a set of threads every interval into folded-stack counts"""
+
+    def __init__(self, thread_ids, thread_name_prefixes=('maps-dispatch',), interval_s=SAMPLER_INTERVAL_S):
+        self.thread_ids = set(thread_ids)
+        self.thread_name_prefixes = thread_name_prefixes
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _watched(self):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        watched = {ident: names.get(ident, 'request') for ident in self.thread_ids}
+        for ident, name in names.items():
+            if name.startswith(self.thread_name_prefixes):
+                watched[ident] = name
+        return watched
+
+    def _run(self):
+        watched = self._watched()
+        while not self._stop.wait(self.interval_s):
+            frames = sys._current_frames()
+            for ident, name in watched.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                # Group dispatch threads together; they are interchangeable
+                thread_label = 'maps-dispatch' if name.startswith('maps-dispatch') else 'request'
+                self.stacks[';'.join([thread_label] + stack[::-1])] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        """Folded stacks ('frame;frame;frame count' per line), for flamegraph.pl / speedscope"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class ProfileCapture:
+    """Context manager capturing one request's CPU profile and allocations"""
+
+    def __init__(self, profiler, mode, trigger, label):
+        self.profiler = profiler
+        self.mode = mode
+        self.trigger = trigger
+        self.label = label
+        self.capture_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._cpu = None
+        self._sampler = None
+        self._started_tracing = False
+        self.saved = False              # True once the capture files are written
+
+    def __enter__(self):
+        try:
+            self._start()
+        except Exception:
+            self.profiler.release()
+            raise
+        return self
+
+    def _start(self):
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._memory_before = tracemalloc.take_snapshot()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        if self.mode == 'cpu':
+            self._cpu = cProfile.Profile()
+            self._cpu.enable()
+        else:
+            self._sampler = StackSampler([threading.get_ident()])
+            self._sampler.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._cpu is not None:
+                self._cpu.disable()
+            if self._sampler is not None:
+                self._sampler.stop()
+            wall_ms = (time.perf_counter() - self._wall_start) * 1000
+            cpu_ms = (time.thread_time() - self._cpu_start) * 1000
+            memory_after = tracemalloc.take_snapshot()
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+            if self._started_tracing:
+                tracemalloc.stop()
+            # A failed write (disk full, directory removed) loses the capture, never the request
+            try:
+                self._write(wall_ms, cpu_ms, peak_kb, memory_after)
+                self.saved = True
+            except OSError as e:
+                metrics.incr('profiles_write_failed')
+                print(f"⚠️ Profile {self.capture_id} not saved to {self.profiler.directory}: {e}")
+        finally:
+            self.profiler.release()
+        return False
+
+    def _write(self, wall_ms, cpu_ms, peak_kb, memory_after):
+        base = os.path.join(self.profiler.directory, self.capture_id)
+        files = []
+
+        if self._cpu is not None:
+            self._cpu.dump_stats(f"{base}.pstats")
+            summary = io.StringIO()
+            pstats.Stats(self._cpu, stream=summary).sort_stats('cumulative').print_stats(TOP_STATS)
+            with open(f"{base}.cpu.txt", 'w') as f:
+                f.write(summary.getvalue())
+            files += [f"{self.capture_id}.pstats", f"{self.capture_id}.cpu.txt"]
+        if self._sampler is not None:
+            with open(f"{base}.folded", 'w') as f:
+                f.write(self._sampler.folded())
+            files.append(f"{self.capture_id}.folded")
+
+        allocations = memory_after.compare_to(self._memory_before, 'lineno')
+        with open(f"{base}.memory.txt", 'w') as f:
+            f.write(f"Peak traced memory: {peak_kb:.1f} KiB\n\n")
+            for stat in allocations[:TOP_STATS]:
+                f.write(f"{stat}\n")
+        files.append(f"{self.capture_id}.memory.txt")
+
+        meta = {
+            'id': self.capture_id,
+            'label': self.label,
+            'mode': self.mode,
+            'trigger': self.trigger,
+            'captured_at': time.time(),
+            'wall_ms': round(wall_ms, 1),
+            'request_thread_cpu_ms': round(cpu_ms, 1),
+            'samples': self._sampler.samples if self._sampler is not None else None,
+            'peak_memory_kb': round(peak_kb, 1),
+            'files': files,
+        }
+        with open(f"{base}.json", 'w') as f:
+            json.dump(meta, f)
+        metrics.incr('profiles_captured')
+        print(f"🔬 Profile {self.capture_id} ({self.mode}, {meta['wall_ms']} ms) saved to {self.profiler.directory}")
+        self.profiler.prune()
+
+
+class RequestProfiler:
+    """Decides which requests to capture (one at a time) and manages the capture directory"""
+
+    def __init__(self, directory=PROFILE_DIR, sample_rate=PROFILE_SAMPLE_RATE, keep=PROFILE_KEEP):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self._busy = threading.Lock()
+
+    def capture_for(self, header_value, header_allowed, label):
+        """A ProfileCapture if this request should be profiled, else None (the fast path)"""
+        if header_value and header_allowed:
+            mode, trigger = header_value.strip().lower(), 'header'
+            if mode not in PROFILE_MODES:
+                mode = 'cpu'
+        elif self.sample_rate and random.random() < self.sample_rate:
+            mode, trigger = PROFILE_SAMPLED_MODE, 'sampled'
+        else:
+            return None
+
+        # Before taking the lock: a profile directory that cannot be created must not leave it held
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+        except OSError as e:
+            metrics.incr('profiles_skipped_unwritable')
+            print(f"⚠️ Profile directory {self.directory} unavailable ({e}) - request not profiled")
+            return None
+
+        # tracemalloc and the sampler are process-wide: never run two captures at once
+        if not self._busy.acquire(blocking=False):
+            metrics.incr('profiles_skipped_busy')
+            return None
+        try:
+            return ProfileCapture(self, mode, trigger, label)
+        except Exception:
+            self._busy.release()
+            raise
+
+    def release(self):
+        self._busy.release()
+
+    def index(self):
+        """Metadata of the stored captures, newest first"""
+        captures = []
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else []:
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        captures.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(captures, key=lambda meta: meta['captured_at'], reverse=True)
+
+    def prune(self):
+        """Delete all but the newest `keep` captures"""
+        for meta in self.index()[self.keep:]:
+            for name in meta['files'] + [f"{meta['id']}.json"]:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,200 @@
+# Bengaluru Metro Journey Planner - Response Model & Serialization
+# Typed result records for /find_routes plus the fast JSON/compression path.
+# Routes are built from clean, typed values (no pandas NaN can leak in), so
+# the response never needs a recursive NaN-scrubbing pass before encoding.
+
+from __future__ import annotations
+
+import gzip
+import json
+import math
+from dataclasses import dataclass, field, fields
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used when orjson is missing
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only when brotli is missing
+    brotli = None
+
+
+# Journey time constants shared by the scorer and the compact response
+TRANSFER_TIME_MIN = 3            # per metro line change
+ACCESS_TRANSFER_TIME_MIN = 6     # 3 min entering + 3 min leaving the metro
+
+# Response schema versions: 1 = full (legacy), 2 = compact
+RESPONSE_VERSION_FULL = 1
+RESPONSE_VERSION_COMPACT = 2
+
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+def finite(value, default=0.0):
+    """Return value as a float, replacing NaN/inf/None with default"""
+    if value is None:
+        return default
+    value = float(value)
+    return value if math.isfinite(value) else default
+
+
+@dataclass(slots=True)
+class ConvenienceRoute:
+    """One scored station-pair route (origin station → destination station)"""
+    initial: str
+    destination: str
+    leg1_distance: float
+    leg2_distance: float
+    leg1_mode: str
+    leg2_mode: str
+    total_access_distance: float
+    leg1_time: str
+    leg2_time: str
+    leg1_time_min: float
+    leg2_time_min: float
+    total_access_time: float
+    metro_distance: float
+    metro_time: float
+    metro_interchange_time: float
+    access_metro_interchange_time: float
+    total_journey_time: float
+    metro_score: float
+    access_score: float
+    total_convenience_score: float
+    same_line: bool
+    interchange: str
+    transfer_count: int
+    initial_line: str
+    dest_line: str
+
+    def to_dict(self):
+        """Full (version 1) representation, identical to the legacy route dict"""
+        return {name: getattr(self, name) for name in _ROUTE_FIELDS}
+
+    def to_compact(self):
+        """Compact (version 2) representation.
+
+        Drops everything the frontend can derive: display strings, totals,
+        interchange times (from the response constants) and same_line
+        (transfer_count == 0). Floats are rounded to what the UI shows.
+        """
+        return {
+            'initial': self.initial,
+            'destination': self.destination,
+            'initial_line': self.initial_line,
+            'dest_line': self.dest_line,
+            'interchange': self.interchange,
+            'transfer_count': self.transfer_count,
+            'leg1_mode': self.leg1_mode,
+            'leg2_mode': self.leg2_mode,
+            'leg1_distance': round(self.leg1_distance, 2),
+            'leg2_distance': round(self.leg2_distance, 2),
+            'leg1_time_min': round(self.leg1_time_min, 2),
+            'leg2_time_min': round(self.leg2_time_min, 2),
+            'metro_distance': round(self.metro_distance, 2),
+            'metro_time': round(self.metro_time, 1),
+            'score': round(self.total_convenience_score, 1),
+        }
+
+
+_ROUTE_FIELDS = tuple(f.name for f in fields(ConvenienceRoute))
+
+
+@dataclass(slots=True)
+class DirectTaxiSuggestion:
+    """Outcome of the direct-taxi rules check"""
+    suggest: bool
+    reasons: list = field(default_factory=list)
+    direct_distance: float | None = None
+    direct_time: float | None = None
+    time_saving: float | None = None
+    mode: str = 'taxi'
+    trivial: str | None = None      # trivial-trip kind when no multimodal routes were computed
+
+    def to_dict(self):
+        """Full representation; rule-less results keep the legacy two-key shape"""
+        if self.direct_distance is None:
+            return {'suggest': self.suggest, 'reasons': self.reasons}
+        data = {
+            'suggest': self.suggest,
+            'reasons': self.reasons,
+            'direct_distance': self.direct_distance,
+            'direct_time': self.direct_time,
+            'time_saving': self.time_saving,
+        }
+        if self.trivial:
+            data['mode'] = self.mode
+            data['trivial'] = self.trivial
+        return data
+
+    def to_compact(self):
+        """Compact representation with rounded numbers"""
+        data = self.to_dict()
+        for key in ('direct_distance', 'direct_time', 'time_saving'):
+            if data.get(key) is not None:
+                data[key] = round(data[key], 2)
+        return data
+
+
+def build_route_response(convenience_routes, direct_taxi_suggestion, version=RESPONSE_VERSION_FULL, plan_token=None):
+    """Build the /find_routes payload in the requested schema version"""
+    payload = _route_payload(convenience_routes, direct_taxi_suggestion, version)
+    if plan_token:
+        payload['plan_token'] = plan_token
+    return payload
+
+
+def _route_payload(convenience_routes, direct_taxi_suggestion, version):
+    if version == RESPONSE_VERSION_COMPACT:
+        return {
+            'status': 'success',
+            'v': RESPONSE_VERSION_COMPACT,
+            'constants': {
+                'transfer_time_min': TRANSFER_TIME_MIN,
+                'access_transfer_time_min': ACCESS_TRANSFER_TIME_MIN,
+            },
+            'convenience_routes': [route.to_compact() for route in convenience_routes],
+            'direct_taxi_suggestion': direct_taxi_suggestion.to_compact() if direct_taxi_suggestion else None,
+        }
+    return {
+        'status': 'success',
+        'convenience_routes': [route.to_dict() for route in convenience_routes],
+        'direct_taxi_suggestion': direct_taxi_suggestion.to_dict() if direct_taxi_suggestion else None,
+    }
+
+
+def serialize_json(payload):
+    """Serialize payload to compact UTF-8 JSON bytes (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), allow_nan=False).encode('utf-8')
+
+
+def negotiate_encoding(accept_encoding):
+    """Pick the best supported Content-Encoding from an Accept-Encoding header"""
+    accepted = set()
+    for part in (accept_encoding or '').split(','):
+        token, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(token.strip().lower())
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress_body(body, accept_encoding):
+    """Compress body for the client; returns (body, content_encoding or None)"""
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    encoding = negotiate_encoding(accept_encoding)
+    if encoding == 'br':
+        return brotli.compress(body, quality=5), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
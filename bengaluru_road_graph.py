@@ -0,0 +1,549 @@
+# Bengaluru Metro Journey Planner - Local Road Graph Routing
+# A routing backend that answers taxi and walking legs from a road graph on
+# disk instead of the Google Directions API (ROUTING_BACKEND=local):
+#   - the graph is built once from an OpenStreetMap extract (.osm XML) into an
+#     .npz file: node coordinates plus, per profile (drive / walk), a
+#     contraction hierarchy - every node ranked, shortcut edges added - stored
+#     as compact CSR arrays (int32 targets, float32 seconds and metres);
+#   - a leg snaps both ends to the nearest routable node (grid index) and runs
+#     a bidirectional upward Dijkstra over the hierarchy, which settles only a
+#     few hundred nodes per query.
+# Build limits, measured with `scale` on synthetic grids on one core (a real
+# Bengaluru extract has not been measured yet):
+#   - read_osm streams the XML into flat arrays and keeps only nodes of
+#     routable ways: 1M road nodes + 2M other nodes (357 MB of XML) read in
+#     ~110 s at ~760 MB peak RSS;
+#   - contract() is pure Python and superlinear, dominated by the walk
+#     profile: 2,500 nodes 7 s / 51 MB, 10,000 nodes 62 s / 99 MB,
+#     22,500 nodes 17 min / 196 MB.
+# A whole-city extract (10^5-10^6 road nodes) is therefore out of reach: clip
+# the extract to the area served (e.g. osmium extract --bbox) so it stays under
+# ROAD_GRAPH_MAX_BUILD_NODES, which `build` enforces unless --force is given.
+# Drive times use typical Bengaluru speeds per road class; there is no live
+# traffic, so legs report "Typical Traffic".
+#
+#   python bengaluru_road_graph.py build --osm bengaluru.osm --out bengaluru_road_graph.npz
+#   python bengaluru_road_graph.py check          # synthetic graph: hierarchy vs plain Dijkstra
+#   python bengaluru_road_graph.py scale --size 100 --extra-nodes 40000   # build time / peak RSS
+#   python bengaluru_road_graph.py route 12.9716 77.5946 12.9352 77.6245
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import math
+import os
+import random
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from array import array
+
+import numpy as np
+
+
+ROUTING_BACKEND = os.getenv('ROUTING_BACKEND', 'google')            # google | local
+ROAD_GRAPH_PATH = os.getenv('ROAD_GRAPH_PATH', 'bengaluru_road_graph.npz')
+ROAD_GRAPH_MAX_BUILD_NODES = int(os.getenv('ROAD_GRAPH_MAX_BUILD_NODES', '15000'))   # see build limits above
+
+PROFILES = ('drive', 'walk')
+# Typical (congested) Bengaluru speeds by OSM highway class, km/h
+DRIVE_SPEEDS_KMPH = {
+    'motorway': 45, 'motorway_link': 30, 'trunk': 30, 'trunk_link': 22, 'primary': 24, 'primary_link': 18,
+    'secondary': 20, 'secondary_link': 16, 'tertiary': 18, 'tertiary_link': 15, 'unclassified': 15,
+    'residential': 14, 'living_street': 8, 'service': 10, 'road': 14,
+}
+WALK_HIGHWAYS = set(DRIVE_SPEEDS_KMPH) - {'motorway', 'motorway_link', 'trunk_link'} | {
+    'footway', 'pedestrian', 'path', 'steps', 'track', 'cycleway'}
+WALK_SPEED_KMPH = 4.8
+CONNECTOR_SPEED_KMPH = {'drive': 10.0, 'walk': WALK_SPEED_KMPH}     # point ↔ snapped node
+SNAP_CELL_DEG = 0.005               # ~550 m grid for nearest-node lookup
+MAX_SNAP_KM = 2.0                   # farther from any road: no route
+WITNESS_SETTLE_LIMIT = 60           # local search budget while contracting (more = fewer shortcuts)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km (works on numpy arrays too)"""
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 6371.0 * 2 * np.arcsin(np.sqrt(a))
+
+
+def contract(node_count, edges):
+    """Contraction hierarchy for directed edges (u, v, seconds, metres).
+
+    Returns (rank, up, down): up[v] / down[v] map higher-ranked neighbours to (seconds, metres) for
+    edges v → w and w → v respectively, original and shortcut, as they stood when v was contracted.
+    """
+    out = [dict() for _ in range(node_count)]
+    inn = [dict() for _ in range(node_count)]
+    for u, v, seconds, metres in edges:
+        if u != v and (v not in out[u] or seconds < out[u][v][0]):
+            out[u][v] = inn[v][u] = (seconds, metres)
+
+    contracted = bytearray(node_count)
+    deleted_neighbours = [0] * node_count
+
+    def witness_distances(source, excluded, limit):
+        dist = {source: 0.0}
+        heap = [(0.0, source)]
+        settled = 0
+        while heap and settled < WITNESS_SETTLE_LIMIT:
+            d, x = heapq.heappop(heap)
+            if d > limit:
+                break
+            if d > dist[x]:
+                continue
+            settled += 1
+            for y, (seconds, _) in out[x].items():
+                if y == excluded:
+                    continue
+                nd = d + seconds
+                if nd < dist.get(y, math.inf):
+                    dist[y] = nd
+                    heapq.heappush(heap, (nd, y))
+        return dist
+
+    def shortcuts(v):
+        needed = []
+        for u, (seconds_in, metres_in) in inn[v].items():
+            if not out[v]:
+                break
+            limit = seconds_in + max(seconds for seconds, _ in out[v].values())
+            dist = witness_distances(u, v, limit)
+            for w, (seconds_out, metres_out) in out[v].items():
+                if w != u and dist.get(w, math.inf) > seconds_in + seconds_out:
+                    needed.append((u, w, seconds_in + seconds_out, metres_in + metres_out))
+        return needed
+
+    def priority(v):
+        return len(shortcuts(v)) - len(inn[v]) - len(out[v]) + deleted_neighbours[v]
+
+    heap = [(priority(v), v) for v in range(node_count)]
+    heapq.heapify(heap)
+    rank = np.zeros(node_count, dtype=np.int32)
+    up = [None] * node_count
+    down = [None] * node_count
+    next_rank = 0
+    while heap:
+        _, v = heapq.heappop(heap)
+        if contracted[v]:
+            continue
+        # Lazy update: re-evaluate, and defer if the node is no longer the cheapest to contract
+        current = priority(v)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, v))
+            continue
+
+        for u, w, seconds, metres in shortcuts(v):
+            if w not in out[u] or seconds < out[u][w][0]:
+                out[u][w] = inn[w][u] = (seconds, metres)
+        up[v], down[v] = out[v], inn[v]
+        for w in out[v]:
+            del inn[w][v]
+            deleted_neighbours[w] += 1
+        for u in inn[v]:
+            del out[u][v]
+            deleted_neighbours[u] += 1
+        out[v], inn[v] = {}, {}
+        contracted[v] = 1
+        rank[v] = next_rank
+        next_rank += 1
+    return rank, up, down
+
+
+def _csr(adjacency):
+    """(offsets, targets, seconds, metres) arrays for a list of {target: (seconds, metres)} dicts"""
+    offsets = np.zeros(len(adjacency) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(neighbours) for neighbours in adjacency])
+    targets = np.fromiter((t for neighbours in adjacency for t in neighbours), dtype=np.int32, count=offsets[-1])
+    seconds = np.fromiter((s for neighbours in adjacency for s, _ in neighbours.values()), dtype=np.float32,
+                          count=offsets[-1])
+    metres = np.fromiter((m for neighbours in adjacency for _, m in neighbours.values()), dtype=np.float32,
+                         count=offsets[-1])
+    return offsets, targets, seconds, metres
+
+
+def profile_edges(lats, lngs, ways, profile):
+    """Directed (u, v, seconds, metres) edges of one profile from (node list, highway, oneway) ways"""
+    edges = []
+    for nodes, highway, oneway in ways:
+        if profile == 'drive':
+            if highway not in DRIVE_SPEEDS_KMPH:
+                continue
+            speed = DRIVE_SPEEDS_KMPH[highway]
+        else:
+            if highway not in WALK_HIGHWAYS:
+                continue
+            speed, oneway = WALK_SPEED_KMPH, False
+        for u, v in zip(nodes, nodes[1:]):
+            metres = float(haversine_km(lats[u], lngs[u], lats[v], lngs[v])) * 1000
+            seconds = metres / (speed / 3.6)
+            edges.append((u, v, seconds, metres))
+            if not oneway:
+                edges.append((v, u, seconds, metres))
+    return edges
+
+
+def build_graph(lats, lngs, ways, path, source=''):
+    """Contract both profiles of a road network and write the graph file"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    arrays = {'lats': lats.astype(np.float32), 'lngs': lngs.astype(np.float32)}
+    for profile in PROFILES:
+        started = time.time()
+        edges = profile_edges(lats, lngs, ways, profile)
+        mask = np.zeros(len(lats), dtype=bool)
+        for u, v, _, _ in edges:
+            mask[u] = mask[v] = True
+        rank, up, down = contract(len(lats), edges)
+        for direction, adjacency in (('up', up), ('down', down)):
+            offsets, targets, seconds, metres = _csr([neighbours or {} for neighbours in adjacency])
+            arrays.update({f'{profile}_{direction}_offsets': offsets, f'{profile}_{direction}_targets': targets,
+                           f'{profile}_{direction}_seconds': seconds, f'{profile}_{direction}_metres': metres})
+        arrays[f'{profile}_mask'] = mask
+        shortcut_count = len(arrays[f'{profile}_up_targets']) + len(arrays[f'{profile}_down_targets']) - len(edges)
+        print(f"🛣️ {profile}: {int(mask.sum())} nodes, {len(edges)} edges, {shortcut_count} shortcuts "
+              f"({time.time() - started:.1f}s)")
+    np.savez_compressed(path, built_at=time.time(), source=source, **arrays)
+
+
+def _osm_elements(path):
+    """Stream the top-level nodes and ways of an OSM XML file, freeing each once it has been used"""
+    root = None
+    for event, element in ElementTree.iterparse(path, events=('start', 'end')):
+        if root is None:
+            root = element
+        elif event == 'end' and element.tag in ('node', 'way', 'relation'):
+            if element.tag != 'relation':
+                yield element
+            root.clear()
+
+
+def read_osm(path):
+    """(lats, lngs, ways) from an OSM XML extract; only nodes of routable ways are kept, renumbered 0..n-1.
+
+    One streaming pass into flat arrays (24 bytes per node, 8 per way reference), then numpy keeps the
+    nodes the routable ways use - memory does not hold an element tree or a dict entry per node.
+    """
+    node_ids, node_lats, node_lngs = array('q'), array('d'), array('d')
+    refs, way_ends, way_classes = array('q'), array('q'), []
+    for element in _osm_elements(path):
+        if element.tag == 'node':
+            node_ids.append(int(element.get('id')))
+            node_lats.append(float(element.get('lat')))
+            node_lngs.append(float(element.get('lon')))
+            continue
+        tags = {child.get('k'): child.get('v') for child in element if child.tag == 'tag'}
+        highway = tags.get('highway')
+        if highway in DRIVE_SPEEDS_KMPH or highway in WALK_HIGHWAYS:
+            refs.extend(int(child.get('ref')) for child in element if child.tag == 'nd')
+            way_ends.append(len(refs))
+            oneway = tags.get('oneway') in ('yes', '1', 'true') or highway in ('motorway', 'motorway_link')
+            way_classes.append((sys.intern(highway), oneway))
+
+    ids = np.frombuffer(node_ids, dtype=np.int64) if node_ids else np.zeros(0, dtype=np.int64)
+    refs = np.frombuffer(refs, dtype=np.int64) if refs else np.zeros(0, dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+    ids = ids[order]
+    used = np.unique(refs)
+    # Referenced nodes missing from the extract (ways clipped at its edge) are dropped from their ways
+    positions = np.minimum(np.searchsorted(ids, used), max(len(ids) - 1, 0))
+    used = used[ids[positions] == used] if len(ids) else used[:0]
+    kept = order[np.searchsorted(ids, used)]
+    lats = np.frombuffer(node_lats, dtype=np.float64)[kept] if node_lats else np.zeros(0)
+    lngs = np.frombuffer(node_lngs, dtype=np.float64)[kept] if node_lngs else np.zeros(0)
+    del node_ids, node_lats, node_lngs, ids, order
+
+    positions = np.minimum(np.searchsorted(used, refs), max(len(used) - 1, 0))
+    renumbered = np.where(used[positions] == refs, positions, -1) if len(used) else np.full(len(refs), -1)
+    ways = []
+    start = 0
+    for end, (highway, oneway) in zip(way_ends, way_classes):
+        nodes = [node for node in renumbered[start:end].tolist() if node >= 0]
+        start = end
+        if len(nodes) > 1:
+            ways.append((nodes, highway, oneway))
+    return lats, lngs, ways
+
+
+def synthetic_network(rows=40, cols=40, spacing_m=150, origin=(12.95, 77.58), seed=7):
+    """Grid city for tests: arterials every 5th street, some one-way lanes, a motorway and a footpath"""
+    rng = random.Random(seed)
+    dlat = spacing_m / 111_320
+    dlng = spacing_m / (111_320 * math.cos(math.radians(origin[0])))
+    lats, lngs = [], []
+    for r in range(rows):
+        for c in range(cols):
+            lats.append(origin[0] + r * dlat + rng.uniform(-0.1, 0.1) * dlat)
+            lngs.append(origin[1] + c * dlng + rng.uniform(-0.1, 0.1) * dlng)
+
+    def node(r, c):
+        return r * cols + c
+
+    ways = []
+    for r in range(rows):
+        for c in range(cols - 1):
+            highway = 'primary' if r % 5 == 0 else 'residential'
+            oneway = highway == 'residential' and rng.random() < 0.15
+            ways.append(([node(r, c), node(r, c + 1)], highway, oneway))
+    for c in range(cols):
+        for r in range(rows - 1):
+            highway = 'secondary' if c % 5 == 0 else 'residential'
+            oneway = highway == 'residential' and rng.random() < 0.15
+            ways.append(([node(r, c), node(r + 1, c)], highway, oneway))
+    # A fast motorway across the middle (drive only) and a diagonal footpath (walk only)
+    ways.append(([node(rows // 2, c) for c in range(0, cols, 4)], 'motorway', False))
+    ways.append(([node(i, i) for i in range(min(rows, cols))], 'footway', False))
+    return lats, lngs, ways
+
+
+def write_osm(path, lats, lngs, ways, extra_nodes=0, seed=7):
+    """Write a network as OSM XML (plus extra_nodes untagged points, like building outlines) for read_osm"""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n')
+        for i, (lat, lng) in enumerate(zip(lats, lngs)):
+            f.write(f'<node id="{i + 1}" lat="{lat:.7f}" lon="{lng:.7f}"/>\n')
+        for i in range(extra_nodes):
+            f.write(f'<node id="{len(lats) + i + 1}" lat="{rng.choice(lats):.7f}" lon="{rng.choice(lngs):.7f}"/>\n')
+        for i, (nodes, highway, oneway) in enumerate(ways):
+            refs = ''.join(f'<nd ref="{node + 1}"/>' for node in nodes)
+            oneway_tag = '<tag k="oneway" v="yes"/>' if oneway else ''
+            f.write(f'<way id="{i + 1}">{refs}<tag k="highway" v="{highway}"/>{oneway_tag}</way>\n')
+        f.write('</osm>\n')
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, MB"""
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def build_osm(osm_path, out_path, force=False):
+    """read_osm + build_graph, reporting wall time and peak RSS; False if the extract is over the node limit"""
+    started = time.time()
+    lats, lngs, ways = read_osm(osm_path)
+    print(f"📦 {len(lats)} road nodes, {len(ways)} ways from {osm_path} "
+          f"({time.time() - started:.1f}s, peak RSS {peak_rss_mb():.0f} MB)")
+    if len(lats) > ROAD_GRAPH_MAX_BUILD_NODES and not force:
+        print(f"❌ Over ROAD_GRAPH_MAX_BUILD_NODES={ROAD_GRAPH_MAX_BUILD_NODES}: clip the extract, "
+              f"or pass --force to contract it anyway")
+        return False
+    build_graph(lats, lngs, ways, out_path, source=os.path.basename(osm_path))
+    print(f"✅ Wrote {out_path} ({time.time() - started:.1f}s total, peak RSS {peak_rss_mb():.0f} MB)")
+    return True
+
+
+class RoadGraph:
+    """A loaded graph file: nearest-node snapping and hierarchy queries per profile"""
+
+    def __init__(self, arrays):
+        self.lats = arrays['lats'].astype(np.float64)
+        self.lngs = arrays['lngs'].astype(np.float64)
+        self.built_at = float(arrays['built_at'])
+        self._profiles = {}
+        for profile in PROFILES:
+            self._profiles[profile] = {
+                direction: tuple(arrays[f'{profile}_{direction}_{name}']
+                                 for name in ('offsets', 'targets', 'seconds', 'metres'))
+                for direction in ('up', 'down')
+            }
+            self._profiles[profile]['snap'] = self._snap_index(np.flatnonzero(arrays[f'{profile}_mask']))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def _snap_index(self, nodes):
+        cells = {}
+        keys = zip(np.floor(self.lats[nodes] / SNAP_CELL_DEG).astype(int),
+                   np.floor(self.lngs[nodes] / SNAP_CELL_DEG).astype(int))
+        for node, key in zip(nodes.tolist(), keys):
+            cells.setdefault(key, []).append(node)
+        return {key: np.array(members, dtype=np.intp) for key, members in cells.items()}
+
+    def snap(self, lat, lng, profile):
+        """(node, km) of the nearest node routable in profile, or (None, None) beyond MAX_SNAP_KM"""
+        cells = self._profiles[profile]['snap']
+        row, col = math.floor(lat / SNAP_CELL_DEG), math.floor(lng / SNAP_CELL_DEG)
+        max_ring = math.ceil(MAX_SNAP_KM / (SNAP_CELL_DEG * 111)) + 1
+        best = (None, None)
+        for ring in range(max_ring + 1):
+            candidates = [cells[key] for key in ((row + dr, col + dc)
+                                                 for dr in range(-ring, ring + 1) for dc in range(-ring, ring + 1)
+                                                 if max(abs(dr), abs(dc)) == ring)
+                          if key in cells]
+            if candidates:
+                nodes = np.concatenate(candidates)
+                distances = haversine_km(lat, lng, self.lats[nodes], self.lngs[nodes])
+                i = int(np.argmin(distances))
+                if best[0] is None or distances[i] < best[1]:
+                    best = (int(nodes[i]), float(distances[i]))
+            # Anything in a further ring is at least `ring` cells away
+            if best[0] is not None and best[1] <= ring * SNAP_CELL_DEG * 111 * math.cos(math.radians(lat)):
+                break
+        if best[0] is None or best[1] > MAX_SNAP_KM:
+            return None, None
+        return best
+
+    def query(self, source, target, profile):
+        """(seconds, metres) of the fastest source → target path, or None if unreachable"""
+        if source == target:
+            return 0.0, 0.0
+        graphs = (self._profiles[profile]['up'], self._profiles[profile]['down'])
+        dist = ({source: (0.0, 0.0)}, {target: (0.0, 0.0)})
+        heaps = ([(0.0, source)], [(0.0, target)])
+        best = (math.inf, 0.0)
+        side = 0
+        while heaps[0] or heaps[1]:
+            # Alternate directions; a direction is done once its frontier cannot improve the best meeting
+            if not heaps[side] or heaps[side][0][0] >= best[0]:
+                side = 1 - side
+                if not heaps[side] or heaps[side][0][0] >= best[0]:
+                    break
+            d, x = heapq.heappop(heaps[side])
+            if d > dist[side][x][0]:
+                continue
+            other = dist[1 - side].get(x)
+            if other is not None and d + other[0] < best[0]:
+                best = (d + other[0], dist[side][x][1] + other[1])
+            offsets, targets, seconds, metres = graphs[side]
+            start, end = int(offsets[x]), int(offsets[x + 1])
+            for y, s, m in zip(targets[start:end].tolist(), seconds[start:end].tolist(), metres[start:end].tolist()):
+                nd = d + s
+                if nd < dist[side].get(y, (math.inf,))[0]:
+                    dist[side][y] = (nd, dist[side][x][1] + m)
+                    heapq.heappush(heaps[side], (nd, y))
+            side = 1 - side
+        return None if best[0] == math.inf else best
+
+    def leg(self, origin_lat, origin_lng, dest_lat, dest_lng, profile):
+        """Leg dict (same shape as a Directions API leg) for a drive or walk profile"""
+        source, source_km = self.snap(origin_lat, origin_lng, profile)
+        target, target_km = self.snap(dest_lat, dest_lng, profile)
+        if source is None or target is None:
+            return {'success': False, 'error': 'NOT_ON_ROAD_GRAPH'}
+        path = self.query(source, target, profile)
+        if path is None:
+            return {'success': False, 'error': 'ZERO_RESULTS'}
+
+        connector_km = source_km + target_km
+        duration_seconds = path[0] + connector_km / CONNECTOR_SPEED_KMPH[profile] * 3600
+        duration_min = int(duration_seconds // 60)
+        duration_sec = int(duration_seconds % 60)
+        result = {
+            'distance_km': path[1] / 1000 + connector_km,
+            'duration_min': duration_min,
+            'duration_sec': duration_sec,
+            'time_display': f"{duration_min} min" if duration_sec == 0 else f"{duration_min} min {duration_sec} sec",
+            'routing': 'local',
+            'success': True
+        }
+        if profile == 'drive':
+            result['traffic_status'] = "Typical Traffic"
+        return result
+
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def load_road_graph(path=ROAD_GRAPH_PATH):
+    """The graph at path, loaded once per process (None if the file is missing or unreadable)"""
+    with _load_lock:
+        if path not in _loaded:
+            try:
+                started = time.time()
+                _loaded[path] = RoadGraph.load(path)
+                print(f"🛣️ Loaded road graph {path} ({len(_loaded[path].lats)} nodes, {time.time() - started:.1f}s)")
+            except (OSError, KeyError, ValueError) as e:
+                print(f"⚠️ Road graph {path} unavailable ({e}) - using the Google Directions API")
+                _loaded[path] = None
+        return _loaded[path]
+
+
+def _dijkstra(node_count, edges, source, target):
+    """Plain Dijkstra on the original edges (reference for the self-check)"""
+    adjacency = [[] for _ in range(node_count)]
+    for u, v, seconds, metres in edges:
+        adjacency[u].append((v, seconds, metres))
+    dist = {source: (0.0, 0.0)}
+    heap = [(0.0, source)]
+    while heap:
+        d, x = heapq.heappop(heap)
+        if x == target:
+            return dist[x]
+        if d > dist[x][0]:
+            continue
+        for y, s, m in adjacency[x]:
+            if d + s < dist.get(y, (math.inf,))[0]:
+                dist[y] = (d + s, dist[x][1] + m)
+                heapq.heappush(heap, (d + s, y))
+    return None
+
+
+def self_check(pairs=300, path=None):
+    """Build the synthetic graph and compare hierarchy queries with plain Dijkstra"""
+    import tempfile
+    lats, lngs, ways = synthetic_network()
+    path = path or os.path.join(tempfile.gettempdir(), 'bengaluru_road_graph_check.npz')
+    build_graph(lats, lngs, ways, path, source='synthetic')
+    graph = RoadGraph.load(path)
+    rng = random.Random(1)
+    ok = True
+    for profile in PROFILES:
+        edges = profile_edges(np.array(lats), np.array(lngs), ways, profile)
+        routable = np.flatnonzero(np.isin(np.arange(len(lats)), [u for u, _, _, _ in edges])).tolist()
+        elapsed = 0.0
+        mismatches = 0
+        for _ in range(pairs):
+            source, target = rng.choice(routable), rng.choice(routable)
+            started = time.perf_counter()
+            fast = graph.query(source, target, profile)
+            elapsed += time.perf_counter() - started
+            reference = _dijkstra(len(lats), edges, source, target)
+            if (fast is None) != (reference is None) or (fast and abs(fast[0] - reference[0]) > 1e-3 * reference[0] + 0.01):
+                mismatches += 1
+        ok &= mismatches == 0
+        print(f"{'✅' if mismatches == 0 else '❌'} {profile}: {pairs} random pairs, {mismatches} mismatches, "
+              f"{elapsed / pairs * 1000:.3f} ms per query")
+    started = time.perf_counter()
+    leg = graph.leg(lats[0], lngs[0], lats[-1], lngs[-1], 'drive')
+    print(f"   corner-to-corner drive: {leg['distance_km']:.2f} km, {leg['time_display']} "
+          f"({(time.perf_counter() - started) * 1000:.2f} ms with snapping)")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build, check or query the local road graph')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='contract an OSM XML extract into a graph file')
+    build.add_argument('--osm', required=True)
+    build.add_argument('--out', default=ROAD_GRAPH_PATH)
+    build.add_argument('--force', action='store_true', help='build past ROAD_GRAPH_MAX_BUILD_NODES')
+    subparsers.add_parser('check', help='self-check on a synthetic graph')
+    scale = subparsers.add_parser('scale', help='time and peak RSS of a build from a synthetic OSM grid')
+    scale.add_argument('--size', type=int, default=100, help='grid side; nodes = size²')
+    scale.add_argument('--extra-nodes', type=int, default=0, help='untagged nodes written alongside the roads')
+    route = subparsers.add_parser('route', help='route one leg on the graph file')
+    route.add_argument('coordinates', nargs=4, type=float, metavar=('O_LAT', 'O_LNG', 'D_LAT', 'D_LNG'))
+    route.add_argument('--profile', choices=PROFILES, default='drive')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        raise SystemExit(0 if build_osm(args.osm, args.out, args.force) else 1)
+    elif args.command == 'scale':
+        import tempfile
+        osm_path = os.path.join(tempfile.gettempdir(), f'bengaluru_road_graph_{args.size}.osm')
+        write_osm(osm_path, *synthetic_network(args.size, args.size), extra_nodes=args.extra_nodes)
+        print(f"🧪 {args.size}x{args.size} synthetic grid, {args.extra_nodes} unrouted nodes: "
+              f"{os.path.getsize(osm_path) / 1e6:.0f} MB of OSM XML")
+        build_osm(osm_path, os.path.join(tempfile.gettempdir(), f'bengaluru_road_graph_{args.size}.npz'), force=True)
+    elif args.command == 'check':
+        raise SystemExit(0 if self_check() else 1)
+    else:
+        graph = load_road_graph(ROAD_GRAPH_PATH)
+        print(graph.leg(*args.coordinates, args.profile) if graph else 'No road graph')
@@ -0,0 +1,222 @@
+# Bengaluru Metro Journey Planner - Plan Sharding
+# Optional routing layer for several planner nodes behind a plain load
+# balancer. Each trip is owned by one node, chosen by consistent hashing of
+# its snapped origin/destination cells, so repeat and nearby trips always land
+# on the node whose leg and plan caches already hold them. A node that
+# receives a trip it does not own forwards it to the owner (one hop, marked
+# with X-Planner-Forwarded) and plans it locally if the owner is unreachable
+# or has not answered within the caller's budget (the plan deadline plus
+# SHARD_FORWARD_MARGIN_S, so a forward never holds a worker much longer than
+# a local plan would); unreachable owners leave the ring for a cool-down, slow
+# ones stay in it. Adding or removing a node
+# (PLANNER_NODES, POST /admin/ring) only moves the trips whose ring arc changed.
+#
+#   PLANNER_NODES=http://10.0.0.1:5002,http://10.0.0.2:5002  PLANNER_SELF=http://10.0.0.1:5002
+#
+# Local test cluster (three planner processes on ports 5101-5103):
+#
+#   python bengaluru_sharding.py serve --nodes 3 --base-port 5101
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import hashlib
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+import urllib3
+
+from bengaluru_leg_cache import snap_cell
+from bengaluru_metrics import metrics
+from bengaluru_profiling import PROFILE_HEADER
+from bengaluru_tracing import TRACE_HEADER
+
+
+PLANNER_NODES = [node.strip().rstrip('/') for node in os.getenv('PLANNER_NODES', '').split(',') if node.strip()]
+PLANNER_SELF = os.getenv('PLANNER_SELF', '').rstrip('/')
+SHARD_VIRTUAL_NODES = int(os.getenv('SHARD_VIRTUAL_NODES', '64'))      # ring points per node
+SHARD_CONNECT_TIMEOUT_S = float(os.getenv('SHARD_CONNECT_TIMEOUT_S', '0.5'))
+SHARD_FORWARD_MARGIN_S = float(os.getenv('SHARD_FORWARD_MARGIN_S', '0.5'))   # on top of the plan deadline
+SHARD_NODE_COOLDOWN_S = float(os.getenv('SHARD_NODE_COOLDOWN_S', '30'))
+FORWARDED_HEADER = 'X-Planner-Forwarded'
+OWNER_HEADER = 'X-Planner-Node'
+# Headers passed to the owner, and back from it. The admin token travels with a forwarded request so
+# the owner can honour X-Trace / X-Profile (admin-only) - the cluster shares one ADMIN_TOKEN.
+FORWARD_REQUEST_HEADERS = ('Content-Type', 'Accept-Encoding', 'X-Request-Start',
+                           TRACE_HEADER, PROFILE_HEADER, 'X-Admin-Token')
+FORWARD_RESPONSE_HEADERS = ('Content-Type', 'Content-Encoding', 'Vary', 'Retry-After',
+                            'Server-Timing', 'X-Profile-Id')
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def node_id(node):
+    """Short stable ID for a node URL (used to prefix the plan tokens it issues)"""
+    return f"{_hash(node):016x}"[:8]
+
+
+def trip_shard_key(network_key, initial_lat, initial_lng, dest_lat, dest_lng):
+    """Shard key of a trip: city plus the snapped origin and destination cells (as in the plan cache)"""
+    return f"{network_key}|{snap_cell(initial_lat, initial_lng)}|{snap_cell(dest_lat, dest_lng)}"
+
+
+class HashRing:
+    """Consistent-hash ring with virtual nodes"""
+
+    def __init__(self, nodes=(), virtual_nodes=SHARD_VIRTUAL_NODES):
+        self.virtual_nodes = virtual_nodes
+        self.nodes = []
+        self._points = []
+        self._owners = []
+        self.set_nodes(nodes)
+
+    def set_nodes(self, nodes):
+        ring = sorted((_hash(f"{node}#{replica}"), node)
+                      for node in set(nodes) for replica in range(self.virtual_nodes))
+        self.nodes = sorted(set(nodes))
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    def owner(self, key, exclude=()):
+        """Node owning key: the first ring point clockwise from its hash, skipping excluded nodes"""
+        if not self._points:
+            return None
+        start = bisect.bisect(self._points, _hash(key))
+        for offset in range(len(self._points)):
+            node = self._owners[(start + offset) % len(self._points)]
+            if node not in exclude:
+                return node
+        return None
+
+
+class ShardRouter:
+    """Decides which node plans a trip and forwards requests to it"""
+
+    def __init__(self, nodes=PLANNER_NODES, self_node=PLANNER_SELF):
+        self.self_node = self_node
+        self.ring = HashRing(nodes)
+        self._down_until = {}
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+
+    @property
+    def enabled(self):
+        return bool(self.self_node) and len(self.ring.nodes) > 1
+
+    def set_nodes(self, nodes):
+        """Replace the ring membership (node join/leave)"""
+        nodes = [node.strip().rstrip('/') for node in nodes if node.strip()]
+        with self._lock:
+            self.ring.set_nodes(nodes)
+            self._down_until = {node: until for node, until in self._down_until.items() if node in nodes}
+        print(f"🔗 Planner ring: {len(nodes)} nodes")
+
+    def _down(self):
+        now = time.monotonic()
+        return {node for node, until in self._down_until.items() if until > now}
+
+    def owner(self, key):
+        """Owning node for a shard key among the reachable nodes (self if sharding is off)"""
+        if not self.enabled:
+            return self.self_node
+        return self.ring.owner(key, exclude=self._down() - {self.self_node}) or self.self_node
+
+    def owner_for_token(self, token):
+        """Node that issued a plan token (tokens carry the issuer's node_id prefix), or None"""
+        if not self.enabled or not token or '.' not in token:
+            return None
+        prefix = token.split('.', 1)[0]
+        for node in self.ring.nodes:
+            if node_id(node) == prefix and node not in self._down():
+                return node
+        return None
+
+    def forward(self, node, path, body, headers, timeout_s):
+        """Send a request to its owner: (status, headers, raw body), or None if the owner is unreachable or
+        has not answered within timeout_s"""
+        forward_headers = {name: headers[name] for name in FORWARD_REQUEST_HEADERS if headers.get(name) is not None}
+        forward_headers[FORWARDED_HEADER] = self.self_node
+        try:
+            response = self._session.post(f"{node}{path}", data=body, headers=forward_headers,
+                                          timeout=(SHARD_CONNECT_TIMEOUT_S, timeout_s), stream=True)
+            content = response.raw.read(decode_content=False)
+        except (requests.ReadTimeout, urllib3.exceptions.ReadTimeoutError) as e:
+            # A busy owner is not a dead one: answer this request here, keep the owner in the ring
+            print(f"⚠️ Planner node {node} did not answer within {timeout_s:.1f} s ({e}) - planning locally")
+            metrics.incr('shard_forward_timeouts')
+            return None
+        except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+            print(f"⚠️ Planner node {node} unreachable ({e}) - planning locally")
+            metrics.incr('shard_forward_failures')
+            with self._lock:
+                self._down_until[node] = time.monotonic() + SHARD_NODE_COOLDOWN_S
+            return None
+        metrics.incr('shard_forwarded')
+        passed = {name: response.headers[name] for name in FORWARD_RESPONSE_HEADERS if name in response.headers}
+        passed[OWNER_HEADER] = node
+        return response.status_code, passed, content
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'self': self.self_node,
+            'nodes': self.ring.nodes,
+            'down': sorted(self._down()),
+            'virtual_nodes': self.ring.virtual_nodes,
+        }
+
+
+shard_router = ShardRouter()
+
+metrics.set_gauge('shard_ring_nodes', lambda: len(shard_router.ring.nodes))
+
+
+def serve_local_cluster(count, base_port, host='127.0.0.1'):
+    """Run count planner processes on consecutive ports, sharing one ring (Ctrl-C stops them all)"""
+    nodes = [f"http://{host}:{base_port + i}" for i in range(count)]
+    processes = []
+    for i, node in enumerate(nodes):
+        env = dict(os.environ, PORT=str(base_port + i), PLANNER_SELF=node, PLANNER_NODES=','.join(nodes),
+                   FLASK_DEBUG='0')
+        # Separate cache files per node, as on separate hosts (otherwise every node shares one SQLite tier)
+        env.setdefault('LEG_CACHE_DB', os.path.join(tempfile.gettempdir(), f"bengaluru_leg_cache_{base_port + i}.sqlite3"))
+        processes.append(subprocess.Popen([sys.executable, 'bengaluru_app.py'], env=env,
+                                          cwd=os.path.dirname(os.path.abspath(__file__))))
+        print(f"🚇 Planner node {i + 1}: {node}")
+    try:
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGINT)
+        for process in processes:
+            process.wait()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Consistent-hash planner sharding tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve = subparsers.add_parser('serve', help='run a local multi-process planner cluster')
+    serve.add_argument('--nodes', type=int, default=3)
+    serve.add_argument('--base-port', type=int, default=5101)
+    owner = subparsers.add_parser('owner', help='show the owning node of a trip')
+    owner.add_argument('coordinates', nargs=4, type=float, metavar=('O_LAT', 'O_LNG', 'D_LAT', 'D_LNG'))
+    owner.add_argument('--city', default='bengaluru')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve_local_cluster(args.nodes, args.base_port)
+    else:
+        print(HashRing(PLANNER_NODES).owner(trip_shard_key(args.city, *args.coordinates)))
@@ -0,0 +1,147 @@
+# Bengaluru Metro Journey Planner - Return Trip Speculation
+# Most riders who plan A→B in the morning plan B→A in the evening. With
+# SPECULATE_RETURN_TRIPS=1, a successful morning plan queues its reverse trip
+# for the likely return time (SPECULATION_RETURN_AFTER_H later, over
+# SPECULATION_RETURN_BUCKETS traffic buckets around it). A single background
+# worker per process builds those plans at background priority on the shared
+# Maps scheduler, so they never delay live traffic and are shed once the daily
+# budget reaches its reserve; far-future taxi legs mostly come from traffic
+# profiles, so a speculative plan costs a few walking legs and a direct taxi.
+#
+# Whether it pays off is visible at /metrics: speculation_plans_built and
+# speculation_maps_requests (cost) against speculation_hits (live plans
+# served from a speculated cache entry). The speculation_hit_rate gauge is
+# read from the shared speculated-plan table, since a return trip built by
+# one worker is usually served by another: plans used / plans built over the
+# last SPECULATION_STATS_KEEP_H.
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+
+from bengaluru_leg_cache import (LEG_CACHE_DB, TieredCache, plan_cache, plan_key, traffic_bucket, bucket_start,
+                                 bucket_end)
+from bengaluru_metrics import metrics
+from bengaluru_sharding import shard_router, trip_shard_key
+from bengaluru_traffic_profiles import CITY_UTC_OFFSET_S
+
+
+SPECULATE_RETURN_TRIPS = os.getenv('SPECULATE_RETURN_TRIPS', '0') == '1'
+SPECULATION_RETURN_AFTER_H = float(os.getenv('SPECULATION_RETURN_AFTER_H', '9'))
+SPECULATION_RETURN_BUCKETS = int(os.getenv('SPECULATION_RETURN_BUCKETS', '3'))    # centred on the likely return
+SPECULATION_WINDOW_H = (5, 12)          # local departure hours whose return trip is speculated
+SPECULATION_QUEUE_MAX = int(os.getenv('SPECULATION_QUEUE_MAX', '200'))
+SPECULATION_MAX_ENTRIES = 20000
+# Speculated-plan markers outlive their departure bucket by this long, for the hit-rate gauge
+SPECULATION_STATS_KEEP_H = float(os.getenv('SPECULATION_STATS_KEEP_H', '24'))
+
+
+def return_departures(departure_time=None, now=None):
+    """Departure times to speculate the return trip for ([] if the outbound is outside the morning window)"""
+    departure = departure_time if departure_time is not None else (now or time.time())
+    local_hour = ((departure + CITY_UTC_OFFSET_S) % 86400) / 3600
+    if not SPECULATION_WINDOW_H[0] <= local_hour < SPECULATION_WINDOW_H[1]:
+        return []
+    likely = traffic_bucket(departure + SPECULATION_RETURN_AFTER_H * 3600)
+    first = likely - (SPECULATION_RETURN_BUCKETS - 1) // 2
+    return [bucket_start(bucket) for bucket in range(first, first + SPECULATION_RETURN_BUCKETS)]
+
+
+class ReturnTripSpeculator:
+    """Queues and builds speculative return-trip plans, and counts how many are later used"""
+
+    def __init__(self, enabled=SPECULATE_RETURN_TRIPS, queue_max=SPECULATION_QUEUE_MAX, db_path=LEG_CACHE_DB):
+        self.enabled = enabled
+        self.queue_max = queue_max
+        # Plan keys built speculatively, shared by the host's workers: value says whether the plan was built
+        # and whether a live plan used it yet
+        self.speculated = TieredCache('speculated_plans', SPECULATION_MAX_ENTRIES, db_path)
+        self._queue = None
+        self._started_pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # One worker thread per process, started lazily (never before a fork)
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.queue_max)
+            threading.Thread(target=self._worker, name='return-speculation', daemon=True).start()
+            self._started_pid = os.getpid()
+
+    def offer(self, finder, initial_lat, initial_lng, dest_lat, dest_lng, departure_time=None):
+        """Queue the return trip (dest → origin) of a successful plan for background planning"""
+        if not self.enabled:
+            return 0
+        # The return trip is served by the node that owns it; only that node's cache is worth filling
+        if shard_router.owner(trip_shard_key(finder.network.key, dest_lat, dest_lng, initial_lat, initial_lng)) \
+                != shard_router.self_node:
+            metrics.incr('speculation_not_owner')
+            return 0
+        self._ensure_started()
+        queued = 0
+        for departure in return_departures(departure_time):
+            key = plan_key(finder.network, dest_lat, dest_lng, initial_lat, initial_lng, traffic_bucket(departure))
+            if self.speculated.get(key, count=False) is not None:
+                continue
+            try:
+                self._queue.put_nowait((finder, key, dest_lat, dest_lng, initial_lat, initial_lng, departure))
+            except queue.Full:
+                metrics.incr('speculation_dropped')
+                break
+            queued += 1
+        metrics.incr('speculation_queued', queued)
+        return queued
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._build(*job)
+            except Exception as e:
+                metrics.incr('speculation_failures')
+                print(f"⚠️ Return trip speculation failed: {e}")
+
+    def _build(self, finder, key, initial_lat, initial_lng, dest_lat, dest_lng, departure):
+        expires_at = bucket_end(traffic_bucket(departure))
+        if expires_at <= time.time() or self.speculated.get(key, count=False) is not None:
+            return
+        if plan_cache.get(key, count=False) is not None:
+            metrics.incr('speculation_already_cached')
+            return
+        # Mark first, so other workers that see the same trip do not build it too
+        keep_until = expires_at + SPECULATION_STATS_KEEP_H * 3600
+        self.speculated.put(key, {'hit': False, 'built': False, 'expires_at': expires_at}, keep_until)
+        finder.plan_routes(initial_lat, initial_lng, dest_lat, dest_lng, departure, background=True)
+        built = plan_cache.get(key, count=False) is not None
+        if built:
+            entry = self.speculated.get(key, count=False) or {'hit': False, 'expires_at': expires_at}
+            self.speculated.put(key, dict(entry, built=True), keep_until)
+        metrics.incr('speculation_plans_built' if built else 'speculation_plans_empty')
+        metrics.incr('speculation_maps_requests', finder.maps_requests)
+
+    def note_plan_hit(self, key):
+        """Record a live plan served from the plan cache; counts a hit the first time a speculated plan is used"""
+        entry = self.speculated.get(key, count=False)
+        if entry is None or entry['hit'] or entry['expires_at'] <= time.time():
+            return
+        self.speculated.put(key, dict(entry, hit=True), entry['expires_at'] + SPECULATION_STATS_KEEP_H * 3600)
+        metrics.incr('speculation_hits')
+
+    def hit_rate(self):
+        """Share of the host's speculated plans (built in the last SPECULATION_STATS_KEEP_H) a live plan used"""
+        entries = self.speculated.values()
+        # A plan used by a live request was built, even if its built flag lost a race with the hit
+        built = sum(1 for entry in entries if entry.get('built') or entry['hit'])
+        return round(sum(1 for entry in entries if entry['hit']) / built, 4) if built else None
+
+
+return_trips = ReturnTripSpeculator()
+
+metrics.set_gauge('speculation_hit_rate', return_trips.hit_rate)
+metrics.set_gauge('speculation_queue_depth', lambda: return_trips._queue.qsize() if return_trips._queue else 0)
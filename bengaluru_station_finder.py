@@ -1,97 +1,362 @@
 import math
 import os
+import threading
+import time
+import numpy as np
 import requests
-import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from bengaluru_metro_stations import STATION_COORDINATES, METRO_LINES
+from concurrent.futures import Future, as_completed, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from metro_networks import MetroNetwork, BENGALURU
+from bengaluru_maps_scheduler import maps_scheduler, PRIORITY_DIRECT, PRIORITY_STATION_LEG, PRIORITY_BACKGROUND
+from bengaluru_leg_cache import (leg_cache, plan_cache, leg_key, leg_expiry, plan_key, snap_cell, station_point,
+                                 traffic_bucket, bucket_end)
+from bengaluru_traffic_profiles import traffic_profiles, use_profile
+from bengaluru_metrics import metrics
+from bengaluru_plan_store import plan_store, plan_state
+from bengaluru_road_graph import ROUTING_BACKEND, load_road_graph
+from bengaluru_cancellation import CANCEL_POLL_S
+from bengaluru_speculation import return_trips
+from bengaluru_tracing import traced, traced_job, stage, event
+from bengaluru_leg_batcher import LegBatcher, leg_batcher, departure_group
+from bengaluru_response import (ConvenienceRoute, DirectTaxiSuggestion, TRANSFER_TIME_MIN,
+                                 ACCESS_TRANSFER_TIME_MIN)
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-class BengaluruStationFinder:
+# Access leg heuristics (used to pick a mode and to estimate legs without an API call)
+WALKING_MODE_THRESHOLD_KM = 0.5    # stations within 500 m straight-line are walked to
+ROAD_DETOUR_FACTOR = 1.3           # typical road distance / straight-line distance
+ACCESS_DISTANCE_FLOOR_KM = 0.01    # access scores treat shorter totals (an origin at the station) as 10 m
+WALKING_SPEED_KMPH = 4.8
+TAXI_SPEED_KMPH = 18               # average Bengaluru door-to-door taxi speed
+
+# Direct taxi rules (check_direct_taxi_conditions); the trivial-trip classifier uses the same thresholds
+DIRECT_TAXI_MAX_KM = 7                     # Rule 1: direct distance
+DIRECT_TAXI_TIME_RATIO = 1.5               # Rule 2: multimodal time vs direct time
+DIRECT_TAXI_MIN_SAVING_MIN = 20            # Rule 3: absolute time saving
+DIRECT_TAXI_ACCESS_SHARE = 0.8             # Rule 4: first+last mile vs direct distance
+DIRECT_TAXI_SINGLE_LEG_SHARE = 0.7         # Rule 5: either access leg vs direct distance
+DIRECT_TAXI_MULTI_TRANSFERS = 2            # Rule 6: transfers ...
+DIRECT_TAXI_MULTI_TRANSFER_RATIO = 1.3     #         ... and multimodal time vs direct time
+
+# Candidate set: nearest stations searched per side and routes returned; "more routes" (expand_routes)
+# widens a plan by MORE_ROUTES_STATIONS per side and returns ROUTES_SHOWN more routes each time
+STATION_CANDIDATES = 7
+ROUTES_SHOWN = 5
+MORE_ROUTES_STATIONS = 3
+MORE_ROUTES_MAX_STATIONS = 16
+
+# Per-request latency budget for a live plan (from admission to response): legs still missing when it runs out
+# are estimated and the plan is marked partial, so a slow upstream cannot hold the response
+PLAN_DEADLINE_S = float(os.getenv('PLAN_DEADLINE_S', '1.5'))
+
+
+class MapsCallCounter:
+    """Maps HTTP calls issued for one plan; bumped from the dispatch threads, a shared batch call counts once"""
+    
     def __init__(self):
-        self.stations = STATION_COORDINATES
+        self.calls = 0
+        self._lock = threading.Lock()
+    
+    def add(self, calls=1):
+        with self._lock:
+            self.calls += calls
+
+
+@dataclass(slots=True)
+class TrivialTrip:
+    """A trip the pre-classifier answers with a single direct leg"""
+    kind: str           # 'walk', 'same_station' or 'short_taxi'
+    mode: str           # 'walking' or 'taxi'
+    reasons: list
+
+
+@dataclass(slots=True)
+class StationCandidate:
+    """One of the nearest stations to a trip origin or destination"""
+    station_id: int
+    name: str
+    lat: float
+    lng: float
+    distance: float                  # simple |Δlat| + |Δlng| ranking distance
+    straight_line_distance: float    # km
+    mode: str                        # 'walking' or 'taxi' access
+
+
+class RouteGrid:
+    """Every origin-station × destination-station combination of one request, evaluated once.
+
+    Rows are origin candidates and columns destination candidates (by rank);
+    access legs, metro pair data and convenience scores are small fixed-shape
+    arrays, and ConvenienceRoute records are built only for the routes used.
+    """
+
+    def __init__(self, pairs, initial_stations, dest_stations, origin_legs, dest_legs):
+        self.pairs = pairs
+        self.initial_stations = initial_stations
+        self.dest_stations = dest_stations
+        self.origin_legs = origin_legs
+        self.dest_legs = dest_legs
+        self.size = len(initial_stations) * len(dest_stations)
+
+        # Access legs (NaN where a leg is missing)
+        self.leg1_distance, self.leg1_time_min = self._leg_arrays(origin_legs)
+        self.leg2_distance, self.leg2_time_min = self._leg_arrays(dest_legs)
+        self.access_valid = ~np.isnan(self.leg1_distance)[:, None] & ~np.isnan(self.leg2_distance)[None, :]
+        self.access_distance = self.leg1_distance[:, None] + self.leg2_distance[None, :]
+        self.access_time = self.leg1_time_min[:, None] + self.leg2_time_min[None, :]
+
+        # Metro pair data for the grid, gathered from the station-indexed pair table
+        self._cells = np.ix_(np.array([s.station_id for s in initial_stations], dtype=np.intp),
+                             np.array([s.station_id for s in dest_stations], dtype=np.intp))
+        self.metro_valid = pairs.present[self._cells]
+        self.metro_time = pairs.time[self._cells]
+        self.metro_distance = pairs.distance[self._cells]
+        self.transfer_count = pairs.transfer_count[self._cells].astype(np.int64)
+        self.same_line = pairs.same_line[self._cells]
+        self.valid = self.access_valid & self.metro_valid
+
+        # Access score: shortest total access distance over all access-valid combinations / this one.
+        # Floored, so a zero-length access (trip starting at a station) scores 100 instead of NaN.
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scored_access = np.maximum(self.access_distance, ACCESS_DISTANCE_FLOOR_KM)
+            shortest_access = scored_access[self.access_valid].min() if self.access_valid.any() else np.nan
+            self.access_score = (shortest_access / scored_access) * 100
+
+            # Metro score: transfer penalty grows with how much access travel the route already needs
+            access_factor = np.minimum(self.access_distance / 20, 1.0)
+        transfers = self.transfer_count
+        self.metro_score = np.select([transfers == 1, transfers == 2],
+                                     [100 - 40 * access_factor, 100 - 80 * access_factor], 100.0)
+
+        # Fixed weighting by transfer count (0: 80/20, 1: 65/35, 2+: 60/40)
+        access_weight = np.select([transfers == 0, transfers == 1], [0.8, 0.65], 0.6)
+        metro_weight = np.select([transfers == 0, transfers == 1], [0.2, 0.35], 0.4)
+        self.total_convenience_score = (self.access_score * access_weight) + (self.metro_score * metro_weight)
+
+        self.metro_interchange_time = transfers * TRANSFER_TIME_MIN
+        self.total_journey_time = (self.access_time + self.metro_time + self.metro_interchange_time
+                                   + ACCESS_TRANSFER_TIME_MIN)
+
+    @staticmethod
+    def _leg_arrays(legs):
+        distance = np.array([leg['distance_km'] if leg is not None else np.nan for leg in legs], dtype=float)
+        time_min = np.array([leg['duration_min'] + (leg['duration_sec'] / 60) if leg is not None else np.nan
+                             for leg in legs], dtype=float)
+        return distance, time_min
+
+    def ranked(self, values, mask, descending=False):
+        """(row, col) cells where mask holds, ordered by values (ties keep row-major order)"""
+        flat = np.flatnonzero(mask)
+        keys = values.ravel()[flat]
+        order = np.argsort(-keys if descending else keys, kind='stable')
+        columns = mask.shape[1]
+        return [(int(cell // columns), int(cell % columns)) for cell in flat[order]]
+
+    def lines(self, i, j):
+        """(start line, end line) of the metro trip for cell (i, j)"""
+        cell = self._cells[0][i, 0], self._cells[1][0, j]
+        return (self.pairs.lines[self.pairs.start_line_idx[cell]] or 'Unknown',
+                self.pairs.lines[self.pairs.end_line_idx[cell]] or 'Unknown')
+
+    def interchange(self, i, j):
+        """Interchange description of the metro trip for cell (i, j)"""
+        cell = self._cells[0][i, 0], self._cells[1][0, j]
+        return self.pairs.interchanges[self.pairs.interchange_idx[cell]]
+
+    def route(self, i, j):
+        """ConvenienceRoute record for cell (i, j)"""
+        leg1 = self.origin_legs[i]
+        leg2 = self.dest_legs[j]
+        initial_line, dest_line = self.lines(i, j)
+        return ConvenienceRoute(
+            initial=self.initial_stations[i].name,
+            destination=self.dest_stations[j].name,
+            leg1_distance=leg1['distance_km'],
+            leg2_distance=leg2['distance_km'],
+            leg1_mode=leg1['mode'],
+            leg2_mode=leg2['mode'],
+            total_access_distance=float(self.access_distance[i, j]),
+            leg1_time=leg1['time_display'],
+            leg2_time=leg2['time_display'],
+            leg1_time_min=float(self.leg1_time_min[i]),
+            leg2_time_min=float(self.leg2_time_min[j]),
+            total_access_time=float(self.access_time[i, j]),
+            metro_distance=float(self.metro_distance[i, j]),
+            metro_time=float(self.metro_time[i, j]),
+            metro_interchange_time=int(self.metro_interchange_time[i, j]),
+            access_metro_interchange_time=ACCESS_TRANSFER_TIME_MIN,
+            total_journey_time=float(self.total_journey_time[i, j]),
+            metro_score=float(self.metro_score[i, j]),
+            access_score=float(self.access_score[i, j]),
+            total_convenience_score=float(self.total_convenience_score[i, j]),
+            same_line=bool(self.same_line[i, j]),
+            interchange=self.interchange(i, j),
+            transfer_count=int(self.transfer_count[i, j]),
+            initial_line=initial_line,
+            dest_line=dest_line
+        )
+
+
+class BengaluruStationFinder:
+    def __init__(self, network=None, scheduler=None):
+        self.network = network or MetroNetwork.load(BENGALURU)
+        self.scheduler = scheduler or maps_scheduler
+        # Legs that reach Maps are held for a few ms and sent as shared Distance Matrix calls
+        self.batcher = leg_batcher if self.scheduler is maps_scheduler else LegBatcher(self.scheduler)
+        # ROUTING_BACKEND=local answers access/direct legs from the road graph instead of Directions
+        self.road_graph = load_road_graph() if ROUTING_BACKEND == 'local' else None
         self.api_key = os.getenv('GOOGLE_MAPS_API_KEY')
         if not self.api_key:
             raise ValueError("GOOGLE_MAPS_API_KEY not found in .env file")
         self.base_url = "https://maps.googleapis.com/maps/api"
-        
-        # Load metro data
-        self.metro_data = self.load_metro_data()
+        # Per-request results (direct taxi, routes, suggestion) are kept per thread
+        self._request_state = threading.local()
     
-    def load_metro_data(self):
-        """Load metro route data from CSV"""
-        try:
-            df = pd.read_csv('bengaluru_station_pairs_final.csv')
-            metro_data = {}
-            
-            for _, row in df.iterrows():
-                station1 = row['start_station']
-                station2 = row['end_station']
-                metro_data[(station1, station2)] = {
-                    'distance': row.get('metro_distance_km', 0),
-                    'time': row.get('directions_time_min', 0),
-                    'same_line': row.get('same_line', False),
-                    'interchange': row.get('interchange_station', ''),
-                    'transfer_count': row.get('transfer_count', 0),
-                    'start_line': row.get('start_line', ''),
-                    'end_line': row.get('end_line', '')
-                }
-            
-            print(f"✅ Loaded {len(metro_data)} Bengaluru metro routes")
-            return metro_data
-            
-        except Exception as e:
-            print(f"❌ Error loading metro data: {e}")
-            return {}
+    @property
+    def direct_taxi(self):
+        return getattr(self._request_state, 'direct_taxi', None)
+    
+    @direct_taxi.setter
+    def direct_taxi(self, value):
+        self._request_state.direct_taxi = value
+    
+    @property
+    def convenience_routes(self):
+        return getattr(self._request_state, 'convenience_routes', [])
+    
+    @convenience_routes.setter
+    def convenience_routes(self, value):
+        self._request_state.convenience_routes = value
+    
+    @property
+    def direct_taxi_suggestion(self):
+        return getattr(self._request_state, 'direct_taxi_suggestion', None)
+    
+    @direct_taxi_suggestion.setter
+    def direct_taxi_suggestion(self, value):
+        self._request_state.direct_taxi_suggestion = value
+    
+    @property
+    def plan_token(self):
+        return getattr(self._request_state, 'plan_token', None)
+    
+    @plan_token.setter
+    def plan_token(self, value):
+        self._request_state.plan_token = value
+    
+    @property
+    def plan_degraded(self):
+        return getattr(self._request_state, 'plan_degraded', False)
+    
+    @plan_degraded.setter
+    def plan_degraded(self, value):
+        self._request_state.plan_degraded = value
+    
+    @property
+    def plan_partial(self):
+        return getattr(self._request_state, 'plan_partial', False)
+    
+    @plan_partial.setter
+    def plan_partial(self, value):
+        self._request_state.plan_partial = value
+    
+    @property
+    def deadline(self):
+        return getattr(self._request_state, 'deadline', None)
+    
+    @deadline.setter
+    def deadline(self, value):
+        self._request_state.deadline = value
+    
+    @property
+    def maps_calls(self):
+        """MapsCallCounter of this thread's current plan (see start_call_count)"""
+        counter = getattr(self._request_state, 'maps_calls', None)
+        if counter is None:
+            counter = self._request_state.maps_calls = MapsCallCounter()
+        return counter
+    
+    @property
+    def maps_requests(self):
+        """Maps HTTP calls issued so far for this thread's current plan (not legs: a batched call counts once)"""
+        return self.maps_calls.calls
+    
+    def start_call_count(self):
+        """Start counting this thread's Maps calls from zero"""
+        self._request_state.maps_calls = MapsCallCounter()
+    
+    @property
+    def cancel_token(self):
+        return getattr(self._request_state, 'cancel_token', None)
+    
+    @cancel_token.setter
+    def cancel_token(self, value):
+        self._request_state.cancel_token = value
+    
+    @property
+    def stations(self):
+        """Station name → (lat, lng) for this finder's network"""
+        return self.network.station_coordinates
+    
+    @property
+    def metro_data(self):
+        """(start, end) → metro pair info for this finder's network"""
+        return self.network.pairs
     
     def calculate_simple_distance(self, lat1, lng1, lat2, lng2):
         """Calculate simple distance using |lat1-lat2| + |lng1-lng2|"""
         return abs(lat1 - lat2) + abs(lng1 - lng2)
     
-    def find_nearest_stations(self, lat, lng, top_n=7):
+    @traced('find_nearest_stations')
+    def find_nearest_stations(self, lat, lng, top_n=STATION_CANDIDATES):
         """Find top N nearest stations to given coordinates with walking/taxi mode selection"""
         print(f"🎯 Finding {top_n} nearest metro stations to coordinates ({lat:.6f}, {lng:.6f})...")
+        nearest_stations = self.nearest_candidates(lat, lng, top_n)
         
-        # Calculate distances to all stations
-        station_distances = []
+        print(f"✅ Found {len(nearest_stations)} nearest stations:")
+        for i, station in enumerate(nearest_stations, 1):
+            mode_icon = "🚶" if station.mode == 'walking' else "🚗"
+            print(f"   {i}. {station.name} (distance: {station.distance:.4f}) {mode_icon} {station.mode.upper()}")
         
-        for station_name, (station_lat, station_lng) in self.stations.items():
-            simple_dist = self.calculate_simple_distance(lat, lng, station_lat, station_lng)
+        return nearest_stations
+    
+    def nearest_candidates(self, lat, lng, top_n=STATION_CANDIDATES):
+        """find_nearest_stations without logging or tracing, for hot paths (reachability redraws)"""
+        # Rank all stations by simple distance in one vectorized pass, then detail only the top N
+        network = self.network
+        station_ids, simple_dists = network.nearest_station_ids(lat, lng, top_n)
+        nearest_stations = []
+        
+        for station_id, simple_dist in zip(station_ids, simple_dists):
+            station_lat = float(network.lats[station_id])
+            station_lng = float(network.lngs[station_id])
             straight_line_dist = self.calculate_straight_line_distance(lat, lng, station_lat, station_lng)
             
             # Determine mode based on straight-line distance
-            mode = 'walking' if straight_line_dist <= 0.5 else 'taxi'  # 500m = 0.5km
+            mode = 'walking' if straight_line_dist <= WALKING_MODE_THRESHOLD_KM else 'taxi'
             
-            station_distances.append({
-                'name': station_name,
-                'lat': station_lat,
-                'lng': station_lng,
-                'distance': simple_dist,
-                'straight_line_distance': straight_line_dist,
-                'mode': mode
-            })
-        
-        # Sort by distance and get top N
-        station_distances.sort(key=lambda x: x['distance'])
-        nearest_stations = station_distances[:top_n]
-        
-        print(f"✅ Found {len(nearest_stations)} nearest stations:")
-        for i, station in enumerate(nearest_stations, 1):
-            mode_icon = "🚶" if station['mode'] == 'walking' else "🚗"
-            print(f"   {i}. {station['name']} (distance: {station['distance']:.4f}) {mode_icon} {station['mode'].upper()}")
-        
+            nearest_stations.append(StationCandidate(
+                station_id=int(station_id),
+                name=network.station_names[station_id],
+                lat=station_lat,
+                lng=station_lng,
+                distance=float(simple_dist),
+                straight_line_distance=straight_line_dist,
+                mode=mode
+            ))
         return nearest_stations
     
-    def calculate_taxi_leg(self, origin_lat, origin_lng, dest_lat, dest_lng):
+    def calculate_taxi_leg(self, origin_lat, origin_lng, dest_lat, dest_lng, departure_time='now'):
         """Calculate single taxi leg using Google Directions API with traffic"""
         url = f"{self.base_url}/directions/json"
         params = {
             'origin': f"{origin_lat},{origin_lng}",
             'destination': f"{dest_lat},{dest_lng}",
             'mode': 'driving',
-            'departure_time': 'now',
+            'departure_time': departure_time,
             'traffic_model': 'best_guess',
             'key': self.api_key
         }
@@ -179,6 +444,223 @@ class BengaluruStationFinder:
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
+    def calculate_local_leg(self, mode, origin_lat, origin_lng, dest_lat, dest_lng):
+        """Calculate single walking/taxi leg on the local road graph (no API call)"""
+        result = self.road_graph.leg(origin_lat, origin_lng, dest_lat, dest_lng, 'walk' if mode == 'walking' else 'drive')
+        metrics.incr('local_legs_routed' if result['success'] else 'local_legs_failed')
+        if result['success']:
+            result['mode'] = mode
+        return result
+    
+    def request_leg(self, mode, origin_lat, origin_lng, dest_lat, dest_lng, origin_key, dest_key,
+                    priority, departure_time=None, max_wait_s=None, count=True):
+        """Future for one walking/taxi leg: leg cache, then traffic profile (far-future taxi legs), else the Maps scheduler"""
+        if self.road_graph is not None:
+            local = self.calculate_local_leg(mode, origin_lat, origin_lng, dest_lat, dest_lng)
+            if local['success']:
+                event('leg', mode=mode, source='local')
+                return self._completed(local)
+            # Off the graph's coverage: fall back to the Directions API
+        bucket = traffic_bucket(departure_time)
+        key = leg_key(mode, origin_key, dest_key, bucket)
+        cached = leg_cache.get(key, count=count)
+        if cached is not None:
+            event('leg', mode=mode, source='cache')
+            return self._completed(dict(cached, cached=True))
+        if mode == 'taxi' and use_profile(departure_time):
+            profiled = traffic_profiles.estimate_leg(origin_key, dest_key, departure_time)
+            if profiled is not None:
+                profiled['mode'] = mode
+                event('leg', mode=mode, source='profile')
+                return self._completed(profiled)
+        if self.plan_degraded:
+            # Degraded plans (admission control) never call Maps
+            metrics.incr('degraded_legs_estimated')
+            event('leg', mode=mode, source='estimate')
+            return self._completed(self.estimate_leg(origin_lat, origin_lng, dest_lat, dest_lng, mode))
+        if self.batcher.enabled:
+            return self.batcher.submit(self._fetch_batch, departure_group(mode, departure_time, bucket, priority),
+                                       f"{origin_lat},{origin_lng}", f"{dest_lat},{dest_lng}",
+                                       (origin_key, dest_key, bucket, departure_time, self.maps_calls),
+                                       priority, max_wait_s)
+        return self.scheduler.submit(traced_job(self._fetch_leg, mode=mode, priority=priority), mode, origin_lat, origin_lng, dest_lat, dest_lng,
+                                     origin_key, dest_key, bucket, departure_time, self.maps_calls,
+                                     priority=priority, max_wait_s=max_wait_s)
+    
+    def _as_completed(self, futures):
+        """as_completed over leg futures until the plan deadline (the rest are left pending).
+        
+        Raises PlanCancelled (dropping the rest) once the search is cancelled.
+        """
+        token = self.cancel_token
+        deadline = self.deadline
+        if token is None and deadline is None:
+            yield from as_completed(futures)
+            return
+        pending = {token.track(future) for future in futures} if token is not None else set(futures)
+        while pending:
+            timeout = CANCEL_POLL_S if token is not None else None
+            if token is not None:
+                token.raise_if_cancelled()
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            yield from done
+    
+    def _late_leg(self, future, origin_lat, origin_lng, dest_lat, dest_lng, mode):
+        """Estimate for a leg still pending at the plan deadline; marks the plan partial.
+        
+        A queued request is dropped; one already in flight still completes and fills the leg cache.
+        """
+        future.cancel()
+        self.plan_partial = True
+        metrics.incr('deadline_legs_estimated')
+        event('leg', mode=mode, source='deadline_estimate')
+        return self.estimate_leg(origin_lat, origin_lng, dest_lat, dest_lng, mode)
+    
+    @staticmethod
+    def _completed(result):
+        future = Future()
+        future.set_result(result)
+        return future
+    
+    def _fetch_leg(self, mode, origin_lat, origin_lng, dest_lat, dest_lng, origin_key, dest_key, bucket,
+                   departure_time, calls):
+        """Call the Directions API for one leg, cache a successful result and log live taxi traffic"""
+        calls.add()
+        if mode == 'walking':
+            result = self.calculate_walking_leg(origin_lat, origin_lng, dest_lat, dest_lng)
+        else:
+            taxi_departure = 'now' if departure_time is None else max(int(departure_time), int(time.time()))
+            result = self.calculate_taxi_leg(origin_lat, origin_lng, dest_lat, dest_lng, taxi_departure)
+        return self._store_leg(mode, result, origin_key, dest_key, bucket, live=departure_time is None)
+    
+    def _store_leg(self, mode, result, origin_key, dest_key, bucket, live):
+        """Cache a successful leg and log live taxi traffic into the profiles"""
+        if result['success']:
+            if mode == 'taxi' and live:
+                traffic_profiles.record(origin_key, dest_key, result)
+            result['mode'] = mode
+            leg_cache.put(leg_key(mode, origin_key, dest_key, bucket), result, leg_expiry(mode, bucket))
+        return result
+    
+    def calculate_matrix(self, mode, origins, destinations, departure_time='now'):
+        """Walking/taxi legs for every origin × destination in one Google Distance Matrix call.
+        
+        Returns rows of leg dicts (same format as calculate_taxi_leg / calculate_walking_leg),
+        or a single error dict when the whole call failed.
+        """
+        url = f"{self.base_url}/distancematrix/json"
+        params = {
+            'origins': '|'.join(origins),
+            'destinations': '|'.join(destinations),
+            'mode': 'walking' if mode == 'walking' else 'driving',
+            'key': self.api_key
+        }
+        if mode != 'walking':
+            params['departure_time'] = departure_time
+            params['traffic_model'] = 'best_guess'
+        
+        try:
+            response = requests.get(url, params=params, timeout=10)
+            data = response.json()
+            
+            if data['status'] != 'OK':
+                return {'success': False, 'error': data.get('status')}
+            
+            rows = []
+            for row in data['rows']:
+                legs = []
+                for element in row['elements']:
+                    if element.get('status') != 'OK':
+                        legs.append({'success': False, 'error': element.get('status')})
+                        continue
+                    
+                    distance_km = element['distance']['value'] / 1000
+                    if 'duration_in_traffic' in element:
+                        duration_seconds = element['duration_in_traffic']['value']
+                        traffic_status = "Current Traffic"
+                    else:
+                        duration_seconds = element['duration']['value']
+                        traffic_status = "Normal"
+                    
+                    duration_min = int(duration_seconds // 60)
+                    duration_sec = int(duration_seconds % 60)
+                    
+                    if duration_sec == 0:
+                        time_display = f"{duration_min} min"
+                    else:
+                        time_display = f"{duration_min} min {duration_sec} sec"
+                    
+                    leg = {
+                        'distance_km': distance_km,
+                        'duration_min': duration_min,
+                        'duration_sec': duration_sec,
+                        'time_display': time_display,
+                        'success': True
+                    }
+                    if mode == 'walking':
+                        leg['mode'] = 'walking'
+                    else:
+                        leg['traffic_status'] = traffic_status
+                    legs.append(leg)
+                rows.append(legs)
+            return rows
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def _fetch_batch(self, group, origins, destinations, legs):
+        """Run one batched matrix call (on a dispatch thread) and split it into per-leg results, caching each"""
+        mode, departure = group[0], group[1]
+        taxi_departure = 'now'
+        if mode == 'taxi' and departure != 'now':
+            # Every leg of the call is in one traffic bucket; ask for the earliest departure among them
+            taxi_departure = max(min(int(leg.meta[3]) for leg in legs), int(time.time()))
+        # One HTTP call, counted once for every plan with a leg in it
+        for calls in {leg.meta[4] for leg in legs}:
+            calls.add()
+        rows = self.calculate_matrix(mode, origins, destinations, taxi_departure)
+        if isinstance(rows, dict):
+            if rows.get('error') != 'OVER_QUERY_LIMIT':
+                metrics.incr('maps_batch_failures')
+                print(f"⚠️ Batched {mode} matrix call for {len(legs)} legs failed: {rows.get('error')}")
+            return rows
+        origin_index = {point: i for i, point in enumerate(origins)}
+        dest_index = {point: j for j, point in enumerate(destinations)}
+        results = []
+        for leg in legs:
+            origin_key, dest_key, bucket, departure_time, _ = leg.meta
+            result = dict(rows[origin_index[leg.origin]][dest_index[leg.dest]])
+            results.append(self._store_leg(mode, result, origin_key, dest_key, bucket, live=departure_time is None))
+        return results
+    
+    def estimate_leg(self, origin_lat, origin_lng, dest_lat, dest_lng, mode):
+        """Estimate a walking/taxi leg from straight-line distance (no API call)"""
+        distance_km = self.calculate_straight_line_distance(origin_lat, origin_lng, dest_lat, dest_lng) * ROAD_DETOUR_FACTOR
+        speed_kmph = WALKING_SPEED_KMPH if mode == 'walking' else TAXI_SPEED_KMPH
+        duration_seconds = distance_km / speed_kmph * 3600
+        
+        duration_min = int(duration_seconds // 60)
+        duration_sec = int(duration_seconds % 60)
+        
+        if duration_sec == 0:
+            time_display = f"{duration_min} min"
+        else:
+            time_display = f"{duration_min} min {duration_sec} sec"
+        
+        return {
+            'distance_km': distance_km,
+            'duration_min': duration_min,
+            'duration_sec': duration_sec,
+            'time_display': time_display,
+            'mode': mode,
+            'estimated': True,
+            'success': True
+        }
+    
     def calculate_straight_line_distance(self, lat1, lng1, lat2, lng2):
         """Calculate straight-line distance between two points in kilometers"""
         # Using Haversine formula for accurate distance calculation
@@ -196,10 +678,15 @@ class BengaluruStationFinder:
         
         return R * c
     
-    def calculate_direct_taxi(self, origin_lat, origin_lng, dest_lat, dest_lng):
-        """Calculate direct taxi route from origin to destination"""
+    @traced('calculate_direct_taxi')
+    def calculate_direct_taxi(self, origin_lat, origin_lng, dest_lat, dest_lng, future=None, departure_time=None):
+        """Calculate direct taxi route from origin to destination (or collect an already queued request)"""
         print(f"🚕 Calculating direct taxi route...")
-        result = self.calculate_taxi_leg(origin_lat, origin_lng, dest_lat, dest_lng)
+        if future is None:
+            future = self.request_leg('taxi', origin_lat, origin_lng, dest_lat, dest_lng,
+                                      snap_cell(origin_lat, origin_lng), snap_cell(dest_lat, dest_lng),
+                                      PRIORITY_DIRECT, departure_time)
+        result = future.result()
         
         if result['success']:
             print(f"✅ Direct taxi: {result['distance_km']:.1f} km ({result['time_display']})")
@@ -208,32 +695,21 @@ class BengaluruStationFinder:
             print(f"❌ Failed to calculate direct taxi: {result.get('error', 'Unknown error')}")
             return None
     
-    def check_direct_taxi_conditions(self, direct_taxi, best_multimodal_route, leg_results, initial_stations, dest_stations):
+    def check_direct_taxi_conditions(self, direct_taxi, best_multimodal_route):
         """Check if direct taxi should be suggested based on 6 rules"""
         if not direct_taxi:
-            return {'suggest': False, 'reasons': []}
+            return DirectTaxiSuggestion(suggest=False)
         
         direct_distance = direct_taxi['distance_km']
         direct_time_min = direct_taxi['duration_min'] + (direct_taxi['duration_sec'] / 60)
         
         # Get best multimodal route data
-        best_multimodal_time = best_multimodal_route['total_journey_time']
-        best_transfer_count = best_multimodal_route['transfer_count']
-        
-        # Calculate first+last mile access distances for best route
-        best_initial = best_multimodal_route['initial']
-        best_dest = best_multimodal_route['destination']
+        best_multimodal_time = best_multimodal_route.total_journey_time
+        best_transfer_count = best_multimodal_route.transfer_count
         
-        leg1_key = f"initial_to_station_{best_initial}"
-        leg2_key = f"station_to_dest_{best_dest}"
-        
-        first_access_km = 0
-        last_access_km = 0
-        
-        if leg1_key in leg_results:
-            first_access_km = leg_results[leg1_key]['distance_km']
-        if leg2_key in leg_results:
-            last_access_km = leg_results[leg2_key]['distance_km']
+        # First+last mile access distances for best route
+        first_access_km = best_multimodal_route.leg1_distance
+        last_access_km = best_multimodal_route.leg2_distance
         
         total_first_last_km = first_access_km + last_access_km
         
@@ -241,29 +717,30 @@ class BengaluruStationFinder:
         reasons = []
         
         # Rule 1: Direct distance ≤ 7 km
-        if direct_distance <= 7:
-            reasons.append(f"Direct distance ≤ 7 km ({direct_distance:.1f} km)")
+        if direct_distance <= DIRECT_TAXI_MAX_KM:
+            reasons.append(f"Direct distance ≤ {DIRECT_TAXI_MAX_KM} km ({direct_distance:.1f} km)")
         
         # Rule 2: Multimodal time ≥ 1.5 × direct time
-        if best_multimodal_time >= 1.5 * direct_time_min:
-            reasons.append(f"Multimodal time ≥ 1.5× direct time ({best_multimodal_time:.1f} min ≥ {1.5 * direct_time_min:.1f} min)")
+        if best_multimodal_time >= DIRECT_TAXI_TIME_RATIO * direct_time_min:
+            reasons.append(f"Multimodal time ≥ {DIRECT_TAXI_TIME_RATIO}× direct time ({best_multimodal_time:.1f} min ≥ {DIRECT_TAXI_TIME_RATIO * direct_time_min:.1f} min)")
         
         # Rule 3: Absolute saving ≥ 20 minutes
         time_saving = best_multimodal_time - direct_time_min
-        if time_saving >= 20:
-            reasons.append(f"Time saving ≥ 20 minutes ({time_saving:.1f} min)")
+        if time_saving >= DIRECT_TAXI_MIN_SAVING_MIN:
+            reasons.append(f"Time saving ≥ {DIRECT_TAXI_MIN_SAVING_MIN} minutes ({time_saving:.1f} min)")
         
         # Rule 4: (first_access_km + last_access_km) ≥ 0.8 × direct_distance
-        if total_first_last_km >= 0.8 * direct_distance:
-            reasons.append(f"First+last mile ≥ 80% of direct distance ({total_first_last_km:.1f} km ≥ {0.8 * direct_distance:.1f} km)")
+        if total_first_last_km >= DIRECT_TAXI_ACCESS_SHARE * direct_distance:
+            reasons.append(f"First+last mile ≥ {DIRECT_TAXI_ACCESS_SHARE:.0%} of direct distance ({total_first_last_km:.1f} km ≥ {DIRECT_TAXI_ACCESS_SHARE * direct_distance:.1f} km)")
         
         # Rule 5: Either first OR last access leg ≥ 0.7 × direct_distance
-        if first_access_km >= 0.7 * direct_distance or last_access_km >= 0.7 * direct_distance:
-            reasons.append(f"First or last leg ≥ 70% of direct distance (first: {first_access_km:.1f} km, last: {last_access_km:.1f} km)")
+        if max(first_access_km, last_access_km) >= DIRECT_TAXI_SINGLE_LEG_SHARE * direct_distance:
+            reasons.append(f"First or last leg ≥ {DIRECT_TAXI_SINGLE_LEG_SHARE:.0%} of direct distance (first: {first_access_km:.1f} km, last: {last_access_km:.1f} km)")
         
         # Rule 6: Transfers ≥ 2 AND multimodal time ≥ 1.3 × direct time
-        if best_transfer_count >= 2 and best_multimodal_time >= 1.3 * direct_time_min:
-            reasons.append(f"Transfers ≥ 2 AND multimodal time ≥ 1.3× direct time ({best_transfer_count} transfers, {best_multimodal_time:.1f} min ≥ {1.3 * direct_time_min:.1f} min)")
+        if (best_transfer_count >= DIRECT_TAXI_MULTI_TRANSFERS
+                and best_multimodal_time >= DIRECT_TAXI_MULTI_TRANSFER_RATIO * direct_time_min):
+            reasons.append(f"Transfers ≥ {DIRECT_TAXI_MULTI_TRANSFERS} AND multimodal time ≥ {DIRECT_TAXI_MULTI_TRANSFER_RATIO}× direct time ({best_transfer_count} transfers, {best_multimodal_time:.1f} min ≥ {DIRECT_TAXI_MULTI_TRANSFER_RATIO * direct_time_min:.1f} min)")
         
         suggest = len(reasons) > 0
         
@@ -276,141 +753,187 @@ class BengaluruStationFinder:
             print(f"   Direct: {direct_distance:.1f} km, {direct_time_min:.1f} min")
             print(f"   Best multimodal: {best_multimodal_time:.1f} min ({best_transfer_count} transfers)")
         
-        return {
-            'suggest': suggest,
-            'reasons': reasons,
-            'direct_distance': direct_distance,
-            'direct_time': direct_time_min,
-            'time_saving': time_saving
-        }
+        return DirectTaxiSuggestion(
+            suggest=suggest,
+            reasons=reasons,
+            direct_distance=direct_distance,
+            direct_time=direct_time_min,
+            time_saving=time_saving
+        )
+    
+    @traced('classify_trip')
+    def classify_trip(self, initial_lat, initial_lng, dest_lat, dest_lng, initial_stations, dest_stations):
+        """TrivialTrip if metro cannot win on straight-line distances alone, else None"""
+        direct_km = self.calculate_straight_line_distance(initial_lat, initial_lng, dest_lat, dest_lng)
+        if direct_km <= WALKING_MODE_THRESHOLD_KM:
+            return TrivialTrip('walk', 'walking', [f"Destination within walking distance ({direct_km:.1f} km)"])
+        
+        # Rule 1 on the estimated road distance
+        road_km = direct_km * ROAD_DETOUR_FACTOR
+        if road_km > DIRECT_TAXI_MAX_KM or not initial_stations or not dest_stations:
+            return None
+        reasons = [f"Direct distance ≤ {DIRECT_TAXI_MAX_KM} km ({road_km:.1f} km)"]
+        
+        # Rule 4 lower bound: no station pair has shorter access legs than the two nearest stations.
+        # Both ends sharing a nearest station always passes it (triangle inequality).
+        access_km = initial_stations[0].straight_line_distance + dest_stations[0].straight_line_distance
+        if access_km < DIRECT_TAXI_ACCESS_SHARE * direct_km:
+            return None
+        if initial_stations[0].station_id == dest_stations[0].station_id:
+            kind = 'same_station'
+            reasons.insert(0, f"Both ends are nearest to {initial_stations[0].name}")
+        else:
+            kind = 'short_taxi'
+        reasons.append(f"First+last mile ≥ {DIRECT_TAXI_ACCESS_SHARE:.0%} of direct distance "
+                       f"({access_km:.1f} km ≥ {DIRECT_TAXI_ACCESS_SHARE * direct_km:.1f} km)")
+        return TrivialTrip(kind, 'taxi', reasons)
+    
+    @traced('plan_trivial_trip')
+    def plan_trivial_trip(self, trip, initial_lat, initial_lng, dest_lat, dest_lng, departure_time=None,
+                          background=False):
+        """Direct walk/taxi answer for a trivial trip: one leg request, or an estimate if it fails"""
+        print(f"⚡ Trivial trip ({trip.kind}) - skipping access legs, {trip.mode} directly")
+        priority = PRIORITY_BACKGROUND if background else PRIORITY_DIRECT
+        future = self.request_leg(trip.mode, initial_lat, initial_lng, dest_lat, dest_lng,
+                                  snap_cell(initial_lat, initial_lng), snap_cell(dest_lat, dest_lng),
+                                  priority, departure_time, count=not background)
+        for _ in self._as_completed([future]):
+            pass
+        if future.done():
+            result = future.result()
+        else:
+            result = self._late_leg(future, initial_lat, initial_lng, dest_lat, dest_lng, trip.mode)
+        if not result['success']:
+            print(f"⚠️ Direct {trip.mode} leg failed ({result.get('error', 'Unknown error')}) - using an estimate")
+            result = self.estimate_leg(initial_lat, initial_lng, dest_lat, dest_lng, trip.mode)
+        
+        metrics.incr('trivial_trips')
+        metrics.incr(f"trivial_trips_{trip.kind}")
+        self.direct_taxi = result if trip.mode == 'taxi' else None
+        self.convenience_routes = []
+        self.direct_taxi_suggestion = DirectTaxiSuggestion(
+            suggest=True,
+            reasons=trip.reasons,
+            direct_distance=result['distance_km'],
+            direct_time=result['duration_min'] + result['duration_sec'] / 60,
+            mode=trip.mode,
+            trivial=trip.kind
+        )
+        return self.direct_taxi_suggestion
     
-    def calculate_all_taxi_legs(self, initial_lat, initial_lng, dest_lat, dest_lng, initial_stations, dest_stations):
-        """Calculate all 14 access legs (walking + taxi) in parallel"""
+    def calculate_all_taxi_legs(self, initial_lat, initial_lng, dest_lat, dest_lng, initial_stations, dest_stations,
+                                departure_time=None, background=False, origin_legs=None, dest_legs=None,
+                                direct_taxi=None, route_count=ROUTES_SHOWN):
+        """Calculate the direct taxi and one access leg (walking or taxi) per candidate station in parallel
+        (background=True queues behind live traffic).
+        
+        Legs already known from an earlier plan (origin_legs/dest_legs by rank, direct_taxi) are reused as-is;
+        the best route_count routes are kept.
+        """
         print("\n" + "=" * 80)
         print("🚶🚗 STEP 2: CALCULATING ACCESS LEGS")
         print("=" * 80)
-        print("📋 Calculating 14 access legs using Google Maps API...")
         
-        # Prepare all leg calculations (walking + taxi)
-        leg_calculations = []
+        # Access legs per side, indexed by candidate rank (None where the leg failed or was shed)
+        origin_legs = list(origin_legs) if origin_legs is not None else [None] * len(initial_stations)
+        dest_legs = list(dest_legs) if dest_legs is not None else [None] * len(dest_stations)
+        pending_origin = [rank for rank, leg in enumerate(origin_legs) if leg is None]
+        pending_dest = [rank for rank, leg in enumerate(dest_legs) if leg is None]
+        reused = len(origin_legs) + len(dest_legs) - len(pending_origin) - len(pending_dest)
+        print(f"📋 Calculating {len(pending_origin) + len(pending_dest)} access legs using Google Maps API...")
         
         print(f"\n📍 Preparing access leg calculations:")
-        print(f"   • 7 legs: Origin → Nearest Metro Stations")
-        print(f"   • 7 legs: Nearest Metro Stations → Destination")
-        
-        # Initial location to its 7 stations
-        for station in initial_stations:
-            leg_calculations.append({
-                'type': 'initial_to_station',
-                'station_name': station['name'],
-                'origin_lat': initial_lat,
-                'origin_lng': initial_lng,
-                'dest_lat': station['lat'],
-                'dest_lng': station['lng'],
-                'mode': station['mode']
-            })
-        
-        # Destination's 7 stations to destination
-        for station in dest_stations:
-            leg_calculations.append({
-                'type': 'station_to_dest',
-                'station_name': station['name'],
-                'origin_lat': station['lat'],
-                'origin_lng': station['lng'],
-                'dest_lat': dest_lat,
-                'dest_lng': dest_lng,
-                'mode': station['mode']
-            })
-        
-        # Count walking vs taxi legs
-        walking_count = sum(1 for calc in leg_calculations if calc['mode'] == 'walking')
-        taxi_count = sum(1 for calc in leg_calculations if calc['mode'] == 'taxi')
-        
-        print(f"\n🌐 Calling Google Maps API for {len(leg_calculations)} routes:")
+        print(f"   • {len(pending_origin)} legs: Origin → Nearest Metro Stations")
+        print(f"   • {len(pending_dest)} legs: Nearest Metro Stations → Destination")
+        if reused:
+            print(f"   • {reused} legs reused from the previous plan")
+        
+        initial_cell = snap_cell(initial_lat, initial_lng)
+        dest_cell = snap_cell(dest_lat, dest_lng)
+        direct_priority = PRIORITY_BACKGROUND if background else PRIORITY_DIRECT
+        leg_priority = PRIORITY_BACKGROUND if background else PRIORITY_STATION_LEG
+        max_wait_s = float('inf') if background else None
+        
+        pending_stations = ([initial_stations[rank] for rank in pending_origin]
+                            + [dest_stations[rank] for rank in pending_dest])
+        walking_count = sum(1 for station in pending_stations if station.mode == 'walking')
+        print(f"\n🌐 Calling Google Maps API for {len(pending_stations)} routes:")
         print(f"   • {walking_count} walking legs")
-        print(f"   • {taxi_count} taxi legs")
-        
-        # Calculate all legs in parallel
-        leg_results = {}
-        
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_calc = {}
-            
-            for calc in leg_calculations:
-                if calc['mode'] == 'walking':
-                    future = executor.submit(self.calculate_walking_leg, calc['origin_lat'], calc['origin_lng'], 
-                                           calc['dest_lat'], calc['dest_lng'])
-                else:  # taxi
-                    future = executor.submit(self.calculate_taxi_leg, calc['origin_lat'], calc['origin_lng'], 
-                                           calc['dest_lat'], calc['dest_lng'])
-                future_to_calc[future] = calc
-            
-            for future in as_completed(future_to_calc):
-                calc = future_to_calc[future]
-                try:
-                    result = future.result()
-                    if result['success']:
-                        key = f"{calc['type']}_{calc['station_name']}"
-                        # Add mode to result
-                        result['mode'] = calc['mode']
-                        leg_results[key] = result
-                except Exception as e:
-                    print(f"❌ Error calculating {calc['mode']} leg to {calc['station_name']}: {e}")
-        
-        print(f"✅ Successfully calculated {len(leg_results)} access legs")
+        print(f"   • {len(pending_stations) - walking_count} taxi legs")
+        
+        stage('legs.queue')
+        # Queue the direct taxi first, then all legs, on the shared quota-aware Maps scheduler
+        # (legs already in the leg cache resolve immediately without an API call).
+        # Nearest candidates first: most likely to win, so highest priority.
+        direct_taxi_future = None
+        if direct_taxi is None:
+            direct_taxi_future = self.request_leg('taxi', initial_lat, initial_lng, dest_lat, dest_lng,
+                                                  initial_cell, dest_cell, direct_priority, departure_time,
+                                                  max_wait_s, count=not background)
+        future_to_leg = {}
+        for rank in pending_origin:
+            station = initial_stations[rank]
+            future = self.request_leg(station.mode, initial_lat, initial_lng, station.lat, station.lng,
+                                      initial_cell, station_point(station.lat, station.lng),
+                                      leg_priority + rank, departure_time, max_wait_s, count=not background)
+            future_to_leg[future] = (origin_legs, rank, station)
+        for rank in pending_dest:
+            station = dest_stations[rank]
+            future = self.request_leg(station.mode, station.lat, station.lng, dest_lat, dest_lng,
+                                      station_point(station.lat, station.lng), dest_cell,
+                                      leg_priority + rank, departure_time, max_wait_s, count=not background)
+            future_to_leg[future] = (dest_legs, rank, station)
+        
+        stage('legs.wait')
+        # The direct taxi is waited on with the legs, so a cancelled search stops waiting for it too
+        waiting = list(future_to_leg) + ([direct_taxi_future] if direct_taxi_future is not None else [])
+        shed_count = 0
+        for future in self._as_completed(waiting):
+            if future is direct_taxi_future:
+                continue
+            legs, rank, station = future_to_leg.pop(future)
+            try:
+                result = future.result()
+                if result['success']:
+                    result['mode'] = station.mode
+                    legs[rank] = result
+                elif result.get('shed'):
+                    shed_count += 1
+            except Exception as e:
+                print(f"❌ Error calculating {station.mode} leg to {station.name}: {e}")
+        
+        # Out of time budget: whatever has not arrived is estimated
+        for future, (legs, rank, station) in future_to_leg.items():
+            if legs is origin_legs:
+                legs[rank] = self._late_leg(future, initial_lat, initial_lng, station.lat, station.lng, station.mode)
+            else:
+                legs[rank] = self._late_leg(future, station.lat, station.lng, dest_lat, dest_lng, station.mode)
+        if direct_taxi_future is not None and not direct_taxi_future.done():
+            direct_taxi_future = self._completed(
+                self._late_leg(direct_taxi_future, initial_lat, initial_lng, dest_lat, dest_lng, 'taxi'))
+        if future_to_leg:
+            print(f"⏱️ Plan deadline reached - {len(future_to_leg)} access legs estimated")
+        
+        leg_count = sum(1 for leg in origin_legs + dest_legs if leg is not None)
+        print(f"✅ Successfully calculated {leg_count} access legs")
+        if shed_count:
+            print(f"⚠️ {shed_count} low-priority legs shed by the Maps scheduler (quota pressure)")
         
         # Display results - organized by mode
-        print(f"\n🚶 WALKING LEGS: Origin → Metro Stations")
-        print("-" * 50)
-        walking_found = False
-        for station in initial_stations:
-            if station['mode'] == 'walking':
-                key = f"initial_to_station_{station['name']}"
-                if key in leg_results:
-                    result = leg_results[key]
-                    print(f"   {station['name']}: {result['distance_km']:.1f} km ({result['time_display']})")
-                    walking_found = True
-        if not walking_found:
-            print("   No walking legs found")
-        
-        print(f"\n🚗 TAXI LEGS: Origin → Metro Stations")
-        print("-" * 50)
-        taxi_found = False
-        for station in initial_stations:
-            if station['mode'] == 'taxi':
-                key = f"initial_to_station_{station['name']}"
-                if key in leg_results:
-                    result = leg_results[key]
-                    print(f"   {station['name']}: {result['distance_km']:.1f} km ({result['time_display']})")
-                    taxi_found = True
-        if not taxi_found:
-            print("   No taxi legs found")
-        
-        print(f"\n🚶 WALKING LEGS: Metro Stations → Destination")
-        print("-" * 50)
-        walking_found = False
-        for station in dest_stations:
-            if station['mode'] == 'walking':
-                key = f"station_to_dest_{station['name']}"
-                if key in leg_results:
-                    result = leg_results[key]
-                    print(f"   {station['name']}: {result['distance_km']:.1f} km ({result['time_display']})")
-                    walking_found = True
-        if not walking_found:
-            print("   No walking legs found")
-        
-        print(f"\n🚗 TAXI LEGS: Metro Stations → Destination")
-        print("-" * 50)
-        taxi_found = False
-        for station in dest_stations:
-            if station['mode'] == 'taxi':
-                key = f"station_to_dest_{station['name']}"
-                if key in leg_results:
-                    result = leg_results[key]
-                    print(f"   {station['name']}: {result['distance_km']:.1f} km ({result['time_display']})")
-                    taxi_found = True
-        if not taxi_found:
-            print("   No taxi legs found")
+        for title, stations, legs in (("Origin → Metro Stations", initial_stations, origin_legs),
+                                      ("Metro Stations → Destination", dest_stations, dest_legs)):
+            for mode, icon in (('walking', "🚶 WALKING"), ('taxi', "🚗 TAXI")):
+                print(f"\n{icon} LEGS: {title}")
+                print("-" * 50)
+                found = False
+                for station, leg in zip(stations, legs):
+                    if station.mode == mode and leg is not None:
+                        print(f"   {station.name}: {leg['distance_km']:.1f} km ({leg['time_display']})")
+                        found = True
+                if not found:
+                    print(f"   No {mode} legs found")
+        
+        stage(None)
         
         # ===============================================================
         # STEP 3: DIRECT TAXI CALCULATION
@@ -419,8 +942,12 @@ class BengaluruStationFinder:
         print("🚕 STEP 3: DIRECT TAXI CALCULATION")
         print("=" * 80)
         
-        # Calculate direct taxi in parallel with existing calculations
-        direct_taxi = self.calculate_direct_taxi(initial_lat, initial_lng, dest_lat, dest_lng)
+        # Direct taxi was queued ahead of the access legs; collect it
+        if direct_taxi_future is not None:
+            direct_taxi = self.calculate_direct_taxi(initial_lat, initial_lng, dest_lat, dest_lng,
+                                                     future=direct_taxi_future)
+        else:
+            print(f"♻️ Reusing direct taxi from the previous plan")
         
         # Store direct taxi for later use
         self.direct_taxi = direct_taxi
@@ -430,243 +957,110 @@ class BengaluruStationFinder:
         else:
             print(f"❌ Direct taxi calculation failed - will skip suggestion check")
         
+        # The whole 7×7 station grid (access, metro and scores) is evaluated once, as arrays
+        stage('score.grid')
+        grid = RouteGrid(self.network.pairs, initial_stations, dest_stations, origin_legs, dest_legs)
+        
         # ===============================================================
         # STEP 4: ACCESS COMBINATIONS
         # ===============================================================
+        stage('score.access')
         print("\n" + "=" * 80)
         print("🔄 STEP 4: CREATING ACCESS COMBINATIONS")
         print("=" * 80)
-        print(f"📊 Creating 49 combinations (7×7 station pairs)...")
-        combinations = []
+        print(f"📊 Creating {grid.size} combinations ({len(initial_stations)}×{len(dest_stations)} station pairs)...")
         
-        for initial_station in initial_stations:
-            for dest_station in dest_stations:
-                leg1_key = f"initial_to_station_{initial_station['name']}"
-                leg2_key = f"station_to_dest_{dest_station['name']}"
-                
-                if leg1_key in leg_results and leg2_key in leg_results:
-                    leg1 = leg_results[leg1_key]
-                    leg2 = leg_results[leg2_key]
-                    total_access = leg1['distance_km'] + leg2['distance_km']
-
-                    combinations.append({
-                        'initial': initial_station['name'],
-                        'destination': dest_station['name'],
-                        'leg1_distance': leg1['distance_km'],
-                        'leg2_distance': leg2['distance_km'],
-                        'leg1_mode': leg1['mode'],
-                        'leg2_mode': leg2['mode'],
-                        'total_access': total_access
-                    })
-        
-        # Sort by total access distance (ascending)
-        combinations.sort(key=lambda x: x['total_access'])
-        
-        print(f"✅ Created {len(combinations)} valid access combinations")
+        access_ranking = grid.ranked(grid.access_distance, grid.access_valid)
+        print(f"✅ Created {len(access_ranking)} valid access combinations")
         print(f"\n🏆 TOP 10 ACCESS COMBINATIONS (Shortest Total Distance):")
         print("-" * 60)
-        for i, combo in enumerate(combinations[:10], 1):
-            leg1_icon = "🚶" if combo['leg1_mode'] == 'walking' else "🚗"
-            leg2_icon = "🚶" if combo['leg2_mode'] == 'walking' else "🚗"
-            print(f"{i:2d}. {combo['initial']} → {combo['destination']}: {combo['leg1_distance']:.1f} {leg1_icon} + {combo['leg2_distance']:.1f} {leg2_icon} = {combo['total_access']:.1f} km")
+        for rank, (i, j) in enumerate(access_ranking[:10], 1):
+            leg1_icon = "🚶" if initial_stations[i].mode == 'walking' else "🚗"
+            leg2_icon = "🚶" if dest_stations[j].mode == 'walking' else "🚗"
+            print(f"{rank:2d}. {initial_stations[i].name} → {dest_stations[j].name}: {grid.leg1_distance[i]:.1f} {leg1_icon} + {grid.leg2_distance[j]:.1f} {leg2_icon} = {grid.access_distance[i, j]:.1f} km")
         
         # ===============================================================
         # STEP 5: METRO ROUTE ANALYSIS
         # ===============================================================
+        stage('score.metro')
         print("\n" + "=" * 80)
         print("🚇 STEP 5: METRO ROUTE ANALYSIS")
         print("=" * 80)
-        print(f"📋 Looking up metro routes for all 49 station combinations...")
-        metro_combinations = []
+        print(f"📋 Looking up metro routes for all {grid.size} station combinations...")
         
-        for initial_station in initial_stations:
-            for dest_station in dest_stations:
-                initial_name = initial_station['name']
-                dest_name = dest_station['name']
-                
-                # Check if metro route exists
-                metro_key = (initial_name, dest_name)
-                if metro_key in self.metro_data:
-                    metro_info = self.metro_data[metro_key]
-                    initial_line = metro_info.get('start_line', 'Unknown')
-                    dest_line = metro_info.get('end_line', 'Unknown')
-                    
-                    metro_combinations.append({
-                        'initial': initial_name,
-                        'destination': dest_name,
-                        'distance': metro_info['distance'],
-                        'time': metro_info['time'],
-                        'same_line': metro_info['same_line'],
-                        'interchange': metro_info['interchange'],
-                        'transfer_count': metro_info['transfer_count'],
-                        'initial_line': initial_line,
-                        'dest_line': dest_line
-                    })
-        
-        # Sort metro combinations by time (ascending)
-        metro_combinations.sort(key=lambda x: x['time'])
-        
-        print(f"✅ Found {len(metro_combinations)} valid metro routes")
+        metro_ranking = grid.ranked(grid.metro_time, grid.metro_valid)
+        print(f"✅ Found {len(metro_ranking)} valid metro routes")
         print(f"\n🚇 TOP 10 METRO ROUTES (Fastest):")
         print("-" * 60)
-        for i, combo in enumerate(metro_combinations[:10], 1):
-            if combo['same_line']:
-                line_info = f"Same Line ({combo['initial_line']})"
-            else:
-                if combo['transfer_count'] == 2:
-                    # Parse enhanced interchange info
-                    interchange_parts = combo['interchange'].split('|')
-                    if len(interchange_parts) > 1:
-                        line_sequence = interchange_parts[0]
-                        interchange_details = interchange_parts[1]
-                        line_info = f"Double Transfer: {line_sequence} ({interchange_details})"
-                    else:
-                        line_info = f"Double Transfer: {combo['interchange']} ({combo['initial_line']} → {combo['dest_line']})"
-                elif combo['transfer_count'] == 1:
-                    line_info = f"Single Transfer: {combo['interchange']} ({combo['initial_line']} → {combo['dest_line']})"
+        for rank, (i, j) in enumerate(metro_ranking[:10], 1):
+            initial_line, dest_line = grid.lines(i, j)
+            interchange = grid.interchange(i, j)
+            transfer_count = int(grid.transfer_count[i, j])
+            if grid.same_line[i, j]:
+                line_info = f"Same Line ({initial_line})"
+            elif transfer_count == 2:
+                # Parse enhanced interchange info
+                interchange_parts = interchange.split('|')
+                if len(interchange_parts) > 1:
+                    line_info = f"Double Transfer: {interchange_parts[0]} ({interchange_parts[1]})"
                 else:
-                    line_info = f"Different Lines ({combo['initial_line']} → {combo['dest_line']})"
+                    line_info = f"Double Transfer: {interchange} ({initial_line} → {dest_line})"
+            elif transfer_count == 1:
+                line_info = f"Single Transfer: {interchange} ({initial_line} → {dest_line})"
+            else:
+                line_info = f"Different Lines ({initial_line} → {dest_line})"
             
-            print(f"{i:2d}. {combo['initial']} → {combo['destination']}: {combo['distance']:.1f} km ({combo['time']:.0f} min) [{line_info}]")
+            print(f"{rank:2d}. {initial_stations[i].name} → {dest_stations[j].name}: {grid.metro_distance[i, j]:.1f} km ({grid.metro_time[i, j]:.0f} min) [{line_info}]")
         
         # ===============================================================
         # STEP 6: CONVENIENCE SCORING & RANKING
         # ===============================================================
+        stage('score.convenience')
         print("\n" + "=" * 80)
         print("🏆 STEP 6: CONVENIENCE SCORING & RANKING")
         print("=" * 80)
-        print(f"🧮 Calculating convenience scores for all {len(combinations)} combinations...")
+        print(f"🧮 Calculating convenience scores for all {len(access_ranking)} combinations...")
         print(f"📊 Scoring factors:")
         print(f"   • Access Score: Based on total access distance (walking + taxi, shorter = better)")
         print(f"   • Metro Score: Based on transfer count (fewer transfers = better)")
         print(f"   • Fixed Weighting: Based on transfer count only (0 transfers: 80/20, 1 transfer: 65/35, 2+ transfers: 60/40)")
         
-        # Create convenience scoring for all combinations
-        convenience_combinations = []
+        # Only the routes that are printed or returned become records
+        score_ranking = grid.ranked(grid.total_convenience_score, grid.valid, descending=True)
+        convenience_combinations = [grid.route(i, j) for i, j in score_ranking[:max(10, route_count)]]
         
-        for initial_station in initial_stations:
-            for dest_station in dest_stations:
-                initial_name = initial_station['name']
-                dest_name = dest_station['name']
-                
-                # Get access leg data
-                leg1_key = f"initial_to_station_{initial_name}"
-                leg2_key = f"station_to_dest_{dest_name}"
-                
-                # Get metro data
-                metro_key = (initial_name, dest_name)
-                
-                if leg1_key in leg_results and leg2_key in leg_results and metro_key in self.metro_data:
-                    leg1 = leg_results[leg1_key]
-                    leg2 = leg_results[leg2_key]
-                    metro_info = self.metro_data[metro_key]
-                    
-                    # Calculate access score (walking + taxi)
-                    total_access_distance = leg1['distance_km'] + leg2['distance_km']
-                    shortest_access = min([combo['total_access'] for combo in combinations])
-                    access_score = (shortest_access / total_access_distance) * 100
-                    
-                    # Metro scoring based on transfer count
-                    access_factor = min(total_access_distance / 20, 1.0)  # 0 to 1
-                    
-                    transfer_count = metro_info.get('transfer_count', 0)
-                    if transfer_count == 0:
-                        metro_score = 100  # Same line
-                    elif transfer_count == 1:
-                        penalty = 40 * access_factor  # 0 to 40 points
-                        metro_score = 100 - penalty
-                    elif transfer_count == 2:
-                        penalty = 80 * access_factor  # 0 to 80 points
-                        metro_score = 100 - penalty
-                    else:
-                        metro_score = 100
-                    
-                    # Fixed weighting based on transfer count only
-                    if transfer_count == 0:
-                        # Same line: 80% access, 20% metro
-                        total_convenience_score = (access_score * 0.8) + (metro_score * 0.2)
-                    elif transfer_count == 1:
-                        # Single transfer: 65% access, 35% metro
-                        total_convenience_score = (access_score * 0.65) + (metro_score * 0.35)
-                    elif transfer_count == 2:
-                        # Double transfer: 60% access, 40% metro
-                        total_convenience_score = (access_score * 0.6) + (metro_score * 0.4)
-                    else:
-                        # More than 2 transfers: 60% access, 40% metro
-                        total_convenience_score = (access_score * 0.6) + (metro_score * 0.4)
-                    
-                    # Calculate actual time values for convenience routes
-                    leg1_time_min = leg1['duration_min'] + (leg1['duration_sec'] / 60)
-                    leg2_time_min = leg2['duration_min'] + (leg2['duration_sec'] / 60)
-                    total_access_time = leg1_time_min + leg2_time_min
-                    
-                    # Calculate total journey time with Bengaluru transfer times
-                    metro_interchange_time = transfer_count * 3  # 3 min per transfer
-                    access_metro_interchange_time = 6  # 3 min each side
-                    total_journey_time = total_access_time + metro_info['time'] + metro_interchange_time + access_metro_interchange_time
-                    
-                    convenience_combinations.append({
-                        'initial': initial_name,
-                        'destination': dest_name,
-                        'leg1_distance': leg1['distance_km'],
-                        'leg2_distance': leg2['distance_km'],
-                        'leg1_mode': leg1['mode'],
-                        'leg2_mode': leg2['mode'],
-                        'total_access_distance': total_access_distance,
-                        'leg1_time': leg1['time_display'],
-                        'leg2_time': leg2['time_display'],
-                        'leg1_time_min': leg1_time_min,
-                        'leg2_time_min': leg2_time_min,
-                        'total_access_time': total_access_time,
-                        'metro_distance': metro_info['distance'],
-                        'metro_time': metro_info['time'],
-                        'metro_interchange_time': metro_interchange_time,
-                        'access_metro_interchange_time': access_metro_interchange_time,
-                        'total_journey_time': total_journey_time,
-                        'metro_score': metro_score,
-                        'access_score': access_score,
-                        'total_convenience_score': total_convenience_score,
-                        'same_line': metro_info['same_line'],
-                        'interchange': metro_info['interchange'],
-                        'transfer_count': transfer_count,
-                        'initial_line': metro_info.get('start_line', 'Unknown'),
-                        'dest_line': metro_info.get('end_line', 'Unknown')
-                    })
-        
-        # Sort by convenience score (highest first)
-        convenience_combinations.sort(key=lambda x: x['total_convenience_score'], reverse=True)
-        
-        print(f"✅ Calculated convenience scores for {len(convenience_combinations)} combinations")
+        print(f"✅ Calculated convenience scores for {len(score_ranking)} combinations")
         print(f"\n🏆 TOP 10 CONVENIENCE ROUTES (Highest Scores):")
         print("-" * 70)
         
         for i, combo in enumerate(convenience_combinations[:10], 1):
-            if combo['same_line']:
-                line_info = f"Same Line ({combo['initial_line']})"
+            if combo.same_line:
+                line_info = f"Same Line ({combo.initial_line})"
             else:
-                if combo['transfer_count'] == 2:
-                    interchange_parts = combo['interchange'].split('|')
+                if combo.transfer_count == 2:
+                    interchange_parts = combo.interchange.split('|')
                     if len(interchange_parts) > 1:
                         line_sequence = interchange_parts[0]
                         line_info = f"Double Transfer: {line_sequence}"
                     else:
-                        line_info = f"Double Transfer: {combo['interchange']}"
-                elif combo['transfer_count'] == 1:
-                    line_info = f"Single Transfer: {combo['interchange']}"
+                        line_info = f"Double Transfer: {combo.interchange}"
+                elif combo.transfer_count == 1:
+                    line_info = f"Single Transfer: {combo.interchange}"
                 else:
-                    line_info = f"Different Lines ({combo['initial_line']} → {combo['dest_line']})"
+                    line_info = f"Different Lines ({combo.initial_line} → {combo.dest_line})"
             
-            leg1_icon = "🚶" if combo['leg1_mode'] == 'walking' else "🚗"
-            leg2_icon = "🚶" if combo['leg2_mode'] == 'walking' else "🚗"
+            leg1_icon = "🚶" if combo.leg1_mode == 'walking' else "🚗"
+            leg2_icon = "🚶" if combo.leg2_mode == 'walking' else "🚗"
             
-            print(f"{i:2d}. {combo['initial']} → {combo['destination']}")
-            print(f"    Score: {combo['total_convenience_score']:.1f} | Time: {combo['total_journey_time']:.1f} min | Access: {combo['total_access_distance']:.1f} km | Metro: {combo['metro_distance']:.1f} km")
-            print(f"    Access: {combo['leg1_distance']:.1f} km {leg1_icon} + {combo['leg2_distance']:.1f} km {leg2_icon}")
+            print(f"{i:2d}. {combo.initial} → {combo.destination}")
+            print(f"    Score: {combo.total_convenience_score:.1f} | Time: {combo.total_journey_time:.1f} min | Access: {combo.total_access_distance:.1f} km | Metro: {combo.metro_distance:.1f} km")
+            print(f"    Access: {combo.leg1_distance:.1f} km {leg1_icon} + {combo.leg2_distance:.1f} km {leg2_icon}")
             print(f"    Route: {line_info}")
         
         # ===============================================================
         # STEP 7: DIRECT TAXI SUGGESTION CHECK
         # ===============================================================
+        stage('score.direct_taxi_rules')
         print("\n" + "=" * 80)
         print("🚕 STEP 7: DIRECT TAXI SUGGESTION CHECK")
         print("=" * 80)
@@ -680,13 +1074,11 @@ class BengaluruStationFinder:
         print(f"   Best multimodal route available: {'Yes' if best_multimodal_route else 'No'}")
         
         if best_multimodal_route and self.direct_taxi:
-            print(f"   Best multimodal route: {best_multimodal_route['initial']} → {best_multimodal_route['destination']}")
-            print(f"   Best multimodal time: {best_multimodal_route['total_journey_time']:.1f} min")
-            print(f"   Best multimodal transfers: {best_multimodal_route['transfer_count']}")
+            print(f"   Best multimodal route: {best_multimodal_route.initial} → {best_multimodal_route.destination}")
+            print(f"   Best multimodal time: {best_multimodal_route.total_journey_time:.1f} min")
+            print(f"   Best multimodal transfers: {best_multimodal_route.transfer_count}")
             
-            direct_taxi_suggestion = self.check_direct_taxi_conditions(
-                self.direct_taxi, best_multimodal_route, leg_results, initial_stations, dest_stations
-            )
+            direct_taxi_suggestion = self.check_direct_taxi_conditions(self.direct_taxi, best_multimodal_route)
         else:
             print(f"   ⚠️ Cannot check direct taxi conditions - missing data")
             if not self.direct_taxi:
@@ -700,63 +1092,244 @@ class BengaluruStationFinder:
         # ===============================================================
         # STEP 8: FINAL RECOMMENDATIONS
         # ===============================================================
+        stage('score.final')
         print("\n" + "=" * 80)
         print("🎯 STEP 8: FINAL RECOMMENDATIONS")
         print("=" * 80)
         
-        # Get top 5 convenience routes
-        top_convenience = convenience_combinations[:5]
+        # Get top convenience routes
+        top_convenience = convenience_combinations[:route_count]
         
-        print(f"🏆 TOP 5 CONVENIENCE ROUTES FOR USER:")
+        print(f"🏆 TOP {route_count} CONVENIENCE ROUTES FOR USER:")
         print("=" * 50)
         
         for i, combo in enumerate(top_convenience, 1):
-            if combo['same_line']:
-                line_info = f"Same Line ({combo['initial_line']})"
+            if combo.same_line:
+                line_info = f"Same Line ({combo.initial_line})"
             else:
-                if combo['transfer_count'] == 2:
-                    interchange_parts = combo['interchange'].split('|')
+                if combo.transfer_count == 2:
+                    interchange_parts = combo.interchange.split('|')
                     if len(interchange_parts) > 1:
                         line_sequence = interchange_parts[0]
                         line_info = f"Double Transfer: {line_sequence}"
                     else:
-                        line_info = f"Double Transfer: {combo['interchange']}"
-                elif combo['transfer_count'] == 1:
-                    line_info = f"Single Transfer: {combo['interchange']}"
+                        line_info = f"Double Transfer: {combo.interchange}"
+                elif combo.transfer_count == 1:
+                    line_info = f"Single Transfer: {combo.interchange}"
                 else:
-                    line_info = f"Different Lines ({combo['initial_line']} → {combo['dest_line']})"
+                    line_info = f"Different Lines ({combo.initial_line} → {combo.dest_line})"
             
-            leg1_icon = "🚶" if combo['leg1_mode'] == 'walking' else "🚗"
-            leg2_icon = "🚶" if combo['leg2_mode'] == 'walking' else "🚗"
+            leg1_icon = "🚶" if combo.leg1_mode == 'walking' else "🚗"
+            leg2_icon = "🚶" if combo.leg2_mode == 'walking' else "🚗"
             
-            print(f"\n{i}. {combo['initial']} → {combo['destination']}")
-            print(f"   🏆 Convenience Score: {combo['total_convenience_score']:.1f}")
-            print(f"   ⏱️  Total Journey Time: {combo['total_journey_time']:.1f} min")
-            print(f"   🚶🚗 Access Distance: {combo['total_access_distance']:.1f} km ({combo['leg1_distance']:.1f} km {leg1_icon} + {combo['leg2_distance']:.1f} km {leg2_icon})")
-            print(f"   🚇 Metro Distance: {combo['metro_distance']:.1f} km")
+            print(f"\n{i}. {combo.initial} → {combo.destination}")
+            print(f"   🏆 Convenience Score: {combo.total_convenience_score:.1f}")
+            print(f"   ⏱️  Total Journey Time: {combo.total_journey_time:.1f} min")
+            print(f"   🚶🚗 Access Distance: {combo.total_access_distance:.1f} km ({combo.leg1_distance:.1f} km {leg1_icon} + {combo.leg2_distance:.1f} km {leg2_icon})")
+            print(f"   🚇 Metro Distance: {combo.metro_distance:.1f} km")
             print(f"   🔄 Route Type: {line_info}")
         
-        print(f"\n✅ Analysis complete! Returning top 5 routes to user.")
+        print(f"\n✅ Analysis complete! Returning top {len(top_convenience)} routes to user.")
         
         # Store convenience routes for API access
-        self.convenience_routes = convenience_combinations[:5]
+        self.convenience_routes = top_convenience
+        stage(None)
         
-        return leg_results
+        return origin_legs, dest_legs
+    
+    def _start_plan(self, deadline_s=None):
+        """Reset this thread's per-plan flags; legs are waited for at most deadline_s from now"""
+        self.plan_degraded = False
+        self.plan_partial = False
+        self.start_call_count()
+        self.deadline = time.monotonic() + deadline_s if deadline_s else None
+    
+    def plan_routes(self, initial_lat, initial_lng, dest_lat, dest_lng, departure_time=None, background=False,
+                    degraded=False, deadline_s=None):
+        """Top convenience routes + direct taxi suggestion for a trip, served from the plan cache when possible.
+        
+        degraded=True (overload) answers a plan cache miss from cached, profiled or estimated legs only;
+        with deadline_s, legs still missing after that long are estimated (get_plan_partial()).
+        """
+        self._start_plan(deadline_s)
+        bucket = traffic_bucket(departure_time)
+        key = plan_key(self.network, initial_lat, initial_lng, dest_lat, dest_lng, bucket)
+        cached = plan_cache.get(key, count=not background)
+        if cached is not None:
+            print("⚡ Plan cache hit - skipping station discovery and access legs")
+            if not background:
+                return_trips.note_plan_hit(key)
+            routes = [ConvenienceRoute(**route) for route in cached['convenience_routes']]
+            suggestion = cached['direct_taxi_suggestion']
+            state = cached.get('state')
+            self.plan_token = plan_store.save(state) if state is not None and not background else None
+            return routes, DirectTaxiSuggestion(**suggestion) if suggestion else None
+        
+        if degraded:
+            print("⚠️ Over capacity - planning from cached and estimated legs only")
+            self.plan_degraded = True
+        
+        # Find nearest metro stations
+        print("\n" + "=" * 80)
+        print("🎯 STEP 1: FINDING NEAREST METRO STATIONS")
+        print("=" * 80)
+        initial_stations = self.find_nearest_stations(initial_lat, initial_lng, top_n=STATION_CANDIDATES)
+        dest_stations = self.find_nearest_stations(dest_lat, dest_lng, top_n=STATION_CANDIDATES)
+        
+        print(f"\n✅ Station Discovery Complete:")
+        print(f"   • {len(initial_stations)} nearest stations to origin")
+        print(f"   • {len(dest_stations)} nearest stations to destination")
+        
+        return self._plan_from_stations(key, initial_lat, initial_lng, dest_lat, dest_lng, initial_stations,
+                                        dest_stations, departure_time, background)
+    
+    def replan_routes(self, plan_token, initial_lat, initial_lng, departure_time=None, deadline_s=None):
+        """Re-plan a previous plan (by token) from a new origin, reusing its destination side.
+        
+        Destination legs are reused, origin legs only where the origin still snaps to the same cell and the
+        station is still a candidate; the grid is then re-ranked. Returns None for an unknown/expired token.
+        """
+        self._start_plan(deadline_s)
+        state = plan_store.load(plan_token, self.network)
+        if state is None:
+            metrics.incr('replan_token_misses')
+            return None
+        dest_lat, dest_lng = state['dest']
+        bucket = traffic_bucket(departure_time)
+        key = plan_key(self.network, initial_lat, initial_lng, dest_lat, dest_lng, bucket)
+        
+        print("\n" + "=" * 80)
+        print("🔁 REPLAN: REUSING DESTINATION SIDE OF THE PREVIOUS PLAN")
+        print("=" * 80)
+        
+        # Taxi durations belong to their traffic bucket; walking legs do not expire with it
+        same_bucket = state['bucket'] == bucket
+        def reusable(leg):
+            if leg is None or leg.get('estimated'):
+                return None
+            return leg if same_bucket or leg.get('mode') == 'walking' else None
+        
+        dest_stations = [StationCandidate(**station) for station in state['dest_stations']]
+        dest_legs = [reusable(leg) for leg in state['dest_legs']]
+        
+        initial_stations = self.find_nearest_stations(initial_lat, initial_lng, top_n=len(state['initial_stations']) or STATION_CANDIDATES)
+        origin_legs = [None] * len(initial_stations)
+        direct_taxi = None
+        if snap_cell(initial_lat, initial_lng) == state['origin_cell']:
+            previous = {station['station_id']: leg
+                        for station, leg in zip(state['initial_stations'], state['origin_legs'])}
+            # A candidate keeps its leg only if it is still reached the same way (walk vs taxi)
+            origin_legs = [reusable(previous.get(station.station_id)) for station in initial_stations]
+            origin_legs = [leg if leg is not None and leg['mode'] == station.mode else None
+                           for station, leg in zip(initial_stations, origin_legs)]
+            direct_taxi = reusable(state['direct_taxi'])
+        
+        reused = sum(1 for leg in origin_legs + dest_legs if leg is not None)
+        metrics.incr('replans')
+        metrics.incr('replan_legs_reused', reused)
+        metrics.incr('replan_legs_fetched', len(origin_legs) + len(dest_legs) - reused)
+        return self._plan_from_stations(key, initial_lat, initial_lng, dest_lat, dest_lng, initial_stations,
+                                        dest_stations, departure_time, False, origin_legs, dest_legs, direct_taxi,
+                                        state.get('routes_shown', ROUTES_SHOWN))
+    
+    def expand_routes(self, plan_token, deadline_s=None):
+        """More routes for a previous plan (by token): widen its candidate stations and merge into its ranking.
+        
+        Only the legs to the newly added stations are fetched; everything else comes from the plan state.
+        Returns the merged ranking (ROUTES_SHOWN more routes than before), or None for an unknown/expired token.
+        """
+        self._start_plan(deadline_s)
+        state = plan_store.load(plan_token, self.network)
+        if state is None:
+            metrics.incr('more_routes_token_misses')
+            return None
+        (initial_lat, initial_lng), (dest_lat, dest_lng) = state['origin'], state['dest']
+        departure_time = state['departure_time']
+        key = plan_key(self.network, initial_lat, initial_lng, dest_lat, dest_lng, traffic_bucket(departure_time))
+        
+        print("\n" + "=" * 80)
+        print("➕ MORE ROUTES: WIDENING THE CANDIDATE STATIONS OF THE PREVIOUS PLAN")
+        print("=" * 80)
+        
+        def widened(lat, lng, previous_stations, previous_legs):
+            top_n = min(len(previous_stations) + MORE_ROUTES_STATIONS, MORE_ROUTES_MAX_STATIONS)
+            stations = self.find_nearest_stations(lat, lng, top_n=top_n)
+            known = {station['station_id']: leg for station, leg in zip(previous_stations, previous_legs)
+                     if leg is not None and not leg.get('estimated')}
+            return stations, [known.get(station.station_id) for station in stations]
+        
+        initial_stations, origin_legs = widened(initial_lat, initial_lng, state['initial_stations'], state['origin_legs'])
+        dest_stations, dest_legs = widened(dest_lat, dest_lng, state['dest_stations'], state['dest_legs'])
+        direct_taxi = state['direct_taxi'] if state['direct_taxi'] and not state['direct_taxi'].get('estimated') else None
+        
+        reused = sum(1 for leg in origin_legs + dest_legs if leg is not None)
+        metrics.incr('more_routes')
+        metrics.incr('more_routes_legs_reused', reused)
+        metrics.incr('more_routes_legs_fetched', len(origin_legs) + len(dest_legs) - reused)
+        return self._plan_from_stations(key, initial_lat, initial_lng, dest_lat, dest_lng, initial_stations,
+                                        dest_stations, departure_time, False, origin_legs, dest_legs, direct_taxi,
+                                        state.get('routes_shown', ROUTES_SHOWN) + ROUTES_SHOWN)
+    
+    def _plan_from_stations(self, key, initial_lat, initial_lng, dest_lat, dest_lng, initial_stations, dest_stations,
+                            departure_time, background, origin_legs=None, dest_legs=None, direct_taxi=None,
+                            route_count=ROUTES_SHOWN):
+        """Classify, fetch the missing legs, rank, then cache the plan and issue its token.
+        
+        Only complete default-size plans go into the plan cache; degraded, partial and widened
+        (route_count > ROUTES_SHOWN) ones just get a token.
+        """
+        # Walkable or metro-can't-win trips need only the direct leg
+        trip = self.classify_trip(initial_lat, initial_lng, dest_lat, dest_lng, initial_stations, dest_stations)
+        if trip is not None:
+            self.plan_trivial_trip(trip, initial_lat, initial_lng, dest_lat, dest_lng, departure_time, background)
+        else:
+            # Calculate all taxi legs and get convenience routes
+            origin_legs, dest_legs = self.calculate_all_taxi_legs(
+                initial_lat, initial_lng, dest_lat, dest_lng, initial_stations, dest_stations, departure_time,
+                background, origin_legs, dest_legs, direct_taxi, route_count)
+        routes = self.get_convenience_routes()
+        suggestion = self.get_direct_taxi_suggestion()
+        
+        state = plan_state(self.network, initial_lat, initial_lng, dest_lat, dest_lng, departure_time,
+                           initial_stations, dest_stations,
+                           origin_legs or [None] * len(initial_stations), dest_legs or [None] * len(dest_stations),
+                           self.direct_taxi, route_count)
+        if ((routes or trip is not None) and not self.plan_degraded and not self.plan_partial
+                and route_count == ROUTES_SHOWN):
+            plan_cache.put(key, {
+                'convenience_routes': [route.to_dict() for route in routes],
+                'direct_taxi_suggestion': suggestion.to_dict() if suggestion else None,
+                'state': state
+            }, bucket_end(traffic_bucket(departure_time)))
+        self.plan_token = plan_store.save(state) if not background else None
+        return routes, suggestion
     
     def get_convenience_routes(self):
-        """Get the top 5 convenience routes for API response"""
+        """Get the top convenience routes for API response"""
         return getattr(self, 'convenience_routes', [])
     
     def get_direct_taxi_suggestion(self):
         """Get direct taxi suggestion for API response"""
         return getattr(self, 'direct_taxi_suggestion', None)
+    
+    def get_plan_token(self):
+        """Token of the last plan on this thread, for /replan"""
+        return self.plan_token
+    
+    def get_plan_degraded(self):
+        """True if the last plan on this thread was built without Maps calls (overload)"""
+        return self.plan_degraded
+    
+    def get_plan_partial(self):
+        """True if the last plan on this thread ran out of its deadline and estimated some legs"""
+        return self.plan_partial
 
     def get_station_line_color(self, station_name):
         """Get the line color for a given station"""
-        for line_name, info in METRO_LINES.items():
-            if station_name in info['stations']:
-                return info['name']
-        return "Unknown"
+        station_id = self.network.station_ids.get(station_name)
+        if station_id is None:
+            return "Unknown"
+        return self.network.station_lines[station_id]
 
 def main():
     """Multi-modal journey planner with step-by-step processing"""
@@ -791,21 +1364,21 @@ def main():
     
     # Find nearest stations for initial location
     print(f"\n📍 Initial Location - Top 7 nearest stations:")
-    initial_stations = finder.find_nearest_stations(initial_lat, initial_lng, top_n=7)
+    initial_stations = finder.find_nearest_stations(initial_lat, initial_lng, top_n=STATION_CANDIDATES)
     
     for i, station in enumerate(initial_stations, 1):
-        distance = abs(initial_lat - station['lat']) + abs(initial_lng - station['lng'])
-        print(f"{i}. {station['name']} - {station['lat']:.6f}, {station['lng']:.6f}")
-        print(f"   Distance: |{initial_lat:.6f} - {station['lat']:.6f}| + |{initial_lng:.6f} - {station['lng']:.6f}| = {distance:.6f}")
+        distance = abs(initial_lat - station.lat) + abs(initial_lng - station.lng)
+        print(f"{i}. {station.name} - {station.lat:.6f}, {station.lng:.6f}")
+        print(f"   Distance: |{initial_lat:.6f} - {station.lat:.6f}| + |{initial_lng:.6f} - {station.lng:.6f}| = {distance:.6f}")
     
     # Find nearest stations for destination
     print(f"\n🎯 Destination - Top 7 nearest stations:")
-    dest_stations = finder.find_nearest_stations(dest_lat, dest_lng, top_n=7)
+    dest_stations = finder.find_nearest_stations(dest_lat, dest_lng, top_n=STATION_CANDIDATES)
     
     for i, station in enumerate(dest_stations, 1):
-        distance = abs(dest_lat - station['lat']) + abs(dest_lng - station['lng'])
-        print(f"{i}. {station['name']} - {station['lat']:.6f}, {station['lng']:.6f}")
-        print(f"   Distance: |{dest_lat:.6f} - {station['lat']:.6f}| + |{dest_lng:.6f} - {station['lng']:.6f}| = {distance:.6f}")
+        distance = abs(dest_lat - station.lat) + abs(dest_lng - station.lng)
+        print(f"{i}. {station.name} - {station.lat:.6f}, {station.lng:.6f}")
+        print(f"   Distance: |{dest_lat:.6f} - {station.lat:.6f}| + |{dest_lng:.6f} - {station.lng:.6f}| = {distance:.6f}")
     
     # ===============================================================
     # STEP 3: Taxi Leg Calculations
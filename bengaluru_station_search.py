@@ -0,0 +1,142 @@
+# Bengaluru Metro Journey Planner - Station Search
+# In-memory autocomplete over station names, their aliases (MG Road, KR Puram)
+# and common landmarks, all resolving to a station ID and its coordinates
+# from the network, so a station trip needs no Places/geocoding call.
+#   - prefix: a sorted list of normalized names and word-suffixes, searched
+#     with bisect ("road" finds "MG Road", "kem" finds "Kempegowda");
+#   - fuzzy:  a trigram index that catches typos ("indranagar") when there
+#     are not enough prefix matches.
+
+from __future__ import annotations
+
+import bisect
+import re
+import time
+import unicodedata
+from collections import Counter
+
+
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
+MIN_FUZZY_CONTAINMENT = 0.5      # share of the query's trigrams an entry must contain
+
+KIND_RANK = {'station': 0, 'alias': 1, 'landmark': 2}
+
+
+def normalize(text):
+    """Lower-case ASCII words separated by single spaces ('Pantharapalya–Nayandahalli' → 'pantharapalya nayandahalli')"""
+    # Drop accents only; other non-ASCII characters (dashes) separate words like punctuation does
+    text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', text.lower()).split())
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StationSearchIndex:
+    """Prefix + trigram index over a network's station names, aliases and landmarks"""
+
+    def __init__(self, network):
+        self.network = network
+        # (label, kind, station_id) per searchable name
+        self.entries = []
+        for station_id, name in enumerate(network.station_names):
+            self.entries.append((name, 'station', station_id))
+        for station, aliases in network.station_aliases.items():
+            station_id = network.station_ids.get(station)
+            if station_id is not None:
+                self.entries.extend((alias, 'alias', station_id) for alias in aliases)
+        for landmark, station in network.landmarks.items():
+            station_id = network.station_ids.get(station)
+            if station_id is not None:
+                self.entries.append((landmark, 'landmark', station_id))
+
+        # Sorted (key, word position, entry) for the full name and every word-suffix of it
+        self._normalized = [normalize(label) for label, _, _ in self.entries]
+        prefix_keys = []
+        for entry, text in enumerate(self._normalized):
+            words = text.split(' ')
+            for position in range(len(words)):
+                prefix_keys.append((' '.join(words[position:]), position, entry))
+        prefix_keys.sort()
+        self._prefix_keys = prefix_keys
+        self._prefix_strings = [key for key, _, _ in prefix_keys]
+
+        self._trigrams = {}
+        self._trigram_counts = []
+        for entry, text in enumerate(self._normalized):
+            grams = trigrams(text)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._trigrams.setdefault(gram, []).append(entry)
+        self._exact = {}
+        for entry, text in enumerate(self._normalized):
+            self._exact.setdefault(text, entry)
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        """Best matching stations for a partial query, one suggestion per station"""
+        started = time.perf_counter()
+        text = normalize(query)
+        if not text:
+            return {'query': query, 'suggestions': [], 'elapsed_ms': 0.0}
+
+        # Prefix matches: rank whole-name starts before word starts, stations before aliases/landmarks
+        ranked = {}
+        start = bisect.bisect_left(self._prefix_strings, text)
+        for key, position, entry in self._prefix_keys[start:]:
+            if not key.startswith(text):
+                break
+            label, kind, _ = self.entries[entry]
+            rank = (0, min(position, 1), KIND_RANK[kind], len(label), label)
+            if entry not in ranked or rank < ranked[entry]:
+                ranked[entry] = rank
+
+        # Not enough prefix matches: fall back to trigram similarity (typos, missing letters)
+        if len(ranked) < limit:
+            query_grams = trigrams(text)
+            shared = Counter()
+            for gram in query_grams:
+                for entry in self._trigrams.get(gram, ()):
+                    shared[entry] += 1
+            for entry, count in shared.items():
+                if entry in ranked or count < MIN_FUZZY_CONTAINMENT * len(query_grams):
+                    continue
+                label, kind, _ = self.entries[entry]
+                dice = 2 * count / (len(query_grams) + self._trigram_counts[entry])
+                ranked[entry] = (1, -dice, KIND_RANK[kind], len(label), label)
+
+        suggestions = []
+        seen_stations = set()
+        for entry in sorted(ranked, key=ranked.get):
+            label, kind, station_id = self.entries[entry]
+            if station_id in seen_stations:
+                continue
+            seen_stations.add(station_id)
+            suggestions.append(self._suggestion(label, kind, station_id, fuzzy=ranked[entry][0] == 1))
+            if len(suggestions) >= limit:
+                break
+
+        return {
+            'query': query,
+            'suggestions': suggestions,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def resolve(self, name):
+        """Station ID for an exact station name, alias or landmark (None if unknown)"""
+        entry = self._exact.get(normalize(name or ''))
+        return self.entries[entry][2] if entry is not None else None
+
+    def _suggestion(self, label, kind, station_id, fuzzy):
+        network = self.network
+        return {
+            'label': label,
+            'kind': kind,
+            'station': network.station_names[station_id],
+            'line': network.station_lines[station_id],
+            'lat': float(network.lats[station_id]),
+            'lng': float(network.lngs[station_id]),
+            'fuzzy': fuzzy,
+        }
@@ -0,0 +1,169 @@
+# Bengaluru Metro Journey Planner - Request Tracing
+# Lightweight in-process span timeline for one request, for explaining a
+# single slow search (aggregate /metrics cannot). Sent with X-Trace: 1 by an
+# admin (or anyone when the app runs in debug mode), a request records spans
+# for station lookup, every Maps leg - split into time queued on the shared
+# scheduler (maps.queue) and time on the wire (maps.fetch, on the dispatch
+# thread) - legs answered from cache/profile/estimate, the direct taxi, each
+# scoring stage and serialization. The timeline comes back in the JSON body
+# ('trace') and, summed per span name, in a Server-Timing header (browser
+# devtools show it). Untraced requests only pay a thread-local lookup.
+
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from bengaluru_metrics import metrics
+
+
+TRACE_HEADER = 'X-Trace'
+TRACE_MAX_SPANS = 2000                 # a runaway request stops recording, it does not grow without bound
+SERVER_TIMING_MAX_ENTRIES = 20
+
+_current = threading.local()
+
+
+class Trace:
+    """Spans of one request, recorded from the request thread and the Maps dispatch threads"""
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.perf_counter()
+        self.spans = []
+        self.dropped = 0
+        self._stage = None
+        self._lock = threading.Lock()
+
+    def _ms(self, t):
+        return round((t - self.started) * 1000, 3)
+
+    def add(self, name, start, end, **attrs):
+        """Record a finished span (start/end in perf_counter seconds)"""
+        span = {'name': name, 'start_ms': self._ms(start), 'duration_ms': round((end - start) * 1000, 3),
+                'thread': threading.current_thread().name}
+        span.update(attrs)
+        with self._lock:
+            if len(self.spans) < TRACE_MAX_SPANS:
+                self.spans.append(span)
+            else:
+                self.dropped += 1
+
+    @contextmanager
+    def span(self, name, **attrs):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter(), **attrs)
+
+    def stage(self, name):
+        """End the current stage span (if any) and start the next one (None just ends it)"""
+        now = time.perf_counter()
+        if self._stage is not None:
+            self.add(self._stage[0], self._stage[1], now)
+        self._stage = (name, now) if name is not None else None
+
+    def finish(self):
+        self.stage(None)
+        self.total_ms = self._ms(time.perf_counter())
+        metrics.incr('traces_recorded')
+
+    def totals(self):
+        """Summed duration and count per span name"""
+        totals = defaultdict(lambda: [0.0, 0])
+        for span in self.spans:
+            totals[span['name']][0] += span['duration_ms']
+            totals[span['name']][1] += 1
+        return totals
+
+    def timeline(self):
+        """JSON-serializable trace: spans by start time plus per-name totals"""
+        return {
+            'label': self.label,
+            'total_ms': getattr(self, 'total_ms', self._ms(time.perf_counter())),
+            'spans': sorted(self.spans, key=lambda span: span['start_ms']),
+            'totals': {name: {'ms': round(ms, 3), 'count': count} for name, (ms, count) in self.totals().items()},
+            'dropped_spans': self.dropped,
+        }
+
+    def server_timing(self):
+        """Server-Timing header value: total plus the biggest per-name sums (parallel spans can exceed total)"""
+        totals = sorted(self.totals().items(), key=lambda item: item[1][0], reverse=True)
+        entries = [f"total;dur={getattr(self, 'total_ms', 0):.1f}"]
+        entries += [f'{name};dur={ms:.1f};desc="x{count}"' for name, (ms, count) in totals[:SERVER_TIMING_MAX_ENTRIES]]
+        return ', '.join(entries)
+
+
+def start_trace(label):
+    """Start tracing the current request on this thread"""
+    _current.trace = Trace(label)
+    return _current.trace
+
+
+def end_trace():
+    """Stop tracing on this thread and return the finished trace"""
+    trace = getattr(_current, 'trace', None)
+    _current.trace = None
+    if trace is not None:
+        trace.finish()
+    return trace
+
+
+def current_trace():
+    return getattr(_current, 'trace', None)
+
+
+def span(name, **attrs):
+    """Context manager timing a block into the current trace (no-op when untraced)"""
+    trace = current_trace()
+    return trace.span(name, **attrs) if trace is not None else nullcontext()
+
+
+def stage(name):
+    """Move the current trace to its next stage (no-op when untraced)"""
+    trace = current_trace()
+    if trace is not None:
+        trace.stage(name)
+
+
+def event(name, **attrs):
+    """Zero-length span, e.g. a leg answered from cache (no-op when untraced)"""
+    trace = current_trace()
+    if trace is not None:
+        now = time.perf_counter()
+        trace.add(name, now, now, **attrs)
+
+
+def traced_job(fn, **attrs):
+    """Wrap a Maps job so its time queued and its time running are both recorded in the current trace"""
+    trace = current_trace()
+    if trace is None:
+        return fn
+    queued_at = time.perf_counter()
+
+    def run(*args):
+        started = time.perf_counter()
+        trace.add('maps.queue', queued_at, started, **attrs)
+        try:
+            return fn(*args)
+        finally:
+            trace.add('maps.fetch', started, time.perf_counter(), **attrs)
+    return run
+
+
+def traced(name):
+    """Decorator timing every call of a function as a span named name"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = current_trace()
+            if trace is None:
+                return fn(*args, **kwargs)
+            with trace.span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
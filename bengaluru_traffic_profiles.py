@@ -0,0 +1,408 @@
+# Bengaluru Metro Journey Planner - Historical Traffic Profiles
+# Every live taxi leg (departure 'now') is recorded as an observation of its
+# duration_in_traffic. Observations are buffered in memory and written to a
+# SQLite log in batches by a background thread (never on the Maps dispatch
+# thread); rows older than TRAFFIC_OBSERVATION_RETENTION_DAYS are pruned. A
+# build step folds the logged observations into the existing time-of-week
+# profile per leg - one row of 336 half-hour slots (Monday 00:00 local first)
+# holding the mean duration, stored as compact float32/uint16 arrays in an
+# .npz file - and then deletes the rows it consumed, so the log only holds
+# what the profile has not seen yet. Taxi legs departing beyond
+# LIVE_HORIZON_S are answered from the profile, interpolated between slots,
+# with no Maps call; near-now departures keep using live traffic.
+#
+#   python bengaluru_traffic_profiles.py build      # fold new observations into the profile file
+#   python bengaluru_traffic_profiles.py build --fresh --days 28   # rebuild from the log only
+#   python bengaluru_traffic_profiles.py summary
+#
+# In production the web service runs the build itself (POST /admin/traffic_profiles,
+# nightly from the render.yaml cron job), since the log and the profile live on
+# its persistent disk: TRAFFIC_DATA_DIR, or TRAFFIC_OBSERVATIONS_DB /
+# TRAFFIC_PROFILE_PATH per file. The temp-dir default is for development only -
+# it is wiped on every deploy.
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from bengaluru_leg_cache import TRAFFIC_BUCKET_S
+from bengaluru_metrics import metrics
+
+
+SLOT_S = TRAFFIC_BUCKET_S
+SLOTS_PER_WEEK = 7 * 24 * 3600 // SLOT_S
+CITY_UTC_OFFSET_S = int(float(os.getenv('CITY_UTC_OFFSET_HOURS', '5.5')) * 3600)   # IST, no DST
+LIVE_HORIZON_S = int(os.getenv('TRAFFIC_LIVE_HORIZON_S', '3600'))    # closer departures use live traffic
+MAX_SLOT_GAP = 4               # interpolate across at most 2 hours of missing slots
+PROFILE_RELOAD_CHECK_S = 60
+
+# Observation writes: batched off the hot path, bounded in memory, pruned on disk
+TRAFFIC_OBSERVATION_FLUSH_S = float(os.getenv('TRAFFIC_OBSERVATION_FLUSH_S', '5'))
+TRAFFIC_OBSERVATION_BUFFER_MAX = 10000          # beyond this (log unwritable or too slow) observations are dropped
+TRAFFIC_OBSERVATION_RETENTION_DAYS = float(os.getenv('TRAFFIC_OBSERVATION_RETENTION_DAYS', '28'))
+OBSERVATION_PRUNE_INTERVAL_S = 3600
+
+TRAFFIC_DATA_DIR = os.getenv('TRAFFIC_DATA_DIR', tempfile.gettempdir())
+TRAFFIC_OBSERVATIONS_DB = os.getenv('TRAFFIC_OBSERVATIONS_DB',
+                                    os.path.join(TRAFFIC_DATA_DIR, 'bengaluru_traffic_observations.sqlite3'))
+TRAFFIC_PROFILE_PATH = os.getenv('TRAFFIC_PROFILE_PATH', os.path.join(TRAFFIC_DATA_DIR, 'bengaluru_traffic_profile.npz'))
+
+
+def week_position(timestamp):
+    """Fractional half-hour slot of the local week (0.0 = Monday 00:00) for an epoch time"""
+    # The Unix epoch was a Thursday; shift by three days so the week starts on Monday
+    seconds = (timestamp + CITY_UTC_OFFSET_S + 3 * 86400) % (7 * 86400)
+    return seconds / SLOT_S
+
+
+def profile_leg_key(origin_key, dest_key):
+    """Profile row key for a taxi leg (same endpoint keys as the leg cache)"""
+    return f"{origin_key}|{dest_key}"
+
+
+class ObservationLog:
+    """SQLite log of live taxi leg durations, shared by all workers on the host.
+
+    record() only appends to an in-memory buffer; a background thread per process writes it in one
+    transaction every flush_s seconds and prunes rows older than the retention window.
+    """
+
+    def __init__(self, db_path=TRAFFIC_OBSERVATIONS_DB, flush_s=TRAFFIC_OBSERVATION_FLUSH_S,
+                 retention_days=TRAFFIC_OBSERVATION_RETENTION_DAYS, buffer_max=TRAFFIC_OBSERVATION_BUFFER_MAX):
+        self.db_path = db_path
+        self.flush_s = flush_s
+        self.retention_s = retention_days * 86400
+        self.buffer_max = buffer_max
+        self._local = threading.local()
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._started_pid = None
+        self._pruned_at = 0.0
+
+    def _db(self):
+        if not self.db_path:
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=2, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS observations '
+                         '(leg TEXT NOT NULL, observed_at REAL NOT NULL, duration_s REAL NOT NULL, '
+                         'distance_km REAL NOT NULL)')
+        except sqlite3.Error as e:
+            print(f"⚠️ Traffic observation log unavailable ({e})")
+            self.db_path = None
+            return None
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _ensure_started(self):
+        # One writer thread per process, started lazily (never before a fork)
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._buffer = []
+            threading.Thread(target=self._writer, name='traffic-observations', daemon=True).start()
+            if self._started_pid is None:
+                atexit.register(self.flush)
+            self._started_pid = os.getpid()
+
+    def record(self, leg, observed_at, duration_s, distance_km):
+        """Queue one observed duration_in_traffic for a leg (written by the background thread)"""
+        if not self.db_path:
+            return
+        self._ensure_started()
+        with self._lock:
+            if len(self._buffer) >= self.buffer_max:
+                metrics.incr('traffic_observations_dropped')
+                return
+            self._buffer.append((leg, observed_at, duration_s, distance_km))
+
+    def _writer(self):
+        while True:
+            time.sleep(self.flush_s)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Traffic observation flush failed: {e}")
+
+    def flush(self):
+        """Write the buffered observations in one transaction, and prune expired rows now and then"""
+        with self._lock:
+            pending, self._buffer = self._buffer, []
+        conn = self._db()
+        if conn is None:
+            return
+        try:
+            if pending:
+                with conn:
+                    conn.executemany('INSERT INTO observations VALUES (?, ?, ?, ?)', pending)
+                metrics.incr('traffic_observations_recorded', len(pending))
+            now = time.time()
+            if now - self._pruned_at >= OBSERVATION_PRUNE_INTERVAL_S:
+                self._pruned_at = now
+                pruned = conn.execute('DELETE FROM observations WHERE observed_at < ?',
+                                      (now - self.retention_s,)).rowcount
+                metrics.incr('traffic_observations_pruned', pruned)
+        except sqlite3.Error as e:
+            metrics.incr('traffic_observations_dropped', len(pending))
+            print(f"⚠️ Traffic observation write failed: {e}")
+
+    def last_rowid(self):
+        """Highest row id logged so far (rows() and discard() up to it see a fixed set of rows)"""
+        conn = self._db()
+        if conn is None:
+            return 0
+        return conn.execute('SELECT COALESCE(MAX(rowid), 0) FROM observations').fetchone()[0]
+
+    def rows(self, since=None, upto=None):
+        """(leg, observed_at, duration_s, distance_km) rows, optionally only those after since / up to row upto"""
+        conn = self._db()
+        if conn is None:
+            return []
+        return conn.execute('SELECT leg, observed_at, duration_s, distance_km FROM observations '
+                            'WHERE observed_at >= ? AND rowid <= ?',
+                            (since or 0, upto if upto is not None else 2 ** 63 - 1)).fetchall()
+
+    def discard(self, upto):
+        """Delete the rows up to row id upto (once a profile build has consumed them)"""
+        conn = self._db()
+        if conn is None:
+            return 0
+        deleted = conn.execute('DELETE FROM observations WHERE rowid <= ?', (upto,)).rowcount
+        metrics.incr('traffic_observations_consumed', deleted)
+        return deleted
+
+
+class TrafficProfiles:
+    """Time-of-week duration profiles for taxi legs, as dense per-leg slot arrays"""
+
+    def __init__(self, legs, durations, counts, distances, built_at=None):
+        self.legs = list(legs)
+        self.index = {leg: row for row, leg in enumerate(self.legs)}
+        self.durations = durations      # float32 (legs, SLOTS_PER_WEEK), NaN where never observed
+        self.counts = counts            # uint16 (legs, SLOTS_PER_WEEK)
+        self.distances = distances      # float32 (legs,) median observed road distance
+        self.built_at = built_at
+
+    @classmethod
+    def empty(cls):
+        return cls([], np.empty((0, SLOTS_PER_WEEK), np.float32), np.empty((0, SLOTS_PER_WEEK), np.uint16),
+                   np.empty(0, np.float32))
+
+    @classmethod
+    def build(cls, observations, base=None):
+        """Fold (leg, observed_at, duration_s, distance_km) rows into per-slot mean durations.
+
+        With base (a previous profile) the rows are rolled up into it: slot means are combined by
+        observation count, and a leg's distance becomes the count-weighted mean of the old distance
+        and the new rows' median.
+        """
+        base = base if base is not None else cls.empty()
+        if not observations:
+            return base
+        legs = sorted(set(base.legs) | {row[0] for row in observations})
+        index = {leg: i for i, leg in enumerate(legs)}
+        rows = np.array([index[row[0]] for row in observations], dtype=np.intp)
+        slots = np.array([int(week_position(row[1])) for row in observations], dtype=np.intp)
+        durations = np.array([row[2] for row in observations], dtype=np.float64)
+        distances = np.array([row[3] for row in observations], dtype=np.float64)
+
+        totals = np.zeros((len(legs), SLOTS_PER_WEEK))
+        counts = np.zeros((len(legs), SLOTS_PER_WEEK), dtype=np.int64)
+        np.add.at(totals, (rows, slots), durations)
+        np.add.at(counts, (rows, slots), 1)
+
+        leg_distances = np.full(len(legs), np.nan)
+        new_counts = np.bincount(rows, minlength=len(legs))
+        for i in np.flatnonzero(new_counts):
+            leg_distances[i] = np.median(distances[rows == i])
+        if base.legs:
+            base_rows = np.array([index[leg] for leg in base.legs], dtype=np.intp)
+            base_counts = base.counts.astype(np.int64)
+            totals[base_rows] += np.nan_to_num(base.durations.astype(np.float64)) * base_counts
+            counts[base_rows] += base_counts
+            base_weights = base_counts.sum(axis=1)
+            new_weights = new_counts[base_rows]
+            old = base.distances.astype(np.float64)
+            leg_distances[base_rows] = np.where(
+                new_weights > 0,
+                (old * base_weights + np.nan_to_num(leg_distances[base_rows]) * new_weights)
+                / np.maximum(base_weights + new_weights, 1),
+                old)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, totals / counts, np.nan).astype(np.float32)
+        return cls(legs, means, np.minimum(counts, np.iinfo(np.uint16).max).astype(np.uint16),
+                   leg_distances.astype(np.float32), time.time())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['legs'].tolist(), data['durations'], data['counts'], data['distances'],
+                       float(data['built_at']))
+
+    def save(self, path):
+        """Write the profile atomically (readers reload it on mtime change)"""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, legs=np.array(self.legs, dtype=str), durations=self.durations,
+                            counts=self.counts, distances=self.distances, built_at=self.built_at or time.time())
+        os.replace(tmp_path, path)
+
+    def estimate_seconds(self, leg, timestamp):
+        """Profile duration for leg departing at timestamp, interpolated between slots (None if unknown)"""
+        row = self.index.get(leg)
+        if row is None:
+            return None
+        profile = self.durations[row]
+        position = week_position(timestamp) - 0.5       # slot means sit at slot midpoints
+        lower = int(np.floor(position))
+        weight = position - lower
+
+        before = after = None
+        for gap in range(MAX_SLOT_GAP + 1):
+            if before is None and not np.isnan(profile[(lower - gap) % SLOTS_PER_WEEK]):
+                before = (gap, float(profile[(lower - gap) % SLOTS_PER_WEEK]))
+            if after is None and not np.isnan(profile[(lower + 1 + gap) % SLOTS_PER_WEEK]):
+                after = (gap, float(profile[(lower + 1 + gap) % SLOTS_PER_WEEK]))
+        if before is None and after is None:
+            return None
+        if before is None:
+            return after[1]
+        if after is None:
+            return before[1]
+        # Linear interpolation between the nearest observed slots on either side
+        span = before[0] + after[0] + 1
+        t = (before[0] + weight) / span
+        return before[1] + (after[1] - before[1]) * t
+
+    def estimate_leg(self, leg, timestamp):
+        """Leg dict (same shape as a live taxi leg) from the profile, or None"""
+        duration_seconds = self.estimate_seconds(leg, timestamp)
+        if duration_seconds is None:
+            return None
+        duration_min = int(duration_seconds // 60)
+        duration_sec = int(duration_seconds % 60)
+        return {
+            'distance_km': float(self.distances[self.index[leg]]),
+            'duration_min': duration_min,
+            'duration_sec': duration_sec,
+            'time_display': f"{duration_min} min" if duration_sec == 0 else f"{duration_min} min {duration_sec} sec",
+            'traffic_status': "Historical Traffic",
+            'profile': True,
+            'success': True
+        }
+
+    def summary(self):
+        observed = self.counts > 0
+        return {
+            'legs': len(self.legs),
+            'observations': int(self.counts.sum()),
+            'slot_coverage': round(float(observed.mean()), 4) if self.legs else None,
+            'built_at': self.built_at,
+            'bytes': int(self.durations.nbytes + self.counts.nbytes + self.distances.nbytes),
+        }
+
+
+class TrafficProfileStore:
+    """Observation log plus the current profile, reloaded when the profile file changes"""
+
+    def __init__(self, profile_path=TRAFFIC_PROFILE_PATH, observations=None):
+        self.profile_path = profile_path
+        self.observations = observations or ObservationLog()
+        self._profiles = TrafficProfiles.empty()
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def profiles(self):
+        """Current profiles (re-checks the file at most every PROFILE_RELOAD_CHECK_S)"""
+        now = time.monotonic()
+        if now - self._checked_at >= PROFILE_RELOAD_CHECK_S:
+            with self._lock:
+                if now - self._checked_at >= PROFILE_RELOAD_CHECK_S:
+                    self._checked_at = now
+                    self._reload_if_changed()
+        return self._profiles
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.profile_path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            self._profiles = TrafficProfiles.load(self.profile_path)
+            self._mtime = mtime
+            print(f"🕒 Loaded traffic profiles: {self._profiles.summary()}")
+        except Exception as e:
+            print(f"⚠️ Could not load traffic profiles from {self.profile_path}: {e}")
+
+    def record(self, origin_key, dest_key, leg_result, observed_at=None):
+        """Log a live taxi leg result as an observation"""
+        self.observations.record(profile_leg_key(origin_key, dest_key), observed_at or time.time(),
+                                 leg_result['duration_min'] * 60 + leg_result['duration_sec'],
+                                 leg_result['distance_km'])
+
+    def estimate_leg(self, origin_key, dest_key, departure_time):
+        """Profile-based taxi leg for a future departure, or None"""
+        leg = self.profiles.estimate_leg(profile_leg_key(origin_key, dest_key), departure_time)
+        metrics.incr('traffic_profile_hits' if leg is not None else 'traffic_profile_misses')
+        return leg
+
+    def rebuild(self, since=None, fresh=False):
+        """Fold the logged observations into the profile file, load it, and drop the consumed rows.
+
+        fresh=True starts from an empty profile instead of the current one; since skips older rows.
+        """
+        self.observations.flush()
+        upto = self.observations.last_rowid()
+        base = None
+        if not fresh:
+            self._reload_if_changed()
+            base = self._profiles
+        profiles = TrafficProfiles.build(self.observations.rows(since, upto), base)
+        profiles.save(self.profile_path)
+        with self._lock:
+            self._profiles = profiles
+            self._mtime = os.path.getmtime(self.profile_path)
+        # Only once the profile holding them is on disk
+        self.observations.discard(upto)
+        return profiles.summary()
+
+
+def use_profile(departure_time, now=None):
+    """True if a departure is far enough ahead to be answered from the profile"""
+    return departure_time is not None and departure_time - (now or time.time()) > LIVE_HORIZON_S
+
+
+traffic_profiles = TrafficProfileStore()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or inspect the historical traffic profiles')
+    parser.add_argument('command', choices=['build', 'summary'])
+    parser.add_argument('--days', type=float, default=None, help='only use observations from the last N days')
+    parser.add_argument('--fresh', action='store_true', help='start from an empty profile instead of the current one')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        since = time.time() - args.days * 86400 if args.days else None
+        print(f"✅ Built traffic profiles: {traffic_profiles.rebuild(since, fresh=args.fresh)}")
+    else:
+        print(traffic_profiles.profiles.summary())
@@ -0,0 +1,219 @@
+# Bengaluru Metro Journey Planner - Cache Warm-up
+# Pre-fills the leg and plan caches for hot places (tech parks, major
+# stations) ahead of peak hours: every access leg between each place and its
+# nearest stations, for the current and coming traffic buckets, plus (with
+# --pairs) whole plans between the places. Requests queue at background
+# priority on the shared Maps scheduler, so they never delay live traffic and
+# are shed once the daily budget reaches its reserve.
+#
+#   python bengaluru_warmup.py --buckets 4 --pairs --max-calls 2000
+#
+# or, on a running server, POST /admin/warmup (see render.yaml for the cron job).
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import time
+
+from bengaluru_leg_cache import (leg_cache, plan_cache, leg_key, plan_key, snap_cell, station_point,
+                                 traffic_bucket, bucket_start)
+from bengaluru_maps_scheduler import PRIORITY_BACKGROUND
+from bengaluru_metrics import metrics
+
+
+HOT_PLACES = [
+    {'name': 'Whitefield (ITPL)', 'lat': 12.9866, 'lng': 77.7366},
+    {'name': 'Electronic City', 'lat': 12.8452, 'lng': 77.6602},
+    {'name': 'Manyata Tech Park', 'lat': 13.0475, 'lng': 77.6217},
+    {'name': 'Majestic', 'lat': 12.9767, 'lng': 77.5713},
+    {'name': 'Koramangala', 'lat': 12.9352, 'lng': 77.6245},
+    {'name': 'Bellandur (ORR)', 'lat': 12.9279, 'lng': 77.6760},
+]
+
+WARMUP_BUCKETS = 4          # current + next three 30-minute traffic buckets
+WARMUP_MAX_BUCKETS = 48     # at most a day ahead
+WARMUP_MAX_CALLS = 20000    # hard cap on one run's Maps HTTP calls
+WARMUP_TOP_N = 7            # same candidate count as /find_routes
+
+
+def warmup_options(data):
+    """(places, buckets, include_pairs, max_calls) from a request body, clamped to the maxima.
+
+    Raises ValueError for values that are not usable at all (non-integers, fewer than one bucket, negative calls).
+    """
+    buckets = data.get('buckets', WARMUP_BUCKETS)
+    max_calls = data.get('max_calls')
+    places = data.get('places')
+    if isinstance(buckets, bool) or not isinstance(buckets, int) or buckets < 1:
+        raise ValueError('buckets must be a positive integer')
+    if max_calls is not None and (isinstance(max_calls, bool) or not isinstance(max_calls, int) or max_calls < 0):
+        raise ValueError('max_calls must be a non-negative integer')
+    if places is not None and not (isinstance(places, list) and places and all(
+            isinstance(place, dict) and isinstance(place.get('name'), str)
+            and all(isinstance(place.get(axis), (int, float)) for axis in ('lat', 'lng')) for place in places)):
+        raise ValueError('places must be a list of {"name", "lat", "lng"}')
+    return (places, min(buckets, WARMUP_MAX_BUCKETS), bool(data.get('pairs', False)),
+            min(WARMUP_MAX_CALLS if max_calls is None else max_calls, WARMUP_MAX_CALLS))
+
+
+def bucket_departures(buckets, now=None):
+    """Departure times for the current and coming traffic buckets (None = now)"""
+    current = traffic_bucket(now)
+    return [None] + [bucket_start(current + offset) for offset in range(1, buckets)]
+
+
+def place_legs(finder, place, top_n=WARMUP_TOP_N):
+    """(mode, o_lat, o_lng, d_lat, d_lng, origin_key, dest_key) for every access leg of a place, both directions"""
+    cell = snap_cell(place['lat'], place['lng'])
+    legs = []
+    for station in finder.find_nearest_stations(place['lat'], place['lng'], top_n=top_n):
+        point = station_point(station.lat, station.lng)
+        legs.append((station.mode, place['lat'], place['lng'], station.lat, station.lng, cell, point))
+        legs.append((station.mode, station.lat, station.lng, place['lat'], place['lng'], point, cell))
+    return legs
+
+
+def _leg_coverage(leg_specs):
+    """Fraction of (leg, departure) specs already in the leg cache"""
+    if not leg_specs:
+        return None
+    cached = sum(1 for leg, departure in leg_specs
+                 if leg_cache.get(leg_key(leg[0], leg[5], leg[6], traffic_bucket(departure)), count=False) is not None)
+    return round(cached / len(leg_specs), 4)
+
+
+def _plan_coverage(finder, pair_specs):
+    """Fraction of (origin, destination, departure) specs already in the plan cache"""
+    if not pair_specs:
+        return None
+    cached = sum(1 for origin, dest, departure in pair_specs
+                 if plan_cache.get(plan_key(finder.network, origin['lat'], origin['lng'], dest['lat'], dest['lng'],
+                                            traffic_bucket(departure)), count=False) is not None)
+    return round(cached / len(pair_specs), 4)
+
+
+def run_warmup(finder, places=None, buckets=WARMUP_BUCKETS, include_pairs=False, max_calls=None):
+    """Warm the caches for places over the coming buckets and report coverage before/after"""
+    started = time.time()
+    places = places or HOT_PLACES
+    departures = bucket_departures(buckets)
+
+    print(f"🔥 Warming caches for {len(places)} places over {len(departures)} traffic buckets...")
+
+    # Walking legs are bucket-less, so they are only fetched once
+    leg_specs = []
+    seen = set()
+    for place in places:
+        for leg in place_legs(finder, place):
+            for departure in departures:
+                key = leg_key(leg[0], leg[5], leg[6], traffic_bucket(departure))
+                if key not in seen:
+                    seen.add(key)
+                    leg_specs.append((leg, departure))
+    pair_specs = [(origin, dest, departure)
+                  for origin, dest in itertools.permutations(places, 2)
+                  for departure in departures] if include_pairs else []
+
+    leg_coverage_before = _leg_coverage(leg_specs)
+    plan_coverage_before = _plan_coverage(finder, pair_specs)
+
+    # Access legs: queue every missing one at background priority, waiting for quota rather than timing out.
+    # max_calls budgets Maps HTTP calls (a batched call carries several legs), so legs go out in rounds of
+    # at most the remaining budget - each call carries at least one leg, so a round cannot overshoot it.
+    finder.start_call_count()
+    leg_calls = finder.maps_calls
+    missing = [(leg, departure) for leg, departure in leg_specs
+               if leg_cache.get(leg_key(leg[0], leg[5], leg[6], traffic_bucket(departure)), count=False) is None]
+    legs_requested = skipped = shed = failed = 0
+    while missing:
+        room = len(missing) if max_calls is None else max_calls - leg_calls.calls
+        if room <= 0:
+            skipped += len(missing)
+            break
+        batch, missing = missing[:room], missing[room:]
+        futures = [finder.request_leg(*leg, PRIORITY_BACKGROUND, departure, float('inf'), count=False)
+                   for leg, departure in batch]
+        legs_requested += len(futures)
+        for future in futures:
+            result = future.result()
+            if result.get('shed'):
+                shed += 1
+            elif not result['success']:
+                failed += 1
+    api_calls = leg_calls.calls
+
+    # Whole plans between the places (the legs above are now cached, so each costs about one direct-taxi call)
+    plans_built = 0
+    for origin, dest, departure in pair_specs:
+        if max_calls is not None and api_calls >= max_calls:
+            skipped += 1
+            continue
+        routes, _ = finder.plan_routes(origin['lat'], origin['lng'], dest['lat'], dest['lng'],
+                                       departure, background=True)
+        api_calls += finder.maps_requests
+        plans_built += bool(routes)
+
+    leg_coverage_after = _leg_coverage(leg_specs)
+    plan_coverage_after = _plan_coverage(finder, pair_specs)
+    report = {
+        'status': 'complete',
+        'places': [place['name'] for place in places],
+        'buckets': len(departures),
+        'legs': len(leg_specs),
+        'legs_requested': legs_requested,
+        'plans': len(pair_specs),
+        'plans_built': plans_built,
+        'api_calls': api_calls,
+        'shed': shed,
+        'failed': failed,
+        'skipped_over_max_calls': skipped,
+        # Share of the warmed keys that are cached - what hot-place queries would hit, not a measured hit rate
+        'leg_coverage_before': leg_coverage_before,
+        'leg_coverage_after': leg_coverage_after,
+        'leg_coverage_gain': _gain(leg_coverage_before, leg_coverage_after),
+        'plan_coverage_before': plan_coverage_before,
+        'plan_coverage_after': plan_coverage_after,
+        'plan_coverage_gain': _gain(plan_coverage_before, plan_coverage_after),
+        'elapsed_s': round(time.time() - started, 1),
+    }
+    metrics.incr('warmup_runs')
+    metrics.incr('warmup_api_calls', report['api_calls'])
+    print(f"✅ Warm-up complete: leg coverage {leg_coverage_before} → {leg_coverage_after}, "
+          f"{report['api_calls']} API calls, {shed} shed")
+    return report
+
+
+def _gain(before, after):
+    return None if before is None else round(after - before, 4)
+
+
+if __name__ == '__main__':
+    from metro_networks import registry
+
+    parser = argparse.ArgumentParser(description='Pre-fill the leg and plan caches for hot places')
+    parser.add_argument('--city', default=None, help='city key (default: DEFAULT_CITY)')
+    parser.add_argument('--places', help='JSON file with a list of {"name", "lat", "lng"} (default: built-in hot places)')
+    parser.add_argument('--buckets', type=int, default=WARMUP_BUCKETS, help='traffic buckets to warm, starting now')
+    parser.add_argument('--pairs', action='store_true', help='also build whole plans between every pair of places')
+    parser.add_argument('--max-calls', type=int, default=None,
+                        help=f'stop after this many Maps HTTP calls (at most {WARMUP_MAX_CALLS})')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    options = {'buckets': args.buckets, 'pairs': args.pairs, 'max_calls': args.max_calls}
+    if args.places:
+        with open(args.places) as f:
+            options['places'] = json.load(f)
+    try:
+        options = warmup_options(options)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report = run_warmup(registry.get(args.city).finder, *options)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"   • {key}: {value}")
@@ -4,4 +4,5 @@
 
 pip install --upgrade pip setuptools wheel
 pip install -r requirements.txt
+python bengaluru_assets.py
 
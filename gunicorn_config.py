@@ -3,6 +3,9 @@ import multiprocessing
 
 bind = "0.0.0.0:5002"
 workers = multiprocessing.cpu_count() * 2 + 1
+# Threaded workers: a worker blocked on Maps can still answer degraded plans or
+# 503s (bengaluru_admission) instead of leaving requests queued until timeout
+worker_class = "gthread"
+threads = 8
 timeout = 120
 keepalive = 5
-
@@ -0,0 +1,415 @@
+# Metro Network Registry
+# Each city's metro network (stations, lines, pair table, characteristics) is
+# described by a CitySpec and loaded lazily, on first use, into a compact
+# station-indexed form. Every loaded city gets its own station finder,
+# reachability index and station search index, so one deployment can serve
+# several cities while only paying for the ones that are actually queried.
+# The leg, plan and plan-token caches are process-wide and shared by all
+# cities: plan keys and plan states carry the network (key and data
+# fingerprint), and leg keys are coordinates, valid whatever city asks. The
+# cities therefore share one LRU budget per cache (LEG_CACHE_MAX_ENTRIES,
+# PLAN_CACHE_MAX_ENTRIES) - size those for every city served.
+#
+# Networks are immutable snapshots. A reload builds and validates a complete
+# new CityContext in a background thread and then swaps it in with a single
+# dict assignment: requests already holding the old context finish on it,
+# new requests get the new one.
+
+from __future__ import annotations
+
+import hashlib
+import importlib
+import importlib.util
+import itertools
+import os
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CITY = os.getenv('DEFAULT_CITY', 'bengaluru')
+
+
+@dataclass(frozen=True)
+class CitySpec:
+    """Where a city's network data lives"""
+    key: str
+    name: str
+    stations_module: str        # defines STATION_COORDINATES, METRO_LINES, INTERCHANGE_STATIONS
+    pairs_csv: str              # station-pair table (start_station, end_station, directions_time_min, ...)
+    characteristics_name: str   # name of the characteristics dict in stations_module
+
+
+BENGALURU = CitySpec(
+    key='bengaluru',
+    name='Bengaluru',
+    stations_module='bengaluru_metro_stations',
+    pairs_csv='bengaluru_station_pairs_final.csv',
+    characteristics_name='BENGALURU_METRO_CHARACTERISTICS',
+)
+
+
+class MetroPairTable(Mapping):
+    """Read-only (start, end) → pair info mapping backed by station-indexed arrays.
+
+    Replaces a dict of ~N² small dicts with a handful of N×N arrays plus
+    string tables; the familiar dict records are built only on lookup.
+    """
+
+    def __init__(self, station_ids, present, time, distance, transfer_count, same_line,
+                 interchange_idx, start_line_idx, end_line_idx, interchanges, lines):
+        self.station_ids = station_ids
+        self.present = present
+        self.time = time
+        self.distance = distance
+        self.transfer_count = transfer_count
+        self.same_line = same_line
+        self.interchange_idx = interchange_idx
+        self.start_line_idx = start_line_idx
+        self.end_line_idx = end_line_idx
+        self.interchanges = interchanges
+        self.lines = lines
+        self._station_names = list(station_ids)
+        self._size = int(present.sum())
+
+    def lookup(self, i, j):
+        """Pair info by station IDs (None if the pair is not in the table)"""
+        if not self.present[i, j]:
+            return None
+        return {
+            'distance': float(self.distance[i, j]),
+            'time': float(self.time[i, j]),
+            'same_line': bool(self.same_line[i, j]),
+            'interchange': self.interchanges[self.interchange_idx[i, j]],
+            'transfer_count': int(self.transfer_count[i, j]),
+            'start_line': self.lines[self.start_line_idx[i, j]],
+            'end_line': self.lines[self.end_line_idx[i, j]],
+        }
+
+    def __getitem__(self, key):
+        i = self.station_ids.get(key[0])
+        j = self.station_ids.get(key[1])
+        info = self.lookup(i, j) if i is not None and j is not None else None
+        if info is None:
+            raise KeyError(key)
+        return info
+
+    def __contains__(self, key):
+        i = self.station_ids.get(key[0])
+        j = self.station_ids.get(key[1])
+        return i is not None and j is not None and bool(self.present[i, j])
+
+    def __iter__(self):
+        for i, j in zip(*np.nonzero(self.present)):
+            yield self._station_names[i], self._station_names[j]
+
+    def __len__(self):
+        return self._size
+
+
+class MetroNetwork:
+    """One city's metro network in compact, station-indexed in-memory form"""
+
+    def __init__(self, spec, station_coordinates, metro_lines, interchange_stations, characteristics, pairs_df,
+                 station_aliases=None, landmarks=None):
+        self.spec = spec
+        self.key = spec.key
+        self.name = spec.name
+        self.metro_lines = metro_lines
+        self.interchange_stations = interchange_stations
+        self.characteristics = characteristics
+        self.station_coordinates = station_coordinates
+        self.station_aliases = station_aliases or {}    # station → other names riders use
+        self.landmarks = landmarks or {}                # landmark → station serving it
+
+        # Station IDs follow STATION_COORDINATES order (stations without coordinates are unroutable)
+        self.station_names = list(station_coordinates.keys())
+        self.station_ids = {name: i for i, name in enumerate(self.station_names)}
+        coords = np.array([station_coordinates[name] for name in self.station_names], dtype=float).reshape(-1, 2)
+        self.lats = coords[:, 0].copy()
+        self.lngs = coords[:, 1].copy()
+
+        # First line a station appears on (matches the legacy get_station_line_color lookup)
+        station_line = {}
+        for info in metro_lines.values():
+            for station in info['stations']:
+                station_line.setdefault(station, info['name'])
+        self.station_lines = [station_line.get(name, 'Unknown') for name in self.station_names]
+
+        self.pairs = self._build_pair_table(pairs_df)
+        self.fingerprint = self._fingerprint()
+
+    def _fingerprint(self):
+        """Short content hash of stations and pair times (changes whenever routing data changes)"""
+        digest = hashlib.sha1('\n'.join(self.station_names).encode('utf-8'))
+        for array in (self.lats, self.lngs, self.pairs.present, self.pairs.time, self.pairs.transfer_count):
+            digest.update(array.tobytes())
+        return digest.hexdigest()[:10]
+
+    def _build_pair_table(self, df):
+        """Pack the pair CSV into N×N arrays indexed by station ID"""
+        df = df.fillna({'interchange_station': '', 'start_line': '', 'end_line': '',
+                        'metro_distance_km': 0, 'directions_time_min': 0, 'transfer_count': 0})
+        start = df['start_station'].map(self.station_ids)
+        end = df['end_station'].map(self.station_ids)
+        known = start.notna() & end.notna()
+        self.unknown_pair_stations = sorted(
+            set(df.loc[start.isna(), 'start_station']) | set(df.loc[end.isna(), 'end_station']))
+        df = df[known]
+        rows = start[known].to_numpy(dtype=np.intp)
+        cols = end[known].to_numpy(dtype=np.intp)
+
+        n = len(self.station_names)
+        interchange_codes, interchanges = pd.factorize(df['interchange_station'].astype(str))
+        line_names = pd.Index(pd.unique(pd.concat([df['start_line'], df['end_line']]).astype(str)))
+
+        present = np.zeros((n, n), dtype=bool)
+        time = np.zeros((n, n))
+        distance = np.zeros((n, n))
+        transfer_count = np.zeros((n, n), dtype=np.int8)
+        same_line = np.zeros((n, n), dtype=bool)
+        interchange_idx = np.zeros((n, n), dtype=np.int32)
+        start_line_idx = np.zeros((n, n), dtype=np.int16)
+        end_line_idx = np.zeros((n, n), dtype=np.int16)
+
+        present[rows, cols] = True
+        time[rows, cols] = df['directions_time_min'].to_numpy(dtype=float)
+        distance[rows, cols] = df['metro_distance_km'].to_numpy(dtype=float)
+        transfer_count[rows, cols] = df['transfer_count'].to_numpy(dtype=np.int8)
+        same_line[rows, cols] = df['same_line'].to_numpy(dtype=bool)
+        interchange_idx[rows, cols] = interchange_codes
+        start_line_idx[rows, cols] = line_names.get_indexer(df['start_line'].astype(str))
+        end_line_idx[rows, cols] = line_names.get_indexer(df['end_line'].astype(str))
+
+        return MetroPairTable(self.station_ids, present, time, distance, transfer_count, same_line,
+                              interchange_idx, start_line_idx, end_line_idx,
+                              [str(x) for x in interchanges], [str(x) for x in line_names])
+
+    @classmethod
+    def load(cls, spec, fresh=False):
+        """Import the city's stations module and read its pair table.
+
+        With fresh=True the stations module is executed again from its current
+        source file (as a private snapshot, leaving the imported module alone),
+        so on-disk edits are picked up without a restart.
+        """
+        source_mtimes = network_source_mtimes(spec)
+        module = _load_stations_module(spec, fresh)
+        pairs_df = pd.read_csv(os.path.join(BASE_DIR, spec.pairs_csv))
+        network = cls(
+            spec,
+            station_coordinates=module.STATION_COORDINATES,
+            metro_lines=module.METRO_LINES,
+            interchange_stations=getattr(module, 'INTERCHANGE_STATIONS', {}),
+            characteristics=getattr(module, spec.characteristics_name, {}),
+            pairs_df=pairs_df,
+            station_aliases=getattr(module, 'STATION_ALIASES', {}),
+            landmarks=getattr(module, 'LANDMARKS', {}),
+        )
+        network.source_mtimes = source_mtimes
+        network.loaded_at = time.time()
+        print(f"✅ Loaded {network.name} metro network: {len(network.station_names)} stations, "
+              f"{len(network.pairs)} metro routes")
+        return network
+
+    def validate(self):
+        """Consistency problems that make this snapshot unsafe to serve (empty list if none)"""
+        problems = []
+        if not self.station_names:
+            problems.append("No stations with coordinates")
+
+        bad_coords = ~(np.isfinite(self.lats) & np.isfinite(self.lngs)
+                       & (np.abs(self.lats) <= 90) & (np.abs(self.lngs) <= 180))
+        for station_id in np.flatnonzero(bad_coords):
+            problems.append(f"Invalid coordinates for '{self.station_names[station_id]}'")
+
+        for info in self.metro_lines.values():
+            for station in info['stations']:
+                if station not in self.station_ids:
+                    problems.append(f"{info['name']}: '{station}' has no coordinates")
+        for station in self.interchange_stations:
+            if station not in self.station_ids:
+                problems.append(f"Interchange '{station}' is not a known station")
+        for station in self.unknown_pair_stations:
+            problems.append(f"Pair table references unknown station '{station}'")
+        for station in self.station_aliases:
+            if station not in self.station_ids:
+                problems.append(f"Aliases given for unknown station '{station}'")
+        for landmark, station in self.landmarks.items():
+            if station not in self.station_ids:
+                problems.append(f"Landmark '{landmark}' points to unknown station '{station}'")
+
+        pairs = self.pairs
+        if not len(pairs):
+            problems.append("Pair table is empty")
+        bad_times = pairs.present & ~(np.isfinite(pairs.time) & (pairs.time >= 0)
+                                      & np.isfinite(pairs.distance) & (pairs.distance >= 0))
+        if bad_times.any():
+            problems.append(f"{int(bad_times.sum())} pairs have missing or negative time/distance")
+        if (pairs.transfer_count[pairs.present] < 0).any():
+            problems.append("Pair table has negative transfer counts")
+        return problems
+
+    def nearest_station_ids(self, lat, lng, top_n):
+        """IDs of the top_n stations by |Δlat| + |Δlng| (ties keep station order)"""
+        simple_dist = np.abs(self.lats - lat) + np.abs(self.lngs - lng)
+        order = np.argsort(simple_dist, kind='stable')[:top_n]
+        return order, simple_dist[order]
+
+
+def _load_stations_module(spec, fresh):
+    """The city's stations module; a freshly executed private copy when fresh=True"""
+    if not fresh:
+        return importlib.import_module(spec.stations_module)
+    origin = importlib.util.find_spec(spec.stations_module).origin
+    module_spec = importlib.util.spec_from_file_location(f"_{spec.stations_module}_snapshot", origin)
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return module
+
+
+def network_source_mtimes(spec):
+    """Modification times of the files a city's network is built from"""
+    origin = importlib.util.find_spec(spec.stations_module).origin
+    return (os.path.getmtime(origin), os.path.getmtime(os.path.join(BASE_DIR, spec.pairs_csv)))
+
+
+class CityContext:
+    """Everything one loaded city needs to answer requests (network, finder, indexes, caches)"""
+
+    def __init__(self, network):
+        # Imported here: the finder itself depends on this module for MetroNetwork
+        from bengaluru_station_finder import BengaluruStationFinder
+        from bengaluru_isochrone import ReachabilityIndex
+        from bengaluru_station_search import StationSearchIndex
+
+        self.network = network
+        self.finder = BengaluruStationFinder(network)
+        self.reachability = ReachabilityIndex(self.finder)
+        self.search = StationSearchIndex(network)
+
+
+class NetworkRegistry:
+    """City key → lazily loaded CityContext"""
+
+    def __init__(self):
+        self._specs = {}
+        self._contexts = {}
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._versions = itertools.count(1)
+        self._reload_status = {}
+        self._attempted_mtimes = {}     # city → source mtimes of the last reload attempt, accepted or not
+
+    def register(self, spec):
+        """Make a city available; nothing is loaded until it is first requested"""
+        self._specs[spec.key] = spec
+
+    def cities(self):
+        """Registered city keys"""
+        return list(self._specs)
+
+    def loaded_cities(self):
+        """City keys that have been loaded into memory"""
+        return list(self._contexts)
+
+    def get(self, city=None):
+        """CityContext for city (loads it on first use); KeyError for unknown cities"""
+        city = (city or DEFAULT_CITY).lower()
+        context = self._contexts.get(city)
+        if context is not None:
+            return context
+        spec = self._specs[city]
+        with self._lock:
+            context = self._contexts.get(city)
+            if context is None:
+                network = MetroNetwork.load(spec)
+                network.version = next(self._versions)
+                context = CityContext(network)
+                self._contexts[city] = context
+        return context
+
+    def reload(self, city=None, background=True):
+        """Load, validate and index a fresh snapshot of city's data, then swap it in.
+
+        Runs in a daemon thread by default so nothing happens on the request
+        path; returns the thread, or the reload status when background=False.
+        """
+        spec = self._specs[(city or DEFAULT_CITY).lower()]
+        if not background:
+            return self._reload(spec)
+        thread = threading.Thread(target=self._reload, args=(spec,), name=f"reload-{spec.key}", daemon=True)
+        thread.start()
+        return thread
+
+    def _reload(self, spec):
+        with self._reload_lock:
+            started = time.perf_counter()
+            try:
+                self._attempted_mtimes[spec.key] = network_source_mtimes(spec)
+                network = MetroNetwork.load(spec, fresh=True)
+                problems = network.validate()
+                if problems:
+                    status = {'ok': False, 'errors': problems[:20]}
+                    print(f"❌ {spec.name} network reload rejected ({len(problems)} problems):")
+                    for problem in problems[:20]:
+                        print(f"   - {problem}")
+                else:
+                    network.version = next(self._versions)
+                    # Build finder and indexes before the swap so the first request on the new version is warm
+                    context = CityContext(network)
+                    self._contexts[spec.key] = context
+                    status = {'ok': True, 'version': network.version}
+                    print(f"🔄 {spec.name} network swapped to version {network.version}")
+            except Exception as e:
+                status = {'ok': False, 'errors': [str(e)]}
+                print(f"❌ {spec.name} network reload failed: {e}")
+            status['finished_at'] = time.time()
+            status['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            self._reload_status[spec.key] = status
+            return status
+
+    def status(self):
+        """Per-city load state: loaded version and the outcome of the last reload"""
+        result = {}
+        for key in self._specs:
+            context = self._contexts.get(key)
+            result[key] = {
+                'loaded': context is not None,
+                'version': context.network.version if context else None,
+                'loaded_at': context.network.loaded_at if context else None,
+                'last_reload': self._reload_status.get(key),
+            }
+        return result
+
+    def watch(self, interval_s):
+        """Poll loaded cities' source files every interval_s seconds and reload any that changed.
+
+        Files are compared with the last reload attempt, so a rejected snapshot is retried only
+        once it is edited again, not on every poll.
+        """
+        def run():
+            while True:
+                time.sleep(interval_s)
+                for key in self.loaded_cities():
+                    spec = self._specs[key]
+                    try:
+                        seen = self._attempted_mtimes.get(key, self._contexts[key].network.source_mtimes)
+                        changed = network_source_mtimes(spec) != seen
+                    except OSError:
+                        continue
+                    if changed:
+                        self._reload(spec)
+
+        thread = threading.Thread(target=run, name='network-watcher', daemon=True)
+        thread.start()
+        return thread
+
+
+registry = NetworkRegistry()
+registry.register(BENGALURU)
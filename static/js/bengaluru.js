@@ -0,0 +1,792 @@
+let autocompleteInitial, autocompleteDest;
+
+// Initialize Google Places Autocomplete
+function initAutocomplete() {
+    try {
+        const initialInput = document.getElementById('initial-address');
+        const destInput = document.getElementById('dest-address');
+
+        // Initialize autocomplete for both inputs
+        autocompleteInitial = new google.maps.places.Autocomplete(initialInput, {
+            componentRestrictions: { country: 'IN' }
+        });
+
+        autocompleteDest = new google.maps.places.Autocomplete(destInput, {
+            componentRestrictions: { country: 'IN' }
+        });
+
+        // Add place change listeners to capture coordinates
+        autocompleteInitial.addListener('place_changed', function () {
+            const place = autocompleteInitial.getPlace();
+            if (place.geometry) {
+                window.initialCoords = {
+                    lat: place.geometry.location.lat(),
+                    lng: place.geometry.location.lng(),
+                    address: place.formatted_address
+                };
+                console.log('Initial place selected:', window.initialCoords);
+            }
+        });
+
+        autocompleteDest.addListener('place_changed', function () {
+            const place = autocompleteDest.getPlace();
+            if (place.geometry) {
+                window.destCoords = {
+                    lat: place.geometry.location.lat(),
+                    lng: place.geometry.location.lng(),
+                    address: place.formatted_address
+                };
+                console.log('Destination place selected:', window.destCoords);
+            }
+        });
+
+        console.log('Google Places Autocomplete initialized with coordinate capture');
+    } catch (error) {
+        console.error('Error initializing Google Places Autocomplete:', error);
+        const inputs = document.querySelectorAll('#initial-address, #dest-address');
+        inputs.forEach(input => {
+            input.placeholder = 'Enter address manually';
+        });
+    }
+}
+
+// Local station/landmark suggestions (server-side index, no Places call or geocoding)
+const SUGGEST_DEBOUNCE_MS = 80;
+
+function attachStationSuggestions(inputId, listId, coordsKey) {
+    const input = document.getElementById(inputId);
+    const list = document.getElementById(listId);
+    if (!input || !list) {
+        return;
+    }
+    let timer = null;
+    let latestQuery = '';
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        latestQuery = query;
+        if (query.length < 2) {
+            list.innerHTML = '';
+            return;
+        }
+        timer = setTimeout(function () {
+            fetch('/suggest?q=' + encodeURIComponent(query) + '&limit=5')
+                .then(response => response.ok ? response.json() : { suggestions: [] })
+                .then(data => {
+                    if (query !== latestQuery) {
+                        return;  // a newer keystroke is already in flight
+                    }
+                    renderStationSuggestions(list, data.suggestions || [], function (suggestion) {
+                        input.value = suggestion.station;
+                        window[coordsKey] = {
+                            lat: suggestion.lat,
+                            lng: suggestion.lng,
+                            address: suggestion.station,
+                            station: suggestion.station
+                        };
+                        list.innerHTML = '';
+                        console.log('Station selected:', window[coordsKey]);
+                    });
+                })
+                .catch(() => { list.innerHTML = ''; });
+        }, SUGGEST_DEBOUNCE_MS);
+    });
+}
+
+function renderStationSuggestions(list, suggestions, onSelect) {
+    list.innerHTML = '';
+    suggestions.forEach(suggestion => {
+        const item = document.createElement('li');
+        const detail = suggestion.label !== suggestion.station ? ` → ${suggestion.station}` : '';
+        item.textContent = `🚇 ${suggestion.label}${detail} (${suggestion.line})`;
+        item.addEventListener('mousedown', function (event) {
+            event.preventDefault();
+            onSelect(suggestion);
+        });
+        list.appendChild(item);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function () {
+    attachStationSuggestions('initial-address', 'initial-suggestions', 'initialCoords');
+    attachStationSuggestions('dest-address', 'dest-suggestions', 'destCoords');
+});
+
+// Searches: only the latest one runs. A re-submit aborts the one in flight (and tells the
+// server, which drops its queued Maps requests); rapid re-clicks are debounced.
+const SEARCH_DEBOUNCE_MS = 300;
+const clientId = newSearchId();
+let activeSearch = null;
+let searchTimer = null;
+let lastSearchAt = 0;
+
+function newSearchId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+function cancelActiveSearch() {
+    if (!activeSearch) {
+        return;
+    }
+    activeSearch.controller.abort();
+    navigator.sendBeacon('/cancel', JSON.stringify({ client_id: clientId, search_id: activeSearch.id }));
+    activeSearch = null;
+}
+
+window.addEventListener('pagehide', cancelActiveSearch);
+
+function findRoutes() {
+    clearTimeout(searchTimer);
+    const sinceLast = Date.now() - lastSearchAt;
+    searchTimer = setTimeout(runSearch, Math.max(0, SEARCH_DEBOUNCE_MS - sinceLast));
+}
+
+function runSearch() {
+    // Check if we have coordinates from autocomplete
+    if (!window.initialCoords || !window.destCoords) {
+        showError('Please select addresses from the suggestions. Type and click on a suggestion to select it.');
+        return;
+    }
+
+    const loading = document.getElementById('loading');
+    const results = document.getElementById('results-section');
+    // Use the correct button id; fallback to class if needed
+    const findButton = document.getElementById('find-routes-btn') || document.querySelector('.find-button');
+
+    cancelActiveSearch();
+    currentPlan = null;
+    const search = { id: newSearchId(), controller: new AbortController() };
+    activeSearch = search;
+    lastSearchAt = Date.now();
+
+    // Show loading state (the button stays enabled so an edited search can replace this one)
+    loading.style.display = 'block';
+    results.classList.remove('show');
+    if (findButton) {
+        findButton.textContent = 'Finding Routes...';
+    }
+
+    function finishLoading() {
+        loading.style.display = 'none';
+        if (findButton) {
+            findButton.textContent = 'Find Routes';
+        }
+    }
+
+    // Send coordinates directly to backend
+    fetch('/find_routes', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        signal: search.controller.signal,
+        body: JSON.stringify({
+            initial_lat: window.initialCoords.lat,
+            initial_lng: window.initialCoords.lng,
+            initial_address: window.initialCoords.address,
+            dest_lat: window.destCoords.lat,
+            dest_lng: window.destCoords.lng,
+            dest_address: window.destCoords.address,
+            departure_time: getDepartureTime(),
+            client_id: clientId,
+            search_id: search.id,
+            response_version: 2
+        })
+    })
+        .then(response => {
+            if (response.status === 503) {
+                // Planner over capacity: surface the server's retry hint instead of a generic failure
+                const retryAfter = response.headers.get('Retry-After') || 5;
+                return { error: `The planner is busy right now. Please try again in ${retryAfter} seconds.` };
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (activeSearch !== search) {
+                return;  // superseded by a newer search
+            }
+            activeSearch = null;
+            data = expandCompactResponse(data);
+            finishLoading();
+
+            if (data.error) {
+                showError('Error: ' + data.error);
+            } else if ((!data.convenience_routes || data.convenience_routes.length === 0) &&
+                       !(data.direct_taxi_suggestion && data.direct_taxi_suggestion.trivial)) {
+                showError('No routes found. Please try different locations.');
+            } else {
+                displayResults(data);
+                results.classList.add('show');
+                // Scroll to results
+                results.scrollIntoView({ behavior: 'smooth' });
+            }
+        })
+        .catch(error => {
+            if (error.name === 'AbortError' || activeSearch !== search) {
+                return;  // aborted on purpose; the newer search owns the loading state
+            }
+            activeSearch = null;
+            finishLoading();
+            console.error('Error:', error);
+            showError('An error occurred while calculating the route. Please check your internet connection and try again.');
+        });
+}
+
+// "Show more routes": the server widens the plan behind plan_token and returns the merged ranking
+let currentPlan = null;
+
+function updateMoreRoutes(data) {
+    const moreButton = document.getElementById('more-routes-btn');
+    const title = document.getElementById('convenience-title');
+    const shown = data.convenience_routes.length;
+    // Nothing more to show once an expansion stops adding routes
+    const exhausted = currentPlan !== null && data.expanded && shown <= currentPlan.shown;
+    currentPlan = data.plan_token ? { token: data.plan_token, shown: shown } : null;
+    if (title) {
+        title.textContent = `🏆 Top ${shown} Convenience Routes`;
+    }
+    if (moreButton) {
+        moreButton.style.display = currentPlan && shown > 0 && !exhausted ? 'block' : 'none';
+        moreButton.disabled = false;
+        moreButton.textContent = 'Show more routes';
+    }
+}
+
+function moreRoutes() {
+    if (!currentPlan) {
+        return;
+    }
+    const moreButton = document.getElementById('more-routes-btn');
+    moreButton.disabled = true;
+    moreButton.textContent = 'Finding more routes...';
+    const plan = currentPlan;
+
+    fetch('/more_routes', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ plan_token: plan.token, response_version: 2 })
+    })
+        .then(response => {
+            if (response.status === 404) {
+                // Plan expired: search again from scratch
+                return null;
+            }
+            if (response.status === 503) {
+                const retryAfter = response.headers.get('Retry-After') || 5;
+                return { error: `The planner is busy right now. Please try again in ${retryAfter} seconds.` };
+            }
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(data => {
+            if (currentPlan !== plan) {
+                return;  // a new search replaced this plan
+            }
+            if (data === null) {
+                findRoutes();
+                return;
+            }
+            data = expandCompactResponse(data);
+            if (data.error) {
+                moreButton.disabled = false;
+                moreButton.textContent = 'Show more routes';
+                showError('Error: ' + data.error);
+                return;
+            }
+            data.expanded = true;
+            displayResults(data);
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            moreButton.disabled = false;
+            moreButton.textContent = 'Show more routes';
+        });
+}
+
+// Chosen departure as epoch seconds (null = leave now)
+function getDepartureTime() {
+    const input = document.getElementById('departure-time');
+    if (!input || !input.value) {
+        return null;
+    }
+    return Math.floor(new Date(input.value).getTime() / 1000);
+}
+
+// Rebuild the fields a compact (v2) response leaves out
+function expandCompactResponse(data) {
+    if (!data || data.v !== 2 || !data.convenience_routes) {
+        return data;
+    }
+    const transferTime = data.constants.transfer_time_min;
+    const accessTransferTime = data.constants.access_transfer_time_min;
+    data.convenience_routes = data.convenience_routes.map(route => {
+        const totalAccessTime = route.leg1_time_min + route.leg2_time_min;
+        const metroInterchangeTime = route.transfer_count * transferTime;
+        return Object.assign({}, route, {
+            same_line: route.transfer_count === 0,
+            total_access_distance: route.leg1_distance + route.leg2_distance,
+            total_access_time: totalAccessTime,
+            metro_interchange_time: metroInterchangeTime,
+            access_metro_interchange_time: accessTransferTime,
+            total_journey_time: totalAccessTime + route.metro_time + metroInterchangeTime + accessTransferTime,
+            leg1_time: route.leg1_time_min.toFixed(1),
+            leg2_time: route.leg2_time_min.toFixed(1),
+            total_convenience_score: route.score
+        });
+    });
+    return data;
+}
+
+function displayResults(data) {
+    const convenienceContainer = document.getElementById('convenience-routes');
+    const directTaxiSection = document.getElementById('direct-taxi-section');
+    const directTaxiCard = document.getElementById('direct-taxi-card');
+
+    // Check if containers exist
+    if (!convenienceContainer || !directTaxiSection || !directTaxiCard) {
+        console.error('Required containers not found');
+        showError('Error: Page elements not found. Please refresh the page.');
+        return;
+    }
+
+    // Reset containers before displaying new results
+    convenienceContainer.innerHTML = '';
+    directTaxiCard.innerHTML = '';
+
+    // Check if data exists and has required properties
+    if (!data || !data.convenience_routes) {
+        console.error('Invalid data structure:', data);
+        showError('Invalid data received from server. Please try again.');
+        return;
+    }
+
+    // Display direct taxi suggestion if available
+    if (data.direct_taxi_suggestion) {
+        displayDirectTaxiSuggestion(data.direct_taxi_suggestion);
+        directTaxiSection.style.display = 'block';
+    } else {
+        directTaxiSection.style.display = 'none';
+    }
+
+    // Get the addresses from the input fields
+    const initialAddress = document.getElementById('initial-address').value.trim();
+    const destAddress = document.getElementById('dest-address').value.trim();
+
+    // Display convenience routes
+    convenienceContainer.innerHTML = data.convenience_routes.map((route, index) => {
+        try {
+            // Safely access route properties with fallbacks
+            const safeRoute = {
+                initial: route.initial || 'Unknown',
+                destination: route.destination || 'Unknown',
+                total_journey_time: route.total_journey_time || 0,
+                total_access_distance: route.total_access_distance || 0,
+                metro_distance: route.metro_distance || 0,
+                total_access_time: route.total_access_time || 0,
+                metro_time: route.metro_time || 0,
+                metro_interchange_time: route.metro_interchange_time || 0,
+                access_metro_interchange_time: route.access_metro_interchange_time || 0,
+                same_line: route.same_line || false,
+                interchange: route.interchange || '',
+                initial_line: route.initial_line || 'Unknown',
+                dest_line: route.dest_line || 'Unknown',
+                transfer_count: route.transfer_count || 0,
+                // Add missing properties for preview
+                leg1_distance: route.leg1_distance || (route.total_access_distance / 2),
+                leg2_distance: route.leg2_distance || (route.total_access_distance / 2),
+                leg1_mode: route.leg1_mode || 'taxi',
+                leg2_mode: route.leg2_mode || 'taxi',
+                leg1_time: route.leg1_time || (route.total_access_time / 2),
+                leg2_time: route.leg2_time || (route.total_access_time / 2)
+            };
+
+            // Format route info based on transfer count
+            let routeInfo = '';
+            if (safeRoute.same_line) {
+                routeInfo = `Same Line (${safeRoute.initial_line})`;
+            } else if (safeRoute.transfer_count === 2) {
+                // Parse enhanced interchange info for double transfers
+                const interchangeParts = safeRoute.interchange.split('|');
+                if (interchangeParts.length > 1) {
+                    const lineSequence = interchangeParts[0];
+                    routeInfo = `Double Transfer: ${lineSequence}`;
+                } else {
+                    routeInfo = `Double Transfer: ${safeRoute.interchange}`;
+                }
+            } else if (safeRoute.transfer_count === 1) {
+                routeInfo = `Single Transfer: ${safeRoute.interchange}`;
+            } else {
+                routeInfo = `Different Lines (${safeRoute.initial_line} → ${safeRoute.dest_line})`;
+            }
+
+            // Get route type icon
+            let routeIcon = '🚇';
+            if (safeRoute.same_line) {
+                routeIcon = '🟣';
+            } else if (safeRoute.transfer_count === 1) {
+                routeIcon = '🔄';
+            } else if (safeRoute.transfer_count === 2) {
+                routeIcon = '🔄🔄';
+            }
+
+            return `
+                <div class="route-card">
+                    <div class="route-header">
+                        <div class="route-title">
+                            <span class="route-icon">${routeIcon}</span>
+                            ${index + 1}. ${safeRoute.initial} → ${safeRoute.destination}
+                        </div>
+                        <div class="route-score">
+                            <span class="time-icon">⏱️</span>
+                            ${safeRoute.total_journey_time.toFixed(1)} min
+                        </div>
+                    </div>
+                    <div class="route-details">
+                        <div class="detail-item">
+                            <div class="detail-label">🚶🚗 Access Distance</div>
+                            <div class="detail-value">${safeRoute.total_access_distance.toFixed(1)} km</div>
+                        </div>
+                        <div class="detail-item">
+                            <div class="detail-label">🚇 Metro Distance</div>
+                            <div class="detail-value">${safeRoute.metro_distance.toFixed(1)} km</div>
+                        </div>
+                        <div class="detail-item">
+                            <div class="detail-label">⏱️ Total Time</div>
+                            <div class="detail-value">${safeRoute.total_journey_time.toFixed(1)} min</div>
+                        </div>
+                        <div class="detail-item">
+                            <div class="detail-label">🔄 Transfers</div>
+                            <div class="detail-value">${safeRoute.transfer_count}</div>
+                        </div>
+                    </div>
+                    <div class="route-info">
+                        <strong>Route:</strong> ${routeInfo}
+                    </div>
+                    <div class="route-info">
+                        <strong>Access:</strong> ${safeRoute.leg1_distance.toFixed(1)} km ${safeRoute.leg1_mode === 'walking' ? '🚶' : '🚗'} + ${safeRoute.leg2_distance.toFixed(1)} km ${safeRoute.leg2_mode === 'walking' ? '🚶' : '🚗'}
+                    </div>
+                    <div class="route-actions">
+                        <button class="preview-btn" onclick="showPreview(${JSON.stringify(safeRoute).replace(/"/g, '&quot;')}, '${initialAddress}', '${destAddress}')">
+                            👁️ Preview Details
+                        </button>
+                    </div>
+                </div>
+            `;
+        } catch (error) {
+            console.error('Error processing route:', route, error);
+            return `
+                <div class="route-card error">
+                    <div class="route-header">
+                        <div class="route-title">${index + 1}. Error processing route</div>
+                    </div>
+                    <div class="route-details">
+                        <div class="detail-item">
+                            <div class="detail-label">Error</div>
+                            <div class="detail-value">Failed to display route data</div>
+                        </div>
+                    </div>
+                </div>
+            `;
+        }
+    }).join('');
+
+    updateMoreRoutes(data);
+}
+
+function displayDirectTaxiSuggestion(directTaxiData) {
+    const directTaxiCard = document.getElementById('direct-taxi-card');
+
+    if (!directTaxiData) {
+        directTaxiCard.innerHTML = '';
+        return;
+    }
+
+    const isSuggested = directTaxiData.suggest;
+    const directDistance = directTaxiData.direct_distance || 0;
+    const directTime = directTaxiData.direct_time || 0;
+    const timeSaving = directTaxiData.time_saving || 0;
+    const reasons = directTaxiData.reasons || [];
+    // Trivial trips (walkable, or metro can't win) come back with only this direct leg
+    const isWalk = directTaxiData.mode === 'walking';
+    const modeName = isWalk ? 'Walk' : 'Taxi';
+
+    // Get the addresses from the input fields
+    const initialAddress = document.getElementById('initial-address').value.trim();
+    const destAddress = document.getElementById('dest-address').value.trim();
+
+    let cardClass = 'route-card';
+    let suggestionText = '';
+    let reasonsHtml = '';
+
+    if (isSuggested) {
+        cardClass += ' suggested';
+        suggestionText = '🎯 RECOMMENDED';
+        if (reasons.length > 0) {
+            reasonsHtml = `
+                <div class="route-info">
+                    <strong>Why Direct ${modeName}:</strong>
+                    <ul style="margin: 10px 0; padding-left: 20px;">
+                        ${reasons.map(reason => `<li>${reason}</li>`).join('')}
+                    </ul>
+                </div>
+            `;
+        }
+    } else {
+        cardClass += ' not-suggested';
+        suggestionText = 'ℹ️ NOT RECOMMENDED';
+        reasonsHtml = `
+            <div class="route-info">
+                <strong>Note:</strong> Direct taxi may not be the best option for this route. Consider the multimodal options below.
+            </div>
+        `;
+    }
+
+    directTaxiCard.innerHTML = `
+        <div class="${cardClass}">
+            <div class="route-header">
+                <div class="route-title">
+                    <span class="route-icon">${isWalk ? '🚶' : '🚕'}</span>
+                    Direct ${modeName} Route
+                    <span style="margin-left: 10px; font-size: 0.9rem; color: ${isSuggested ? '#4CAF50' : '#666'};">
+                        ${suggestionText}
+                    </span>
+                </div>
+                <div class="route-score">
+                    <span class="time-icon">⏱️</span>
+                    ${directTime.toFixed(1)} min
+                </div>
+            </div>
+            <div class="route-details">
+                <div class="detail-item">
+                    <div class="detail-label">${isWalk ? '🚶' : '🚗'} Distance</div>
+                    <div class="detail-value">${directDistance.toFixed(1)} km</div>
+                </div>
+                <div class="detail-item">
+                    <div class="detail-label">⏱️ Time</div>
+                    <div class="detail-value">${directTime.toFixed(1)} min</div>
+                </div>
+                <div class="detail-item">
+                    <div class="detail-label">💰 Estimated Cost</div>
+                    <div class="detail-value">₹${isWalk ? 0 : Math.round(directDistance * 12)}</div>
+                </div>
+                ${timeSaving > 0 ? `
+                <div class="detail-item">
+                    <div class="detail-label">⚡ Time Saved</div>
+                    <div class="detail-value">${timeSaving.toFixed(1)} min</div>
+                </div>
+                ` : ''}
+            </div>
+            <div class="route-info">
+                <strong>Route:</strong> ${initialAddress} → ${destAddress}
+            </div>
+            ${reasonsHtml}
+            <div class="route-actions">
+                <button class="preview-btn" onclick="showDirectTaxiPreview('${initialAddress}', '${destAddress}', ${directDistance}, ${directTime})">
+                    👁️ Preview Details
+                </button>
+            </div>
+        </div>
+    `;
+}
+
+function showDirectTaxiPreview(initialAddress, destAddress, distance, time) {
+    // Create a simple preview for direct taxi
+    const modal = document.getElementById('preview-modal');
+    const modalContent = modal.querySelector('.preview-modal-content');
+
+    modalContent.innerHTML = `
+        <div class="preview-header">
+            <span class="preview-close" onclick="closePreview()">&times;</span>
+            <h2>🚕 Direct Taxi Route</h2>
+        </div>
+        <div class="preview-body">
+            <div class="route-summary">
+                <div class="origin-dest">
+                    <span>${initialAddress}</span>
+                    <span>→</span>
+                    <span>${destAddress}</span>
+                </div>
+                <div class="total-info">
+                    <span>💰 Total: ₹${Math.round(distance * 12)}</span>
+                    <span>⏱️ ${time.toFixed(1)} mins</span>
+                </div>
+            </div>
+            <div class="legs-container">
+                <div class="leg-card">
+                    <div class="leg-header">
+                        <span class="leg-title">🚗 Direct Taxi | ${distance.toFixed(1)} km</span>
+                    </div>
+                    <div class="leg-route">
+                        ${initialAddress} → ${destAddress}
+                    </div>
+                    <div class="leg-details">
+                        <span class="leg-cost">₹${Math.round(distance * 12)}</span>
+                        <span class="leg-time">${time.toFixed(1)} min</span>
+                    </div>
+                </div>
+            </div>
+        </div>
+    `;
+
+    modal.style.display = 'block';
+}
+
+function showError(message) {
+    // Create error notification
+    const errorDiv = document.createElement('div');
+    errorDiv.className = 'error-notification';
+    errorDiv.innerHTML = `
+        <div class="error-content">
+            <span class="error-icon">⚠️</span>
+            <span class="error-message">${message}</span>
+            <button class="error-close" onclick="this.parentElement.parentElement.remove()">×</button>
+        </div>
+    `;
+
+    // Add to page
+    document.body.appendChild(errorDiv);
+
+    // Auto-remove after 5 seconds
+    setTimeout(() => {
+        if (errorDiv.parentElement) {
+            errorDiv.remove();
+        }
+    }, 5000);
+}
+
+function showPreview(route, initialAddress, destAddress) {
+    // Validate route data
+    if (!route || !route.leg1_distance || !route.leg2_distance || !route.metro_distance) {
+        console.error('Invalid route data for preview:', route);
+        showError('Cannot show preview: Route data is incomplete');
+        return;
+    }
+
+    // Calculate costs based on route data
+    const leg1Cost = route.leg1_mode === 'walking' ? 0 : calculateTaxiCost(route.leg1_distance);
+    const leg2Cost = route.leg2_mode === 'walking' ? 0 : calculateTaxiCost(route.leg2_distance);
+    const metroCost = calculateMetroCost(route.metro_distance);
+    const totalCost = leg1Cost + metroCost + leg2Cost;
+
+    // Update route summary
+    document.getElementById('preview-origin').textContent = initialAddress;
+    document.getElementById('preview-dest').textContent = destAddress;
+    document.getElementById('preview-total-cost').textContent = `💰 Total: ₹${totalCost}`;
+    document.getElementById('preview-total-time').textContent = `⏱️ ${route.total_journey_time.toFixed(1)} mins`;
+
+    // Update Access Leg 1
+    const leg1Icon = route.leg1_mode === 'walking' ? '🚶' : '🚗';
+    const leg1ModeText = route.leg1_mode === 'walking' ? 'Walking' : 'Taxi';
+    document.getElementById('preview-taxi1-distance').textContent = route.leg1_distance.toFixed(1);
+    document.getElementById('preview-taxi1-cost').textContent = `₹${leg1Cost}`;
+    document.getElementById('preview-taxi1-time').textContent = `${route.leg1_time} min`;
+    document.getElementById('preview-taxi1-route').textContent = `${initialAddress} → ${route.initial} ${leg1Icon}`;
+
+    // Update Metro Leg
+    document.getElementById('preview-metro-line').textContent = route.initial_line;
+    document.getElementById('preview-metro-cost').textContent = `₹${metroCost}`;
+    document.getElementById('preview-metro-time').textContent = `${route.metro_time} min`;
+    document.getElementById('preview-metro-route').textContent = `${route.initial} → ${route.destination}`;
+
+    // Update metro info based on transfer count
+    if (route.same_line) {
+        document.getElementById('preview-metro-info').textContent = `Same Line (${route.initial_line}) - No interchange required`;
+    } else if (route.transfer_count === 2) {
+        const interchangeParts = route.interchange.split('|');
+        if (interchangeParts.length > 1) {
+            const lineSequence = interchangeParts[0];
+            const interchangeDetails = interchangeParts[1];
+            document.getElementById('preview-metro-info').textContent = `Double Transfer: ${lineSequence} (${interchangeDetails})`;
+        } else {
+            document.getElementById('preview-metro-info').textContent = `Double Transfer: ${route.interchange}`;
+        }
+    } else if (route.transfer_count === 1) {
+        document.getElementById('preview-metro-info').textContent = `Single Transfer at ${route.interchange} (${route.initial_line} → ${route.dest_line})`;
+    } else {
+        document.getElementById('preview-metro-info').textContent = `Different Lines (${route.initial_line} → ${route.dest_line})`;
+    }
+
+    // Update Access Leg 2
+    const leg2Icon = route.leg2_mode === 'walking' ? '🚶' : '🚗';
+    const leg2ModeText = route.leg2_mode === 'walking' ? 'Walking' : 'Taxi';
+    document.getElementById('preview-taxi2-distance').textContent = route.leg2_distance.toFixed(1);
+    document.getElementById('preview-taxi2-cost').textContent = `₹${leg2Cost}`;
+    document.getElementById('preview-taxi2-time').textContent = `${route.leg2_time} min`;
+    document.getElementById('preview-taxi2-route').textContent = `${route.destination} → ${destAddress} ${leg2Icon}`;
+
+    // Update booking button
+    document.getElementById('preview-book-metro-btn').textContent = `🎫 Book Metro @ ₹${metroCost}`;
+
+    // Show modal
+    document.getElementById('preview-modal').style.display = 'block';
+}
+
+function closePreview() {
+    document.getElementById('preview-modal').style.display = 'none';
+}
+
+// Helper functions for cost calculations
+function calculateTaxiCost(distanceKm) {
+    // Base fare ₹10 + ₹10 per km
+    return Math.round(10 + (distanceKm * 10));
+}
+
+function calculateMetroCost(distanceKm) {
+    // Bengaluru Metro fare structure
+    if (distanceKm <= 2) return 10;
+    else if (distanceKm <= 4) return 15;
+    else if (distanceKm <= 6) return 20;
+    else if (distanceKm <= 9) return 25;
+    else if (distanceKm <= 12) return 30;
+    else if (distanceKm <= 15) return 35;
+    else if (distanceKm <= 18) return 40;
+    else if (distanceKm <= 21) return 45;
+    else if (distanceKm <= 24) return 50;
+    else return 55;
+}
+
+// Initialize page when loaded
+window.addEventListener('load', function () {
+    const resultsSection = document.getElementById('results-section');
+    if (resultsSection) {
+        resultsSection.classList.remove('show');
+    }
+
+    // Check if Google Maps API is loaded
+    if (typeof google !== 'undefined' && google.maps && google.maps.places) {
+        initAutocomplete();
+    } else {
+        console.warn('Google Maps API not loaded. Autocomplete will not work.');
+        // Add a note to the user
+        const inputs = document.querySelectorAll('#initial-address, #dest-address');
+        inputs.forEach(input => {
+            input.placeholder = 'Enter address manually (autocomplete not available)';
+        });
+    }
+
+    // Add click outside modal to close functionality
+    const modal = document.getElementById('preview-modal');
+    modal.addEventListener('click', function (event) {
+        if (event.target === modal) {
+            closePreview();
+        }
+    });
+
+    // Add escape key to close modal
+    document.addEventListener('keydown', function (event) {
+        if (event.key === 'Escape') {
+            closePreview();
+        }
+    });
+});
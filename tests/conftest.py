@@ -0,0 +1,18 @@
+# Shared test setup: the modules live at the repository root, and the caches and
+# shared tables they open at import time go to a throwaway directory.
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_scratch = tempfile.mkdtemp(prefix='bengaluru_tests_')
+os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'test-key')
+os.environ.setdefault('LEG_CACHE_DB', os.path.join(_scratch, 'legs.sqlite3'))
+os.environ.setdefault('SEARCH_DB', os.path.join(_scratch, 'searches.sqlite3'))
+os.environ.setdefault('MAPS_BUCKET_PATH', os.path.join(_scratch, 'maps_bucket.bin'))
+os.environ.setdefault('TRAFFIC_OBSERVATIONS_DB', os.path.join(_scratch, 'traffic.sqlite3'))
+os.environ.setdefault('TRAFFIC_PROFILE_PATH', os.path.join(_scratch, 'traffic_profiles.npz'))
+os.environ.setdefault('PROFILE_DIR', os.path.join(_scratch, 'profiles'))
+os.environ.setdefault('BENCH_DIR', os.path.join(_scratch, 'bench'))
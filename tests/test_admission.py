@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+from bengaluru_admission import AdmissionController, request_queue_seconds
+
+
+def test_full_then_degraded_then_rejected():
+    controller = AdmissionController(max_in_flight=2, max_degraded=1, max_queue_wait_s=0.05)
+    full = [controller.admit(), controller.admit()]
+    assert [admission.degraded for admission in full] == [False, False]
+    degraded = controller.admit()
+    assert degraded.degraded and controller.degraded_in_flight == 1
+    assert controller.admit() is None
+    assert controller.admit(allow_degraded=False) is None
+
+
+def test_release_frees_the_slot_once():
+    controller = AdmissionController(max_in_flight=1, max_degraded=1, max_queue_wait_s=0.05)
+    admission = controller.admit()
+    degraded = controller.admit()
+    admission.release()
+    admission.release()
+    degraded.release()
+    assert (controller.in_flight, controller.degraded_in_flight) == (0, 0)
+    assert not controller.admit().degraded
+
+
+def test_time_already_queued_counts_against_the_allowance():
+    controller = AdmissionController(max_in_flight=1, max_degraded=1, max_queue_wait_s=2)
+    started = time.monotonic()
+    admission = controller.admit(queued_s=2.5)
+    assert admission.degraded and time.monotonic() - started < 0.5
+
+
+def test_a_waiting_plan_gets_the_slot_when_it_is_released():
+    controller = AdmissionController(max_in_flight=1, max_degraded=0, max_queue_wait_s=2)
+    first = controller.admit()
+    threading.Timer(0.05, first.release).start()
+    second = controller.admit()
+    assert second is not None and not second.degraded
+
+
+@pytest.mark.parametrize('header', ['t=1700000000.5', '1700000000.5', '1700000000500', '1700000000500000'])
+def test_request_start_header_units(header):
+    assert request_queue_seconds(header, now=1700000002.0) == pytest.approx(1.5)
+
+
+def test_request_start_header_missing_or_bad():
+    assert request_queue_seconds(None) == 0.0
+    assert request_queue_seconds('soon') == 0.0
+    assert request_queue_seconds(str(time.time() + 60)) == 0.0
@@ -0,0 +1,71 @@
+import os
+
+import bengaluru_assets
+from bengaluru_assets import ASSET_SOURCES, AssetStore, build_assets, build_is_stale
+
+
+def make_sources(static_dir, text):
+    for logical_name in ASSET_SOURCES:
+        path = static_dir / logical_name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"/* {text} {logical_name} */")
+
+
+def touch_later(path, seconds=10):
+    stat = path.stat()
+    os.utime(path, (stat.st_atime + seconds, stat.st_mtime + seconds))
+
+
+def test_startup_rebuilds_a_build_older_than_its_sources(tmp_path):
+    static_dir, dist_dir = tmp_path / 'static', tmp_path / 'static' / 'dist'
+    make_sources(static_dir, 'v1')
+    build_assets(static_dir, dist_dir)
+    assert not build_is_stale(static_dir, dist_dir)
+    old_url = AssetStore(static_dir, dist_dir).url_for('css/bengaluru.css')
+
+    make_sources(static_dir, 'v2')
+    touch_later(static_dir / 'css/bengaluru.css')
+    assert build_is_stale(static_dir, dist_dir)
+    store = AssetStore(static_dir, dist_dir)
+    url = store.url_for('css/bengaluru.css')
+    assert url != old_url
+    assert b'v2' in store.get(url[len('/assets/'):]).select(None)[0]
+
+
+def test_watch_picks_up_edits_without_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(bengaluru_assets, 'ASSET_WATCH_CHECK_S', 0)
+    static_dir, dist_dir = tmp_path / 'static', tmp_path / 'static' / 'dist'
+    make_sources(static_dir, 'v1')
+    watched = AssetStore(static_dir, dist_dir, watch=True)
+    fixed = AssetStore(static_dir, dist_dir)
+    before = watched.url_for('js/bengaluru.js')
+
+    make_sources(static_dir, 'v2')
+    touch_later(static_dir / 'js/bengaluru.js')
+    assert watched.url_for('js/bengaluru.js') != before
+    assert watched.generation == 2
+    assert fixed.url_for('js/bengaluru.js') == before
+
+
+def built_files(dist_dir):
+    return sorted(path.relative_to(dist_dir).as_posix() for path in dist_dir.rglob('*') if path.is_file())
+
+
+def test_rebuilds_keep_only_the_current_and_previous_builds(tmp_path):
+    static_dir, dist_dir = tmp_path / 'static', tmp_path / 'static' / 'dist'
+    manifests = []
+    for version in ('v1', 'v2', 'v3'):
+        make_sources(static_dir, version)
+        manifests.append(build_assets(static_dir, dist_dir))
+    (dist_dir / 'css' / 'notes.txt').write_text('not a build')
+
+    build_assets(static_dir, dist_dir)
+    kept = {path.removesuffix('.gz').removesuffix('.br') for path in built_files(dist_dir)}
+    assert kept == set(manifests[2].values()) | {'css/notes.txt', 'manifest.json'}
+    assert not any(name.endswith('.tmp') for name in built_files(dist_dir))
+
+    make_sources(static_dir, 'v4')
+    latest = build_assets(static_dir, dist_dir)
+    kept = {path.removesuffix('.gz').removesuffix('.br') for path in built_files(dist_dir)}
+    assert kept == set(latest.values()) | set(manifests[2].values()) | {'css/notes.txt', 'manifest.json'}
+    assert not set(manifests[0].values()) & kept
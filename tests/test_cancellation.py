@@ -0,0 +1,72 @@
+from concurrent.futures import Future
+
+import pytest
+
+import bengaluru_cancellation
+from bengaluru_cancellation import CancellationRegistry, PlanCancelled
+
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch):
+    """Two registries on one table, as two workers on the host see it"""
+    monkeypatch.setattr(bengaluru_cancellation, 'CANCEL_POLL_S', 0)
+    db_path = str(tmp_path / 'searches.sqlite3')
+    return CancellationRegistry(db_path), CancellationRegistry(db_path)
+
+
+def test_resubmit_in_the_same_worker_cancels_and_drops_queued_legs(workers):
+    registry, _ = workers
+    first = registry.start('tab1', 's1')
+    queued, done = first.track(Future()), first.track(Future())
+    done.set_result({'success': True})
+    second = registry.start('tab1', 's2')
+    assert first.cancelled() and not second.cancelled()
+    assert queued.cancelled() and not done.cancelled()
+    with pytest.raises(PlanCancelled):
+        first.raise_if_cancelled()
+
+
+def test_resubmit_on_another_worker_is_seen_when_polled(workers):
+    registry, other = workers
+    token = registry.start('tab1', 's1')
+    assert not token.cancelled()
+    other.start('tab1', 's2')
+    assert token.cancelled()
+
+
+def test_cancel_only_hits_the_latest_search_of_that_client(workers):
+    registry, other = workers
+    token = registry.start('tab1', 's1')
+    neighbour = registry.start('tab2', 's1')
+    other.cancel('tab1', 'stale')
+    assert not token.cancelled()
+    other.cancel('tab1', 's1')
+    assert token.cancelled() and not neighbour.cancelled()
+
+
+def test_searches_without_ids_are_never_cancelled(workers):
+    registry, _ = workers
+    token = registry.start(None, None)
+    registry.start(None, None)
+    assert not token.cancelled()
+
+
+def test_finish_forgets_the_token(workers):
+    registry, _ = workers
+    token = registry.start('tab1', 's1')
+    registry.finish(token)
+    registry.start('tab1', 's2')
+    # Finished tokens are no longer cancelled in-process, only via the shared table when polled
+    assert not token._cancelled.is_set()
+    assert token.cancelled()
+
+
+def test_expired_searches_are_pruned_at_low_traffic(workers):
+    registry, _ = workers
+    registry.start('old-tab', 's1')
+    conn = registry._db()
+    conn.execute('UPDATE latest_search SET updated_at = updated_at - ?', (bengaluru_cancellation.CANCEL_RECORD_TTL_S + 1,))
+    # The next search, a minute later, whatever second it lands on
+    registry._last_cleanup -= bengaluru_cancellation.CANCEL_CLEANUP_INTERVAL_S
+    registry.start('new-tab', 's1')
+    assert [row[0] for row in conn.execute('SELECT client_id FROM latest_search')] == ['new-tab']
@@ -0,0 +1,52 @@
+import pytest
+
+from bengaluru_station_finder import (DIRECT_TAXI_MAX_KM, ROAD_DETOUR_FACTOR, BengaluruStationFinder,
+                                      StationCandidate)
+
+ORIGIN = (12.9716, 77.5946)
+KM_PER_DEGREE_LAT = 111.195
+
+
+@pytest.fixture(scope='module')
+def finder():
+    return BengaluruStationFinder()
+
+
+def north(km):
+    """A point km due north of ORIGIN"""
+    return ORIGIN[0] + km / KM_PER_DEGREE_LAT, ORIGIN[1]
+
+
+def station(station_id, km):
+    return StationCandidate(station_id, f"Station {station_id}", 0.0, 0.0, 0.0, km, 'taxi')
+
+
+def classify(finder, dest_km, origin_stations, dest_stations):
+    return finder.classify_trip(*ORIGIN, *north(dest_km), origin_stations, dest_stations)
+
+
+def test_walkable_trips_are_walked(finder):
+    trip = classify(finder, 0.3, [station(1, 2.0)], [station(2, 2.0)])
+    assert (trip.kind, trip.mode) == ('walk', 'walking')
+
+
+def test_long_trips_and_missing_candidates_go_to_the_full_plan(finder):
+    far = DIRECT_TAXI_MAX_KM / ROAD_DETOUR_FACTOR + 0.5
+    assert classify(finder, far, [station(1, 3.0)], [station(2, 3.0)]) is None
+    assert classify(finder, 3.0, [], [station(2, 3.0)]) is None
+
+
+def test_trips_with_short_access_legs_go_to_the_full_plan(finder):
+    assert classify(finder, 4.0, [station(1, 0.4)], [station(2, 0.6)]) is None
+
+
+def test_both_ends_nearest_to_one_station(finder):
+    trip = classify(finder, 2.0, [station(7, 1.5)], [station(7, 1.5)])
+    assert (trip.kind, trip.mode) == ('same_station', 'taxi')
+    assert trip.reasons[0] == 'Both ends are nearest to Station 7'
+
+
+def test_access_legs_dominating_a_short_trip(finder):
+    trip = classify(finder, 4.0, [station(1, 1.8), station(3, 2.5)], [station(2, 1.5)])
+    assert (trip.kind, trip.mode) == ('short_taxi', 'taxi')
+    assert len(trip.reasons) == 2
@@ -0,0 +1,48 @@
+from collections import Counter
+
+from bengaluru_leg_batcher import MATRIX_MAX_ELEMENTS, BatchedLeg, plan_calls
+
+GROUP = ('driving', 'now', False)
+
+
+def leg(origin, dest):
+    return BatchedLeg(None, GROUP, origin, dest, (), 0, None)
+
+
+def check_cover(legs, calls, max_elements=MATRIX_MAX_ELEMENTS):
+    """Every leg is in exactly one call, inside that call's origins × destinations, within the limits"""
+    placed = Counter(id(call_leg) for _, _, call_legs in calls for call_leg in call_legs)
+    assert placed == Counter(id(one) for one in legs)
+    for origins, dests, call_legs in calls:
+        assert len(origins) <= 25 and len(dests) <= 25 and len(origins) * len(dests) <= max_elements
+        assert all(one.origin in origins and one.dest in dests for one in call_legs)
+
+
+def test_a_plan_becomes_two_star_calls():
+    origin_legs = [leg('home', f"station{i}") for i in range(7)]
+    dest_legs = [leg(f"station{i}", 'office') for i in range(7, 14)]
+    calls = plan_calls(origin_legs + dest_legs)
+    check_cover(origin_legs + dest_legs, calls)
+    # Merging the two stars would bill 8 × 8 elements for 14 legs, far over MATRIX_MAX_WASTE
+    assert sorted((len(origins), len(dests)) for origins, dests, _ in calls) == [(1, 7), (7, 1)]
+
+
+def test_stars_that_fill_a_matrix_are_merged():
+    legs = [leg(f"o{i}", f"d{j}") for i in range(4) for j in range(5)]
+    calls = plan_calls(legs)
+    check_cover(legs, calls)
+    assert len(calls) == 1 and (len(calls[0][0]), len(calls[0][1])) == (4, 5)
+
+
+def test_identical_legs_share_one_element():
+    legs = [leg('home', 'station1') for _ in range(3)] + [leg('home', 'station2')]
+    calls = plan_calls(legs)
+    check_cover(legs, calls)
+    assert [(origins, dests) for origins, dests, _ in calls] == [(['home'], ['station1', 'station2'])]
+
+
+def test_large_groups_are_split_within_the_limits():
+    legs = [leg('home', f"station{i}") for i in range(60)] + [leg(f"o{i}", f"d{j}") for i in range(12) for j in range(12)]
+    calls = plan_calls(legs, max_elements=100)
+    check_cover(legs, calls)
+    assert len(calls) > 1
@@ -0,0 +1,109 @@
+import threading
+import time
+
+from bengaluru_maps_scheduler import (OVER_QUERY_LIMIT_BACKOFF_S, OVER_QUERY_LIMIT_RETRIES, MapsScheduler,
+                                      SharedTokenBucket)
+
+TIMEOUT_S = 5
+
+
+class FakeBucket:
+    """Always grants (unless the day's budget is spent) and records backoffs"""
+
+    def __init__(self, daily_budget=0, remaining=None, spent=False):
+        self.daily_budget = daily_budget
+        self.remaining = remaining
+        self.spent = spent
+        self.backoffs = []
+
+    def try_acquire(self):
+        return (False, None) if self.spent else (True, 0.0)
+
+    def budget_remaining(self):
+        return self.remaining
+
+    def tokens_available(self):
+        return 1.0
+
+    def backoff(self, seconds):
+        self.backoffs.append(seconds)
+
+
+def blocked_scheduler(bucket=None, **kwargs):
+    """One dispatcher, held busy by a first job until the returned event is set"""
+    scheduler = MapsScheduler(bucket or FakeBucket(), dispatch_threads=1, **kwargs)
+    release, started = threading.Event(), threading.Event()
+
+    def blocker():
+        started.set()
+        release.wait(TIMEOUT_S)
+        return {'success': True}
+
+    scheduler.submit(blocker, priority=0)
+    assert started.wait(TIMEOUT_S)
+    return scheduler, release
+
+
+def test_queued_jobs_run_by_priority_then_arrival():
+    scheduler, release = blocked_scheduler()
+    order = []
+    futures = [scheduler.submit(order.append, name, priority=priority)
+               for name, priority in (('background', 50), ('station-3', 4), ('direct', 0), ('station-1', 2),
+                                      ('station-1b', 2))]
+    release.set()
+    for future in futures:
+        future.result(TIMEOUT_S)
+    assert order == ['direct', 'station-1', 'station-1b', 'station-3', 'background']
+
+
+def test_low_value_legs_that_waited_too_long_are_shed():
+    scheduler, release = blocked_scheduler(shed_priority=5, max_wait_low_s=0.05, max_wait_s=60)
+    low = scheduler.submit(lambda: {'success': True}, priority=6)
+    high = scheduler.submit(lambda: {'success': True}, priority=1)
+    patient = scheduler.submit(lambda: {'success': True}, priority=50, max_wait_s=float('inf'))
+    time.sleep(0.1)
+    release.set()
+    assert low.result(TIMEOUT_S) == {'success': False, 'error': 'SHED', 'shed': True}
+    assert high.result(TIMEOUT_S) == {'success': True}
+    assert patient.result(TIMEOUT_S) == {'success': True}
+
+
+def test_budget_reserve_is_kept_for_high_value_legs():
+    bucket = FakeBucket(daily_budget=1000, remaining=50)
+    scheduler = MapsScheduler(bucket, dispatch_threads=1, shed_priority=5, budget_reserve=0.1)
+    assert scheduler.submit(lambda: {'success': True}, priority=5).result(TIMEOUT_S)['error'] == 'SHED'
+    assert scheduler.submit(lambda: {'success': True}, priority=1).result(TIMEOUT_S) == {'success': True}
+
+
+def test_spent_daily_budget_answers_without_sending():
+    calls = []
+    scheduler = MapsScheduler(FakeBucket(daily_budget=10, remaining=0, spent=True), dispatch_threads=1)
+    result = scheduler.submit(calls.append, 'leg', priority=0).result(TIMEOUT_S)
+    assert result == {'success': False, 'error': 'OVER_DAILY_BUDGET', 'shed': True} and calls == []
+
+
+def test_over_query_limit_backs_off_and_retries():
+    bucket = FakeBucket()
+    scheduler = MapsScheduler(bucket, dispatch_threads=1)
+    answers = iter([{'success': False, 'error': 'OVER_QUERY_LIMIT'}, {'success': True}])
+    assert scheduler.submit(lambda: next(answers), priority=0).result(TIMEOUT_S) == {'success': True}
+    assert bucket.backoffs == [OVER_QUERY_LIMIT_BACKOFF_S]
+
+    calls = []
+
+    def refused():
+        calls.append(1)
+        return {'success': False, 'error': 'OVER_QUERY_LIMIT'}
+
+    assert scheduler.submit(refused, priority=0).result(TIMEOUT_S)['error'] == 'OVER_QUERY_LIMIT'
+    assert len(calls) == OVER_QUERY_LIMIT_RETRIES + 1
+
+
+def test_shared_bucket_backoff_and_budget_are_seen_by_every_process(tmp_path):
+    path = str(tmp_path / 'bucket.bin')
+    first, second = SharedTokenBucket(path, 100, 2, 3), SharedTokenBucket(path, 100, 2, 3)
+    assert first.try_acquire() == (True, 0.0)
+    assert second.budget_remaining() == 2
+    second.backoff(60)
+    granted, wait_s = first.try_acquire()
+    assert not granted and 59 < wait_s <= 60
@@ -0,0 +1,54 @@
+from concurrent.futures import Future
+
+import pytest
+
+from bengaluru_leg_cache import plan_cache, plan_key, traffic_bucket
+from bengaluru_plan_store import plan_store
+from bengaluru_station_finder import BengaluruStationFinder
+
+ORIGIN = (12.9757, 77.5729)
+
+
+@pytest.fixture
+def finder(monkeypatch):
+    """A finder whose legs answer at once, except destination-side legs when finder.hang is set"""
+    finder = BengaluruStationFinder()
+    finder.hang = False
+    finder.pending = []
+
+    def request_leg(mode, origin_lat, origin_lng, dest_lat, dest_lng, origin_key, dest_key, priority, *args, **kwargs):
+        future = Future()
+        if finder.hang and origin_key.startswith('s'):
+            finder.pending.append(future)
+        else:
+            leg = finder.estimate_leg(origin_lat, origin_lng, dest_lat, dest_lng, mode)
+            del leg['estimated']
+            future.set_result(leg)
+        return future
+
+    monkeypatch.setattr(finder, 'request_leg', request_leg)
+    return finder
+
+
+def plan(finder, dest, deadline_s):
+    routes, _ = finder.plan_routes(*ORIGIN, *dest, deadline_s=deadline_s)
+    state = plan_store.load(finder.get_plan_token(), finder.network)
+    cached = plan_cache.get(plan_key(finder.network, *ORIGIN, *dest, traffic_bucket()), count=False)
+    return routes, state, cached
+
+
+def test_legs_late_at_the_deadline_are_estimated_and_the_plan_is_not_cached(finder):
+    finder.hang = True
+    routes, state, cached = plan(finder, (12.9907, 77.6525), deadline_s=0.05)
+    assert routes and finder.get_plan_partial()
+    assert finder.pending and all(future.cancelled() for future in finder.pending)
+    assert all(leg['estimated'] for leg in state['dest_legs'])
+    assert not any(leg.get('estimated') for leg in state['origin_legs'])
+    assert cached is None
+
+
+def test_a_plan_finished_within_its_deadline_is_cached(finder):
+    routes, state, cached = plan(finder, (12.9180, 77.6230), deadline_s=5)
+    assert routes and not finder.get_plan_partial()
+    assert not any(leg.get('estimated') for leg in state['origin_legs'] + state['dest_legs'])
+    assert cached is not None and len(cached['convenience_routes']) == len(routes)
@@ -0,0 +1,52 @@
+import json
+import time
+from types import SimpleNamespace
+
+from bengaluru_leg_cache import TieredCache
+from bengaluru_plan_store import PlanStore, plan_state
+from bengaluru_station_finder import StationCandidate
+
+NETWORK = SimpleNamespace(key='bengaluru', fingerprint='abc123')
+ORIGIN_STATIONS = [StationCandidate(3, 'Indiranagar', 12.978, 77.638, 0.01, 0.4, 'walking')]
+DEST_STATIONS = [StationCandidate(9, 'Majestic', 12.975, 77.572, 0.02, 1.2, 'taxi')]
+LEG = {'success': True, 'distance_km': 0.5, 'duration_min': 6, 'duration_sec': 15, 'mode': 'walking'}
+
+
+def state(departure_time=None):
+    return plan_state(NETWORK, 12.9784, 77.6408, 12.9767, 77.5713, departure_time, ORIGIN_STATIONS,
+                      DEST_STATIONS, [LEG], [None], None, 3)
+
+
+def stores(tmp_path, **kwargs):
+    """Two stores on one shared table, as two workers on the host see it"""
+    db_path = str(tmp_path / 'legs.sqlite3')
+    return (PlanStore(TieredCache('plan_tokens', 100, db_path), **kwargs),
+            PlanStore(TieredCache('plan_tokens', 100, db_path), **kwargs))
+
+
+def test_state_survives_a_round_trip_through_another_worker(tmp_path):
+    issuer, other = stores(tmp_path)
+    saved = state(departure_time=int(time.time()) + 3600)
+    token = issuer.save(saved)
+    loaded = other.load(token, NETWORK)
+    assert loaded == json.loads(json.dumps(saved))
+    assert [StationCandidate(**station) for station in loaded['initial_stations']] == ORIGIN_STATIONS
+    assert loaded['origin_legs'] == [LEG] and loaded['dest_legs'] == [None]
+
+
+def test_tokens_are_prefixed_with_the_issuing_node(tmp_path):
+    issuer, _ = stores(tmp_path, prefix='node1.')
+    token = issuer.save(state())
+    assert token.startswith('node1.') and issuer.load(token, NETWORK) is not None
+
+
+def test_unknown_expired_or_other_network_tokens_are_not_loaded(tmp_path):
+    issuer, other = stores(tmp_path, ttl_s=-1)
+    expired = issuer.save(state())
+    assert issuer.load(expired, NETWORK) is None and other.load(expired, NETWORK) is None
+
+    issuer, _ = stores(tmp_path)
+    token = issuer.save(state())
+    reloaded = SimpleNamespace(key='bengaluru', fingerprint='def456')
+    assert issuer.load(token, reloaded) is None
+    assert issuer.load('missing', NETWORK) is None and issuer.load(None, NETWORK) is None
@@ -0,0 +1,38 @@
+import os
+import shutil
+
+from bengaluru_metrics import metrics
+from bengaluru_profiling import RequestProfiler
+
+
+def work():
+    return sum(i * i for i in range(20000))
+
+
+def test_capture_writes_its_files_and_releases_the_lock(tmp_path):
+    profiler = RequestProfiler(str(tmp_path / 'profiles'))
+    with profiler.capture_for('cpu', True, 'test') as capture:
+        work()
+    assert capture.saved
+    assert [meta['id'] for meta in profiler.index()] == [capture.capture_id]
+    assert profiler.capture_for('cpu', True, 'test') is not None
+
+
+def test_unwritable_directory_skips_the_capture_without_holding_the_lock(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    profiler = RequestProfiler(str(blocker / 'profiles'))
+    assert profiler.capture_for('cpu', True, 'test') is None
+    assert profiler._busy.acquire(blocking=False)
+
+
+def test_failed_write_loses_the_capture_not_the_request(tmp_path):
+    directory = str(tmp_path / 'profiles')
+    profiler = RequestProfiler(directory)
+    failed = metrics.get('profiles_write_failed')
+    with profiler.capture_for('sample', True, 'test') as capture:
+        work()
+        shutil.rmtree(directory)
+    assert not capture.saved and not os.path.exists(directory)
+    assert metrics.get('profiles_write_failed') == failed + 1
+    assert profiler.capture_for('cpu', True, 'test') is not None
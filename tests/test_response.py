@@ -0,0 +1,86 @@
+import gzip
+import json
+
+import pytest
+
+import bengaluru_response
+from bengaluru_response import (ACCESS_TRANSFER_TIME_MIN, MIN_COMPRESS_BYTES, RESPONSE_VERSION_COMPACT,
+                                RESPONSE_VERSION_FULL, TRANSFER_TIME_MIN, ConvenienceRoute, DirectTaxiSuggestion,
+                                build_route_response, compress_body, negotiate_encoding, serialize_json)
+
+COMPACT_KEYS = {'initial', 'destination', 'initial_line', 'dest_line', 'interchange', 'transfer_count', 'leg1_mode',
+                'leg2_mode', 'leg1_distance', 'leg2_distance', 'leg1_time_min', 'leg2_time_min', 'metro_distance',
+                'metro_time', 'score'}
+
+
+def route(**overrides):
+    values = dict(
+        initial='Nadaprabhu Kempegowda Station, Majestic', destination='Baiyappanahalli', leg1_distance=1.23456,
+        leg2_distance=0.5, leg1_mode='taxi', leg2_mode='walking', total_access_distance=1.73456,
+        leg1_time='6 min 10 sec', leg2_time='7 min', leg1_time_min=6.16666, leg2_time_min=7.0,
+        total_access_time=13.16666, metro_distance=9.87654, metro_time=21.04, metro_interchange_time=0,
+        access_metro_interchange_time=ACCESS_TRANSFER_TIME_MIN, total_journey_time=40.2, metro_score=100.0,
+        access_score=71.428, total_convenience_score=77.14286, same_line=True, interchange='',
+        transfer_count=0, initial_line='Purple', dest_line='Purple')
+    values.update(overrides)
+    return ConvenienceRoute(**values)
+
+
+SUGGESTION = DirectTaxiSuggestion(False, ['Metro is faster'], direct_distance=10.456, direct_time=38.333,
+                                  time_saving=-2.0)
+
+
+def test_compact_v2_keeps_only_what_the_frontend_cannot_derive():
+    payload = build_route_response([route()], SUGGESTION, RESPONSE_VERSION_COMPACT, plan_token='tok')
+    assert payload['v'] == RESPONSE_VERSION_COMPACT and payload['plan_token'] == 'tok'
+    assert payload['constants'] == {'transfer_time_min': TRANSFER_TIME_MIN,
+                                    'access_transfer_time_min': ACCESS_TRANSFER_TIME_MIN}
+    compact = payload['convenience_routes'][0]
+    assert set(compact) == COMPACT_KEYS
+    assert (compact['leg1_distance'], compact['leg1_time_min'], compact['metro_distance'], compact['metro_time'],
+            compact['score']) == (1.23, 6.17, 9.88, 21.0, 77.1)
+    assert payload['direct_taxi_suggestion'] == {'suggest': False, 'reasons': ['Metro is faster'],
+                                                 'direct_distance': 10.46, 'direct_time': 38.33, 'time_saving': -2.0}
+
+
+def test_full_v1_is_the_legacy_shape():
+    payload = build_route_response([route()], DirectTaxiSuggestion(False, []), RESPONSE_VERSION_FULL)
+    assert 'v' not in payload and 'plan_token' not in payload
+    assert payload['convenience_routes'][0]['leg1_time'] == '6 min 10 sec'
+    assert len(payload['convenience_routes'][0]) == 25
+    assert payload['direct_taxi_suggestion'] == {'suggest': False, 'reasons': []}
+    trivial = DirectTaxiSuggestion(True, ['Short walk'], 0.4, 5.0, mode='walking', trivial='walk').to_dict()
+    assert (trivial['mode'], trivial['trivial']) == ('walking', 'walk')
+
+
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_both_encoders_write_the_same_utf8_json(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(bengaluru_response, 'orjson', None)
+    elif bengaluru_response.orjson is None:
+        pytest.skip('orjson is not installed')
+    payload = build_route_response([route(initial='ಮೆಜೆಸ್ಟಿಕ್')], SUGGESTION, RESPONSE_VERSION_COMPACT)
+    body = serialize_json(payload)
+    assert json.loads(body.decode('utf-8')) == payload
+    assert 'ಮೆಜೆಸ್ಟಿಕ್'.encode('utf-8') in body
+    assert b'": ' not in body and b', "' not in body
+
+
+def test_non_finite_numbers_never_reach_the_wire_as_nan(monkeypatch):
+    payload = {'score': float('nan'), 'time': float('inf')}
+    if bengaluru_response.orjson is not None:
+        assert json.loads(serialize_json(payload)) == {'score': None, 'time': None}
+    monkeypatch.setattr(bengaluru_response, 'orjson', None)
+    with pytest.raises(ValueError):
+        serialize_json(payload)
+
+
+def test_compression_is_negotiated_and_skipped_for_small_bodies():
+    body = serialize_json(build_route_response([route()] * 10, SUGGESTION))
+    assert len(body) >= MIN_COMPRESS_BYTES
+    assert compress_body(body[:100], 'gzip') == (body[:100], None)
+    assert compress_body(body, 'identity') == (body, None)
+    compressed, encoding = compress_body(body, 'gzip, br;q=0')
+    assert encoding == 'gzip' and gzip.decompress(compressed) == body
+    if bengaluru_response.brotli is not None:
+        assert negotiate_encoding('gzip, br') == 'br'
@@ -0,0 +1,85 @@
+import random
+
+import numpy as np
+import pytest
+
+from bengaluru_road_graph import (PROFILES, RoadGraph, _dijkstra, build_graph, profile_edges, read_osm, synthetic_network,
+                                  write_osm)
+
+
+@pytest.fixture(scope='module')
+def grid(tmp_path_factory):
+    lats, lngs, ways = synthetic_network(rows=9, cols=9, seed=3)
+    path = tmp_path_factory.mktemp('road_graph') / 'grid.npz'
+    build_graph(lats, lngs, ways, str(path), source='synthetic')
+    return lats, lngs, ways, RoadGraph.load(str(path))
+
+
+@pytest.mark.parametrize('profile', PROFILES)
+def test_hierarchy_matches_dijkstra_for_every_pair(grid, profile):
+    lats, lngs, ways, graph = grid
+    edges = profile_edges(np.array(lats), np.array(lngs), ways, profile)
+    routable = sorted({u for u, _, _, _ in edges} | {v for _, v, _, _ in edges})
+    assert len(routable) == len(lats)
+    for source in routable:
+        for target in routable:
+            fast = graph.query(source, target, profile)
+            reference = _dijkstra(len(lats), edges, source, target)
+            assert (fast is None) == (reference is None), (source, target)
+            if reference is not None:
+                # The graph file stores float32 weights
+                assert fast[0] == pytest.approx(reference[0], rel=1e-4, abs=1e-2), (source, target)
+                assert fast[1] == pytest.approx(reference[1], rel=1e-4, abs=1e-2), (source, target)
+
+
+def test_profiles_use_their_own_roads(grid):
+    lats, lngs, ways, graph = grid
+    # The motorway is drive-only and the diagonal footway walk-only
+    drive = {(u, v) for u, v, _, _ in profile_edges(np.array(lats), np.array(lngs), ways, 'drive')}
+    walk = {(u, v) for u, v, _, _ in profile_edges(np.array(lats), np.array(lngs), ways, 'walk')}
+    assert (0, 10) in walk and (0, 10) not in drive
+    assert (36, 40) in drive and (36, 40) not in walk
+
+
+def test_leg_snaps_ends_and_reports_directions_shape(grid):
+    lats, lngs, _, graph = grid
+    rng = random.Random(5)
+    origin = (lats[0] + rng.uniform(-1e-4, 1e-4), lngs[0])
+    leg = graph.leg(origin[0], origin[1], lats[-1], lngs[-1], 'drive')
+    assert leg['success'] and leg['routing'] == 'local'
+    assert leg['traffic_status'] == 'Typical Traffic'
+    assert leg['duration_min'] * 60 + leg['duration_sec'] > 0
+    assert graph.leg(0.0, 0.0, lats[-1], lngs[-1], 'walk') == {'success': False, 'error': 'NOT_ON_ROAD_GRAPH'}
+
+
+OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="30" lat="12.9720" lon="77.5950"/>
+  <node id="10" lat="12.9700" lon="77.5940"/>
+  <node id="20" lat="12.9710" lon="77.5945"><tag k="highway" v="traffic_signals"/></node>
+  <node id="99" lat="12.9800" lon="77.6000"/>
+  <way id="1"><nd ref="10"/><nd ref="20"/><nd ref="30"/><tag k="highway" v="primary"/><tag k="oneway" v="yes"/></way>
+  <way id="2"><nd ref="30"/><nd ref="77"/><nd ref="10"/><tag k="highway" v="footway"/></way>
+  <way id="3"><nd ref="99"/><nd ref="10"/><tag k="building" v="yes"/></way>
+  <way id="4"><nd ref="20"/><nd ref="88"/><tag k="highway" v="residential"/></way>
+  <relation id="5"><member type="way" ref="1" role=""/></relation>
+</osm>
+"""
+
+
+def test_read_osm_keeps_only_nodes_of_routable_ways(tmp_path):
+    path = tmp_path / 'extract.osm'
+    path.write_text(OSM)
+    lats, lngs, ways = read_osm(str(path))
+    # Node 99 is only on a building; 77 and 88 are outside the extract (way 4 is left with one node)
+    assert lats.tolist() == [12.97, 12.971, 12.972] and lngs.tolist() == [77.594, 77.5945, 77.595]
+    assert ways == [([0, 1, 2], 'primary', True), ([2, 0], 'footway', False)]
+
+
+def test_read_osm_round_trips_a_written_network(tmp_path):
+    lats, lngs, ways = synthetic_network(rows=6, cols=6, seed=3)
+    path = tmp_path / 'grid.osm'
+    write_osm(str(path), lats, lngs, ways, extra_nodes=50)
+    read_lats, read_lngs, read_ways = read_osm(str(path))
+    assert read_lats == pytest.approx(lats, abs=1e-7) and read_lngs == pytest.approx(lngs, abs=1e-7)
+    assert read_ways == [(nodes, highway, oneway or highway == 'motorway') for nodes, highway, oneway in ways]
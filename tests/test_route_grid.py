@@ -0,0 +1,78 @@
+import json
+from dataclasses import asdict
+
+import numpy as np
+import pytest
+
+from bengaluru_station_finder import ACCESS_TRANSFER_TIME_MIN, TRANSFER_TIME_MIN, RouteGrid, StationCandidate
+from metro_networks import MetroPairTable
+
+# (origin station, destination station, metro minutes, metro km, transfers); S2 → S4 has no metro pair
+PAIRS = [(0, 3, 20, 12, 0), (0, 4, 28, 15, 1), (1, 3, 30, 14, 2), (1, 4, 18, 10, 0), (2, 3, 25, 13, 1)]
+
+
+def pair_table(n=5):
+    present, same_line = np.zeros((n, n), dtype=bool), np.zeros((n, n), dtype=bool)
+    time, distance = np.zeros((n, n)), np.zeros((n, n))
+    transfers = np.zeros((n, n), dtype=np.int8)
+    for i, j, minutes, km, count in PAIRS:
+        present[i, j], time[i, j], distance[i, j], transfers[i, j], same_line[i, j] = True, minutes, km, count, count == 0
+    none = np.zeros((n, n), dtype=np.int16)
+    return MetroPairTable([f"S{i}" for i in range(n)], present, time, distance, transfers, same_line,
+                          none, none, none, [''], ['Purple'])
+
+
+def station(station_id):
+    return StationCandidate(station_id, f"S{station_id}", 12.9, 77.6, 0.0, 1.0, 'taxi')
+
+
+def leg(km):
+    return {'distance_km': km, 'duration_min': int(km * 4), 'duration_sec': 30, 'mode': 'taxi', 'time_display': ''}
+
+
+def grid(origin_km=(0.4, 2.0, 3.5), dest_km=(0.3, 1.5)):
+    return RouteGrid(pair_table(), [station(0), station(1), station(2)], [station(3), station(4)],
+                     [leg(km) for km in origin_km], [leg(km) for km in dest_km])
+
+
+def per_pair_score(access_km, shortest_km, transfers):
+    """The scoring /find_routes used per station pair before the grid"""
+    access_score = shortest_km / access_km * 100
+    access_factor = min(access_km / 20, 1.0)
+    metro_score = {1: 100 - 40 * access_factor, 2: 100 - 80 * access_factor}.get(transfers, 100)
+    access_weight, metro_weight = {0: (0.8, 0.2), 1: (0.65, 0.35)}.get(transfers, (0.6, 0.4))
+    return access_score * access_weight + metro_score * metro_weight
+
+
+def test_grid_matches_per_pair_scoring_and_ranking():
+    routes = grid()
+    origin_km, dest_km = (0.4, 2.0, 3.5), (0.3, 1.5)
+    shortest = min(o + d for o in origin_km for d in dest_km)
+    for i, j, minutes, _, transfers in PAIRS:
+        access_km = origin_km[i] + dest_km[j - 3]
+        assert routes.total_convenience_score[i, j - 3] == pytest.approx(per_pair_score(access_km, shortest, transfers))
+        access_min = (int(origin_km[i] * 4) + 0.5) + (int(dest_km[j - 3] * 4) + 0.5)
+        assert routes.total_journey_time[i, j - 3] == pytest.approx(
+            access_min + minutes + transfers * TRANSFER_TIME_MIN + ACCESS_TRANSFER_TIME_MIN)
+
+    ranking = routes.ranked(routes.total_convenience_score, routes.valid, descending=True)
+    assert ranking == [(0, 0), (0, 1), (1, 0), (2, 0), (1, 1)]
+    assert [round(float(routes.total_convenience_score[cell]), 3) for cell in ranking] == \
+        [100.0, 57.617, 54.581, 44.314, 36.0]
+    assert not routes.valid[2, 1]
+
+
+def test_routes_are_built_from_the_grid():
+    route = grid().route(1, 0)
+    assert (route.initial, route.destination, route.transfer_count) == ('S1', 'S3', 2)
+    assert route.total_access_distance == pytest.approx(2.3)
+
+
+def test_zero_access_distance_ranks_first_and_serializes():
+    routes = grid(origin_km=(0.0, 2.0, 3.5), dest_km=(0.0, 1.5))
+    valid_scores = routes.total_convenience_score[routes.valid]
+    assert np.isfinite(valid_scores).all()
+    ranking = routes.ranked(routes.total_convenience_score, routes.valid, descending=True)
+    assert ranking[0] == (0, 0) and routes.access_score[0, 0] == 100
+    for cell in ranking:
+        json.dumps(asdict(routes.route(*cell)), allow_nan=False)
@@ -0,0 +1,97 @@
+from collections import Counter
+
+import requests
+from werkzeug.datastructures import Headers
+
+from bengaluru_sharding import FORWARDED_HEADER, OWNER_HEADER, HashRing, ShardRouter, node_id, trip_shard_key
+
+NODES = [f"http://10.0.0.{i}:5002" for i in range(1, 5)]
+KEYS = [trip_shard_key('bengaluru', 12.9 + i * 0.003, 77.5 + i * 0.002, 13.0 - i * 0.001, 77.7) for i in range(4000)]
+
+
+def owners(ring):
+    return {key: ring.owner(key) for key in KEYS}
+
+
+def test_keys_spread_evenly_over_nodes():
+    counts = Counter(owners(HashRing(NODES)).values())
+    assert set(counts) == set(NODES)
+    assert max(counts.values()) < 1.5 * len(KEYS) / len(NODES)
+
+
+def test_membership_changes_only_move_the_affected_keys():
+    before = owners(HashRing(NODES))
+    grown = owners(HashRing(NODES + ['http://10.0.0.9:5002']))
+    moved = [key for key in KEYS if grown[key] != before[key]]
+    assert all(grown[key] == 'http://10.0.0.9:5002' for key in moved)
+    assert len(moved) < 0.35 * len(KEYS)
+
+    shrunk = owners(HashRing(NODES[1:]))
+    assert all(shrunk[key] == before[key] for key in KEYS if before[key] != NODES[0])
+
+
+def test_owner_skips_excluded_nodes_and_is_stable():
+    ring = HashRing(NODES)
+    assert owners(ring) == owners(HashRing(list(reversed(NODES))))
+    for key in KEYS[:200]:
+        assert ring.owner(key, exclude={ring.owner(key)}) not in (None, ring.owner(key))
+    assert HashRing().owner(KEYS[0]) is None
+
+
+def test_router_owner_and_token_issuer():
+    router = ShardRouter(NODES, NODES[0])
+    assert router.enabled and router.owner(KEYS[0]) in NODES
+    assert router.owner_for_token(f"{node_id(NODES[2])}.abc") == NODES[2]
+    assert router.owner_for_token('no-prefix') is None
+    assert not ShardRouter(NODES[:1], NODES[0]).enabled
+
+
+class FakeRaw:
+    def read(self, decode_content=False):
+        return b'{}'
+
+
+class FakeSession:
+    def __init__(self, error=None):
+        self.sent = None
+        self.timeout = None
+        self.error = error
+
+    def post(self, url, data, headers, timeout, stream):
+        self.sent, self.timeout = headers, timeout
+        if self.error is not None:
+            raise self.error
+        response = requests.Response()
+        response.status_code = 200
+        response.headers.update({'Content-Type': 'application/json', 'Server-Timing': 'total;dur=1',
+                                 'X-Profile-Id': 'p1', 'Set-Cookie': 'x'})
+        response.raw = FakeRaw()
+        return response
+
+
+def test_forward_passes_trace_profile_and_admin_headers_both_ways():
+    router = ShardRouter(NODES, NODES[0])
+    router._session = FakeSession()
+    incoming = Headers({'Content-Type': 'application/json', 'x-trace': '1', 'X-Profile': 'cpu',
+                        'X-Admin-Token': 't', 'Cookie': 'session=1'})
+    status, headers, body = router.forward(NODES[1], '/find_routes', b'{}', incoming, timeout_s=2.0)
+    assert router._session.sent == {'Content-Type': 'application/json', 'X-Trace': '1', 'X-Profile': 'cpu',
+                                    'X-Admin-Token': 't', FORWARDED_HEADER: NODES[0]}
+    assert (status, body) == (200, b'{}') and router._session.timeout[1] == 2.0
+    assert headers == {'Content-Type': 'application/json', 'Server-Timing': 'total;dur=1', 'X-Profile-Id': 'p1',
+                       OWNER_HEADER: NODES[1]}
+
+
+def test_a_late_owner_is_planned_around_but_stays_in_the_ring():
+    router = ShardRouter(NODES, NODES[0])
+    router._session = FakeSession(requests.ReadTimeout('read timed out'))
+    assert router.forward(NODES[1], '/find_routes', b'{}', Headers(), timeout_s=2.0) is None
+    assert NODES[1] not in router.status()['down']
+
+
+def test_an_unreachable_owner_leaves_the_ring_for_a_cool_down():
+    router = ShardRouter(NODES, NODES[0])
+    router._session = FakeSession(requests.ConnectionError('refused'))
+    assert router.forward(NODES[1], '/find_routes', b'{}', Headers(), timeout_s=2.0) is None
+    assert router.status()['down'] == [NODES[1]]
+    assert all(router.owner(key) != NODES[1] for key in KEYS[:500])
@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+from bengaluru_leg_cache import TRAFFIC_BUCKET_S, plan_cache, traffic_bucket
+from bengaluru_speculation import (SPECULATION_RETURN_AFTER_H, SPECULATION_RETURN_BUCKETS, ReturnTripSpeculator,
+                                   return_departures)
+from bengaluru_traffic_profiles import CITY_UTC_OFFSET_S
+
+# A recent midnight, local (IST)
+MIDNIGHT = (int(time.time()) + CITY_UTC_OFFSET_S) // 86400 * 86400 - CITY_UTC_OFFSET_S
+
+
+def local(hour):
+    return MIDNIGHT + hour * 3600
+
+
+def test_morning_departures_speculate_buckets_around_the_likely_return():
+    departures = return_departures(local(8.25))
+    assert len(departures) == SPECULATION_RETURN_BUCKETS
+    likely = traffic_bucket(local(8.25) + SPECULATION_RETURN_AFTER_H * 3600)
+    assert likely in [traffic_bucket(departure) for departure in departures]
+    assert all(departure % TRAFFIC_BUCKET_S == 0 for departure in departures)
+    assert departures == sorted(departures)
+
+
+@pytest.mark.parametrize('hour', [4.9, 12.0, 18.5, 23.0])
+def test_departures_outside_the_morning_window_are_not_speculated(hour):
+    assert return_departures(local(hour)) == []
+
+
+def test_now_is_used_without_a_departure_time():
+    assert return_departures(None, now=local(7)) == return_departures(local(7))
+
+
+class FakeFinder:
+    """Stands in for a background plan: fills the plan cache for the key"""
+
+    maps_requests = 2
+
+    def __init__(self, key):
+        self.key = key
+
+    def plan_routes(self, *args, **kwargs):
+        plan_cache.put(self.key, {'routes': []}, time.time() + 3600)
+
+
+def test_hit_rate_is_shared_by_the_workers(tmp_path):
+    db_path = str(tmp_path / 'legs.sqlite3')
+    builder, server = ReturnTripSpeculator(True, db_path=db_path), ReturnTripSpeculator(True, db_path=db_path)
+    departure = time.time() + 3600
+    for key in ('spec-a', 'spec-b'):
+        builder._build(FakeFinder(key), key, 12.97, 77.59, 12.93, 77.62, departure)
+    assert builder.hit_rate() == server.hit_rate() == 0.0
+
+    server.note_plan_hit('spec-a')
+    server.note_plan_hit('spec-a')
+    server.note_plan_hit('not-speculated')
+    assert builder.hit_rate() == server.hit_rate() == 0.5
+    assert ReturnTripSpeculator(True, db_path=str(tmp_path / 'other.sqlite3')).hit_rate() is None
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+from bengaluru_station_search import StationSearchIndex, normalize
+
+NAMES = ['Mahatma Gandhi Road', 'Indiranagar', 'Magadi Road', 'Nadaprabhu Kempegowda Station, Majestic',
+         'Kengeri', 'Pantharapalya–Nayandahalli']
+
+
+def network():
+    return SimpleNamespace(
+        station_names=NAMES,
+        station_ids={name: i for i, name in enumerate(NAMES)},
+        station_lines=['purple'] * len(NAMES),
+        lats=[12.9 + i * 0.01 for i in range(len(NAMES))],
+        lngs=[77.5 + i * 0.01 for i in range(len(NAMES))],
+        station_aliases={'Mahatma Gandhi Road': ['MG Road'],
+                         'Nadaprabhu Kempegowda Station, Majestic': ['Majestic', 'Kempegowda']},
+        landmarks={'Brigade Road': 'Mahatma Gandhi Road', 'Nowhere Mall': 'Not A Station'},
+    )
+
+
+def found(query, limit=8):
+    return [(s['label'], s['station'], s['kind'], s['fuzzy'])
+            for s in StationSearchIndex(network()).suggest(query, limit)['suggestions']]
+
+
+def test_normalize_folds_case_accents_and_punctuation():
+    assert normalize('Pantharapalya–Nayandahalli') == 'pantharapalya nayandahalli'
+    assert normalize('Bāiyappanahalli') == 'baiyappanahalli'
+    assert normalize('  Nadaprabhu Kempegowda Station, Majestic ') == 'nadaprabhu kempegowda station majestic'
+
+
+def test_prefix_matches_name_starts_before_word_starts_and_aliases():
+    assert found('ma', 3) == [('Magadi Road', 'Magadi Road', 'station', False),
+                              ('Mahatma Gandhi Road', 'Mahatma Gandhi Road', 'station', False),
+                              ('Majestic', 'Nadaprabhu Kempegowda Station, Majestic', 'alias', False)]
+    # A word inside the name matches too, and landmarks resolve to their station
+    road = found('road')
+    assert {label for label, _, _, fuzzy in road if not fuzzy} == {'Magadi Road', 'Mahatma Gandhi Road'}
+    assert found('brig') == [('Brigade Road', 'Mahatma Gandhi Road', 'landmark', False)]
+    assert found('nayanda') == [('Pantharapalya–Nayandahalli', 'Pantharapalya–Nayandahalli', 'station', False)]
+
+
+def test_one_suggestion_per_station():
+    stations = [station for _, station, _, _ in found('m')]
+    assert len(stations) == len(set(stations))
+
+
+def test_fuzzy_matches_typos_when_prefixes_run_out():
+    assert found('indranagar')[0] == ('Indiranagar', 'Indiranagar', 'station', True)
+    assert found('xyzzy') == [] and found('  ') == []
+
+
+def test_resolve_exact_names_aliases_and_landmarks():
+    index = StationSearchIndex(network())
+    assert index.resolve('mg road') == index.resolve('Brigade Road') == 0
+    assert index.resolve('Majestic') == 3
+    assert index.resolve('Nowhere Mall') is None and index.resolve(None) is None
@@ -0,0 +1,85 @@
+import time
+
+import numpy as np
+import pytest
+
+from bengaluru_traffic_profiles import (SLOT_S, SLOTS_PER_WEEK, MAX_SLOT_GAP, ObservationLog, TrafficProfiles,
+                                        TrafficProfileStore, week_position)
+
+# The latest Monday 00:00 local (IST), so observations stay inside the retention window
+MONDAY = round(time.time() - week_position(time.time()) * SLOT_S)
+
+
+def at_slot(slot, offset=0.5):
+    """Epoch time inside a slot of the first week (offset 0.5 = the slot midpoint)"""
+    return MONDAY + (slot + offset) * SLOT_S
+
+
+def test_estimate_is_slot_mean_at_midpoint_and_interpolates_between():
+    profiles = TrafficProfiles.build([('a|b', at_slot(10), 600, 5.0), ('a|b', at_slot(10, 0.2), 800, 5.0),
+                                      ('a|b', at_slot(11), 1000, 5.0)])
+    assert profiles.estimate_seconds('a|b', at_slot(10)) == pytest.approx(700)
+    assert profiles.estimate_seconds('a|b', at_slot(10, 1.0)) == pytest.approx(850)
+    assert profiles.estimate_seconds('a|b', at_slot(11)) == pytest.approx(1000)
+
+
+def test_estimate_interpolates_across_gaps_and_wraps_the_week():
+    profiles = TrafficProfiles.build([('a|b', at_slot(SLOTS_PER_WEEK - 1), 600, 5.0), ('a|b', at_slot(2), 1000, 5.0)])
+    # Slot midpoints at -1 and 2: a third of the way at slot 0's midpoint
+    assert profiles.estimate_seconds('a|b', at_slot(0)) == pytest.approx(600 + 400 / 3)
+    # With nothing observed within MAX_SLOT_GAP slots on one side the other side is used alone;
+    # with nothing on either side there is no estimate
+    assert profiles.estimate_seconds('a|b', at_slot(2 + MAX_SLOT_GAP)) == pytest.approx(1000)
+    assert profiles.estimate_seconds('a|b', at_slot(3 + MAX_SLOT_GAP)) is None
+    assert profiles.estimate_seconds('c|d', at_slot(2)) is None
+
+
+def test_estimate_leg_has_live_leg_shape():
+    profiles = TrafficProfiles.build([('a|b', at_slot(3), 754, 6.2)])
+    leg = profiles.estimate_leg('a|b', at_slot(3))
+    assert (leg['duration_min'], leg['duration_sec'], leg['time_display']) == (12, 34, '12 min 34 sec')
+    assert leg['distance_km'] == pytest.approx(6.2) and leg['traffic_status'] == 'Historical Traffic'
+
+
+def test_rollup_matches_building_everything_at_once():
+    rng = np.random.default_rng(4)
+    rows = [(f"leg{rng.integers(3)}", at_slot(int(rng.integers(20)), rng.random()), float(rng.uniform(300, 900)), 4.0)
+            for _ in range(300)]
+    whole = TrafficProfiles.build(rows)
+    rolled = TrafficProfiles.build(rows[150:], TrafficProfiles.build(rows[:150]))
+    assert rolled.legs == whole.legs
+    np.testing.assert_array_equal(rolled.counts, whole.counts)
+    np.testing.assert_allclose(rolled.durations, whole.durations, rtol=1e-5)
+    assert TrafficProfiles.build([], whole) is whole
+
+
+def test_observations_are_buffered_then_consumed_by_a_build(tmp_path):
+    log = ObservationLog(str(tmp_path / 'obs.sqlite3'), flush_s=3600)
+    store = TrafficProfileStore(str(tmp_path / 'profile.npz'), log)
+    store.record('a', 'b', {'duration_min': 10, 'duration_sec': 0, 'distance_km': 5.0}, at_slot(4))
+    assert log.rows() == []                         # nothing written on the caller's thread
+    log.flush()
+    assert len(log.rows()) == 1
+
+    assert store.rebuild()['observations'] == 1
+    assert log.rows() == []                         # consumed rows are deleted
+    store.record('a', 'b', {'duration_min': 20, 'duration_sec': 0, 'distance_km': 5.0}, at_slot(4))
+    assert store.rebuild()['observations'] == 2     # rolled up into the existing profile
+    assert store.profiles.estimate_seconds('a|b', at_slot(4)) == pytest.approx(900)
+    assert store.rebuild(fresh=True)['observations'] == 0
+
+
+def test_old_observations_are_pruned(tmp_path):
+    log = ObservationLog(str(tmp_path / 'obs.sqlite3'), flush_s=3600, retention_days=1)
+    log.record('a|b', 0.0, 600, 5.0)
+    log.record('a|b', MONDAY, 600, 5.0)
+    log.flush()
+    assert [row[1] for row in log.rows()] == [MONDAY]
+
+
+def test_buffer_is_bounded(tmp_path):
+    log = ObservationLog(str(tmp_path / 'obs.sqlite3'), flush_s=3600, buffer_max=2)
+    for _ in range(5):
+        log.record('a|b', MONDAY, 600, 5.0)
+    log.flush()
+    assert len(log.rows()) == 2
@@ -0,0 +1,25 @@
+import pytest
+
+from bengaluru_warmup import WARMUP_BUCKETS, WARMUP_MAX_BUCKETS, WARMUP_MAX_CALLS, warmup_options
+
+
+def test_defaults_and_caps():
+    assert warmup_options({}) == (None, WARMUP_BUCKETS, False, WARMUP_MAX_CALLS)
+    assert warmup_options({'buckets': 10 ** 9, 'max_calls': 10 ** 9, 'pairs': 1}) == \
+        (None, WARMUP_MAX_BUCKETS, True, WARMUP_MAX_CALLS)
+    assert warmup_options({'buckets': 6, 'max_calls': 0})[1::2] == (6, 0)
+
+
+@pytest.mark.parametrize('data', [
+    {'buckets': 'many'}, {'buckets': 0}, {'buckets': 2.5}, {'buckets': True},
+    {'max_calls': '100'}, {'max_calls': -1},
+    {'places': []}, {'places': [{'name': 'ITPL', 'lat': '12.98', 'lng': 77.73}]}, {'places': 'ITPL'},
+])
+def test_unusable_values_are_rejected(data):
+    with pytest.raises(ValueError):
+        warmup_options(data)
+
+
+def test_places_are_passed_through():
+    places = [{'name': 'ITPL', 'lat': 12.9866, 'lng': 77.7366}]
+    assert warmup_options({'places': places})[0] == places